@@ -7,6 +7,7 @@ from PySide6.QtCore import QObject, QThread, Signal, Slot
 from PySide6.QtWidgets import QProgressBar
 from PySide6.QtGui import QPainter, QLinearGradient, QColor, QFont
 from PySide6.QtCore import Qt, QRectF
+import time
 
 
 class RoundedProgressBar(QProgressBar):
@@ -97,6 +98,35 @@ class AcquisitionProgress_Dialog(QDialog):
         ms = self._elapsed_clock.elapsed()
         text = self.format_elapsed(ms)
         self.time_label.setText(text)
+        self._update_timing()
+
+    def _update_timing(self):
+        """Refreshes the ETA, rates, waits and the disk warning from the timing model."""
+        if self.timing is None:
+            return
+        info = self.timing.snapshot()
+
+        remaining = self.format_elapsed(int(info["remaining"] * 1000))
+        finish = time.strftime("%H:%M, %Y-%m-%d", time.localtime(info["eta"]))
+        self.remaining_time_label.setText(f"{remaining}  (ends {finish})")
+
+        written = f"{info['write_MBps']:.0f} MB/s written" if info["write_MBps"] is not None else "no stack written yet"
+        self.rate_label.setText(f"{info['slices_per_s']:.1f} slices/s, {written}")
+
+        if info["waiting"] > 0:
+            self.wait_label.setText(f"Waiting for the next time point: {self.format_elapsed(int(info['waiting'] * 1000))}"
+                                    f" ({info['waits_left']} waits left)")
+        elif info["waits_left"] > 0:
+            self.wait_label.setText(f"{info['waits_left']} time spacing waits left")
+        else:
+            self.wait_label.setText("")
+
+        if info["disk_limited"]:
+            self.warning_label.setText(f"Disk too slow: {info['write_MBps']:.0f} MB/s written vs "
+                                       f"{info['acquisition_MBps']:.0f} MB/s acquired")
+            self.warning_label.show()
+        else:
+            self.warning_label.hide()
 
     
     #----------------------------------------------------
@@ -124,11 +154,14 @@ class AcquisitionProgress_Dialog(QDialog):
     # GUI setup
 
 
-    def __init__(self, total_slices, order, parent=None):
+    def __init__(self, total_slices, order, parent=None, timing=None):
         super().__init__(parent)
         self.setWindowTitle("Y-Stack Acquisition Progress")
         self.setWindowModality(Qt.ApplicationModal)
 
+        # Timing model of the acquisition (Acquisition_Timing), None to show only the elapsed time
+        self.timing = timing
+
 
         # layout
         layout = QVBoxLayout(self)
@@ -170,6 +203,22 @@ class AcquisitionProgress_Dialog(QDialog):
                         font-size: 13px;
                         font-weight: bold;""")
 
+        # Remaining Time, rates and time spacing waits (from the timing model)
+        self.remaining_label = QLabel("Remaining Time:")
+        self.remaining_label.setStyleSheet("""
+                        font-size: 13px;""")
+        self.remaining_time_label = QLabel("")
+        self.remaining_time_label.setStyleSheet("""
+                        font-size: 13px;
+                        font-weight: bold;""")
+        self.rate_label = QLabel("")
+        self.wait_label = QLabel("")
+        self.warning_label = QLabel("")
+        self.warning_label.setStyleSheet("""
+                        color: #FF8A65;
+                        font-weight: bold;""")
+        self.warning_label.hide()
+
         self.discard_button = QPushButton("Discard Acquisition")
         self.discard_button.setFixedSize(200, 35)
         self.discard_button.setStyleSheet("""
@@ -325,6 +374,13 @@ class AcquisitionProgress_Dialog(QDialog):
         layout.addSpacing(10)
         layout.addWidget(self.elapsed_label)
         layout.addWidget(self.time_label)
+        if self.timing is not None:
+            layout.addSpacing(5)
+            layout.addWidget(self.remaining_label)
+            layout.addWidget(self.remaining_time_label)
+            layout.addWidget(self.rate_label)
+            layout.addWidget(self.wait_label)
+            layout.addWidget(self.warning_label)
         layout.addWidget(self.bar)
         layout.addStretch()
         layout.addWidget(self.discard_button)
@@ -340,6 +396,7 @@ class AcquisitionProgress_Dialog(QDialog):
         self._timer.setInterval(500)
         self._timer.timeout.connect(self._tick)
         self._timer.start()
+        self._update_timing()
 
         self.setStyleSheet("""
             QWidget { 
@@ -9,9 +9,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import QThread, Signal, Slot
 import time
 from pathlib import Path
-from pylablib.devices import DCAM
 import numpy as np
-import cv2
 
 # Imports from files
 from Extra_Files.ToolTip_Manager import CustomToolTipManager
@@ -19,6 +17,7 @@ from Extra_Files.Stylesheet_List import StyleSheets
 from Extra_Files.Custom_Line_Edit import CustomLineEdit
 from Extra_Files.Acquisition_Thread_Code import Acquisition_Thread
 from Extra_Files.Separate_Numbers_Code import separate_numbers
+from Extra_Files.Focus_Metrics import FOCUS_METHODS
 
 
 ############################################################################################################
@@ -115,6 +114,8 @@ class Camera_Widget(QWidget):
     snap_clicked = Signal()
     # Restart button click signal
     restart_clicked = Signal()
+    # Focus metric selection signal
+    focus_method_changed = Signal(str)
 
     ############################################################################################################
     # Initialization
@@ -134,6 +135,8 @@ class Camera_Widget(QWidget):
         self.dynamic_range = 16  # Default dynamic range (bits)
         self.binning = 1
         self.exposure_time = 10.0  # Default exposure time in milliseconds
+        self.exposure_value = None  # Last exposure time read from the camera (ms)
+        self.fps_value = 0.0  # Last frame rate read from the camera
 
 
         # Initialize acquisition thread
@@ -269,6 +272,21 @@ class Camera_Widget(QWidget):
             return None, None, None, None
 
 
+    def update_focus(self, value):
+        """Update the displayed focus metric."""
+        self.focus_value_label.setText(f"{value:.4g}" if value is not None else "")
+
+    def snap_settings(self):
+        "returns the number of frames of a Snap and its projection (None, 'mean' or 'max')"
+        try:
+            n_frames = max(1, int(self.snap_frames_lineedit.text()))
+        except ValueError:
+            n_frames = 1
+            self.snap_frames_lineedit.setText("1")
+
+        projection_map = {"All Frames": None, "Average": "mean", "Maximum": "max"}
+        return n_frames, projection_map.get(self.snap_projection_combobox.currentText())
+
     @Slot(float)
     def update_framerate(self, fps):
         """Update the displayed framerate."""
@@ -278,6 +296,7 @@ class Camera_Widget(QWidget):
     @Slot(float)
     def update_exposure(self, exposure):
         """Update the exposure time in the UI, but only if the user is not actively setting a value."""
+        self.exposure_value = exposure
         if not self.exposuretime_lineedit.hasFocus() and not self.exposure_update_timer.isActive() and not self.ignore_exposure_feedback_timer.isActive():
             self.exposuretime_lineedit.setText(f"{exposure:.6f}")
 
@@ -725,6 +744,67 @@ class Camera_Widget(QWidget):
         self.grid_layout.addWidget(self.framerate_label, 9, 0, alignment=Qt.AlignRight)
         self.grid_layout.addWidget(self.framerate, 9, 1, alignment=Qt.AlignRight)
 
+        #-----------------------------------------------------------------
+        # 10th Line - Auto Contrast
+
+        self.auto_contrast_label = QLabel("Auto Contrast: ")
+        self.auto_contrast_checkbox = QCheckBox()
+        self.auto_contrast_checkbox.setChecked(True)
+        self.auto_contrast_checkbox.setStyleSheet(self.camera_checkbox.styleSheet())
+        self.tooltip_manager.attach_tooltip(self.auto_contrast_checkbox, "Continuously adjusts the Live contrast limits\nfrom the intensity percentiles of the frames.")
+        self.grid_layout.addWidget(self.auto_contrast_label, 10, 0, alignment=Qt.AlignRight)
+        self.grid_layout.addWidget(self.auto_contrast_checkbox, 10, 1, alignment=Qt.AlignRight)
+
+        #-----------------------------------------------------------------
+        # 11th Line - Snap Burst
+
+        self.snap_burst_label = QLabel("Snap Burst: ")
+        self.snap_burst_widget = QWidget()
+        self.snap_burst_layout = QHBoxLayout(self.snap_burst_widget)
+        self.snap_burst_layout.setContentsMargins(0, 0, 0, 0)
+        self.snap_burst_layout.setSpacing(5)
+
+        self.snap_frames_lineedit = CustomLineEdit()
+        self.snap_frames_lineedit.setFixedWidth(40)
+        self.snap_frames_lineedit.setFixedHeight(21)
+        self.snap_frames_lineedit.setText("1")
+        self.tooltip_manager.attach_tooltip(self.snap_frames_lineedit, "Number of consecutive frames saved by each Snap.")
+
+        self.snap_projection_combobox = QComboBox()
+        self.snap_projection_combobox.addItems(["All Frames", "Average", "Maximum"])
+        self.snap_projection_combobox.setEditable(False)
+        self.tooltip_manager.attach_tooltip(self.snap_projection_combobox, "Saves every frame of the burst, or only\nits average/maximum projection.")
+
+        self.snap_burst_layout.addWidget(self.snap_frames_lineedit)
+        self.snap_burst_layout.addWidget(QLabel("frames"))
+        self.snap_burst_layout.addWidget(self.snap_projection_combobox)
+
+        self.grid_layout.addWidget(self.snap_burst_label, 11, 0, alignment=Qt.AlignRight)
+        self.grid_layout.addWidget(self.snap_burst_widget, 11, 1)
+
+        #-----------------------------------------------------------------
+        # 12th Line - Focus Metric
+
+        self.focus_label = QLabel("Focus: ")
+        self.focus_widget = QWidget()
+        self.focus_layout = QHBoxLayout(self.focus_widget)
+        self.focus_layout.setContentsMargins(0, 0, 0, 0)
+        self.focus_layout.setSpacing(5)
+
+        self.focus_combobox = QComboBox()
+        self.focus_combobox.addItems(list(FOCUS_METHODS))
+        self.focus_combobox.setCurrentText("Tenengrad")
+        self.focus_combobox.setEditable(False)
+        self.focus_combobox.currentTextChanged.connect(self.focus_method_changed.emit)
+        self.tooltip_manager.attach_tooltip(self.focus_combobox, "Sharpness metric of the Live frames\n(higher is sharper).")
+
+        self.focus_value_label = QLabel()
+        self.focus_layout.addWidget(self.focus_combobox)
+        self.focus_layout.addWidget(self.focus_value_label)
+
+        self.grid_layout.addWidget(self.focus_label, 12, 0, alignment=Qt.AlignRight)
+        self.grid_layout.addWidget(self.focus_widget, 12, 1)
+
         self.main_layout.addWidget(self.grid_widget)
 
         #-----------------------------------------------------------------
@@ -0,0 +1,79 @@
+import os
+import time
+
+from Extra_Files.Tiling import PIXEL_SIZE_UM
+
+
+############################################################################################################
+# Acquisition metadata: what the OME-Zarr stores of a run need, known from its plan before the first frame
+
+class Acquisition_Metadata:
+    """
+    Plan of an acquisition:
+        positions       - the YStack_Widget parameters of every position (GUI units: um and time units)
+        cameras         - {camera: (filters, dynamic_range, binning)} of the selected cameras
+        settings        - the device settings of the settings file of every position (write_txt_settings)
+        same_timepoints - every position uses the time points of the first one (multi-position mode)
+        tiles           - {camera: tile coordinates of every position (Tiling.tile_coordinates)}
+
+    y_stack writes the OME metadata and the tile of a store from it as soon as its array is created, and then
+    the progress ("acquisition" attributes and frame "timestamps") after every stack.
+    """
+
+    def __init__(self, positions, cameras, settings, same_timepoints=False, tiles=None, pixel_size=PIXEL_SIZE_UM):
+        self.positions = positions
+        self.cameras = cameras
+        self.settings = settings
+        self.same_timepoints = same_timepoints
+        self.tiles = tiles or {}
+        self.pixel_size = pixel_size
+        self.start = time.time()
+        self._settings_written = set()
+
+    def time_points(self, pos_idx):
+        """(time points, spacing, unit) of a position."""
+        p = self.positions[0] if self.same_timepoints else self.positions[pos_idx]
+        return p['Tpoints'], p['Tstep'], p['Tstep_unit']
+
+    def ome_parameters(self, camera, pos_idx):
+        """Arguments of y_stack.write_metadata for the store of a camera at a position."""
+        filters, dynamic_range, binning = self.cameras[camera]
+        _, t_spacing, t_spacing_unit = self.time_points(pos_idx)
+        return dict(filter_list=filters, dynamic_range=dynamic_range, binning=binning,
+                    t_spacing=t_spacing, t_spacing_unit=t_spacing_unit,
+                    z_step=self.positions[pos_idx]['Ystep'],
+                    pixel_size_x=self.pixel_size, pixel_size_y=self.pixel_size)
+
+    def tile_parameters(self, camera, pos_idx):
+        """Arguments of Tiling.write_tile_metadata for the store of a camera at a position (None without tiles)."""
+        tiles = self.tiles.get(camera)
+        if not tiles or pos_idx >= len(tiles):
+            return None
+        _, _, binning = self.cameras[camera]
+        return dict(tile=tiles[pos_idx], binning=binning, pixel_size=self.pixel_size)
+
+    def settings_parameters(self, pos_idx, acq_dir):
+        """Arguments of y_stack.write_txt_settings for a position (None once its file is written)."""
+        if pos_idx in self._settings_written:
+            return None
+        self._settings_written.add(pos_idx)
+        p = self.positions[pos_idx]
+        time_points, time_spacing, time_step_unit = self.time_points(pos_idx)
+        return dict(self.settings,
+                    Yi=p['yi'], Yf=p['yf'], Y_spacing=p['Ystep'], X=p['x'], Z=p['z'], Theta=p['theta'],
+                    time_points=time_points, time_spacing=time_spacing, time_step_unit=time_step_unit,
+                    pixel_size_x=self.pixel_size, pixel_size_y=self.pixel_size,
+                    experiment_dir=acq_dir, exp_name=os.path.basename(acq_dir))
+
+    def progress(self, time_points, channels, completed_stacks=0):
+        """The "acquisition" attributes of a store: planned and completed stacks/time points."""
+        completed_stacks = min(completed_stacks, time_points * channels)
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start)),
+            "time_points": time_points,
+            "channels": channels,
+            "completed_stacks": completed_stacks,
+            "completed_timepoints": completed_stacks // channels,
+            "complete": completed_stacks == time_points * channels,
+            "elapsed_s": round(time.time() - self.start, 3),
+        }
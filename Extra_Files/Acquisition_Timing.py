@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+
+
+############################################################################################################
+# Timing model of a Y-stack acquisition: pre-run estimate, refined by the measured phases while running
+
+LASER_ON_WAIT = 0.3         # s waited for the laser at the start of every channel stack (Y_Stack_Algorithms)
+CHANNEL_OVERHEAD = 0.5      # s of filter wheel / stage moves per channel stack, before it is measured
+DEFAULT_SETTLE = 0.010      # s per Y slice before the settle times are learned
+DEFAULT_WRITE_MBPS = 300.0  # MB/s of the stack writes, before one is measured
+LEARNING_RATE = 0.2         # weight of a new measurement in the phase times
+RATE_WINDOW = 10.0          # s of slices used for the slices/s
+TIME_UNITS = {"seconds": 1, "minutes": 60, "hours": 60*60, "days": 60*60*24}
+
+
+class Acquisition_Timing:
+    """
+    Per-phase timing model of an acquisition. The phases are:
+        slice   - one Y slice (move, settle, sweep and exposure)
+        channel - start of a channel stack (filters, laser ON wait, moves, autofocus)
+        write   - reading the stack from the cameras and writing it (bytes / write rate)
+        wait    - the time spacing between time points (known exactly from the plan)
+    The phase times start from the pre-run estimate and follow the measurements (moving average).
+    Thread-safe: the acquisition thread reports the writes and waits, the GUI thread the slices.
+    """
+
+    def __init__(self, total_slices, total_stacks, stack_bytes, wait_seconds, n_waits,
+                 slice_s, channel_s=LASER_ON_WAIT + CHANNEL_OVERHEAD, write_MBps=DEFAULT_WRITE_MBPS):
+        self.total_slices = total_slices
+        self.total_stacks = total_stacks
+        self.stack_bytes = stack_bytes              # mean bytes of a channel stack (all cameras)
+        self.wait_seconds = wait_seconds            # sum of the time spacings
+        self.n_waits = n_waits
+
+        self.slice_s = slice_s
+        self.channel_s = channel_s
+        self.write_Bps = write_MBps * 1e6
+
+        self._lock = threading.Lock()
+        self.slices_done = 0
+        self.stacks_done = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.waits_done = 0
+        self.waited_seconds = 0.0                   # planned seconds of the waits already started
+        self._wait_until = None
+        self._last_event = None
+        self._slice_times = deque()
+
+        self.t0 = time.perf_counter()
+        self.estimate_s = self.remaining()
+
+    @classmethod
+    def estimate(cls, stacks, frame_bytes, exposure_ms=None, sweep_ms=None, settle_s=None, same_timepoints=True):
+        """
+        Pre-run estimate from the plan and the device parameters.
+            stacks      - per position: {'Nsteps', 'Tpoints', 'Tstep', 'Tstep_unit', 'channels'}
+            frame_bytes - bytes of one Y slice (all cameras)
+            exposure_ms, sweep_ms, settle_s - per slice (defaults when unknown)
+        """
+        total_slices = sum(s['Nsteps'] * max(1, s['Tpoints']) * s['channels'] for s in stacks)
+        total_stacks = sum(max(1, s['Tpoints']) * s['channels'] for s in stacks)
+
+        # The time spacing is waited after every time point but the last one
+        spacings = [s['Tstep'] * TIME_UNITS.get(s['Tstep_unit'], 1) for s in stacks]
+        if same_timepoints and stacks:
+            n_waits = max(1, stacks[0]['Tpoints']) - 1
+            wait_seconds = n_waits * spacings[0]
+        else:
+            n_waits = sum(max(1, s['Tpoints']) - 1 for s in stacks)
+            wait_seconds = sum((max(1, s['Tpoints']) - 1) * t for s, t in zip(stacks, spacings))
+
+        slice_s = max(exposure_ms or 0, sweep_ms or 0) / 1000 + (settle_s if settle_s is not None else DEFAULT_SETTLE)
+        stack_bytes = total_slices * frame_bytes / total_stacks if total_stacks else 0
+
+        return cls(total_slices, total_stacks, stack_bytes, wait_seconds, n_waits, slice_s)
+
+    def seed_write_MBps(self, MBps):
+        """Replaces the default write rate of the estimate (e.g. with the measured disk bandwidth)."""
+        self.write_Bps = MBps * 1e6
+        self.estimate_s = self.remaining()
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Measurements
+
+    def _learn(self, name, value):
+        setattr(self, name, getattr(self, name) + LEARNING_RATE * (value - getattr(self, name)))
+
+    def slice_done(self, k):
+        """Slice k (1-based) of the current stack was acquired."""
+        now = time.perf_counter()
+        with self._lock:
+            since = now - (self._last_event if self._last_event is not None else self.t0)
+            if k > 1:
+                self._learn("slice_s", since)
+            else:
+                # First slice of a stack: everything since the last stack/wait is the channel start
+                self._learn("channel_s", max(0.0, since - self.slice_s))
+            self._last_event = now
+            self.slices_done += 1
+
+            self._slice_times.append(now)
+            while self._slice_times and now - self._slice_times[0] > RATE_WINDOW:
+                self._slice_times.popleft()
+
+    def stack_written(self, nbytes, seconds):
+        """A channel stack of nbytes was read from the cameras and written in seconds."""
+        with self._lock:
+            self.stacks_done += 1
+            self.bytes_written += nbytes
+            self.write_seconds += seconds
+            if seconds > 0:
+                if self.stacks_done == 1:
+                    self.write_Bps = nbytes / seconds
+                else:
+                    self._learn("write_Bps", nbytes / seconds)
+            self._last_event = time.perf_counter()
+
+    def wait_started(self, seconds):
+        """The time spacing wait of seconds started."""
+        with self._lock:
+            self.waits_done += 1
+            self.waited_seconds += seconds
+            self._wait_until = time.perf_counter() + seconds
+            self._last_event = self._wait_until
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Model
+
+    def waiting(self):
+        """Seconds left of the current time spacing wait (0 if not waiting)."""
+        if self._wait_until is None:
+            return 0.0
+        return max(0.0, self._wait_until - time.perf_counter())
+
+    def remaining(self):
+        """Seconds left until the end of the acquisition."""
+        slices_left = max(0, self.total_slices - self.slices_done)
+        stacks_left = max(0, self.total_stacks - self.stacks_done)
+        write_s = self.stack_bytes / self.write_Bps if self.write_Bps > 0 else 0
+        waits_left = max(0.0, self.wait_seconds - self.waited_seconds) + self.waiting()
+        return slices_left * self.slice_s + stacks_left * (self.channel_s + write_s) + waits_left
+
+    def slices_per_s(self):
+        """Slices per second over the last RATE_WINDOW (0 while waiting)."""
+        with self._lock:
+            times = list(self._slice_times)
+        if len(times) < 2 or time.perf_counter() - times[-1] > RATE_WINDOW:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0]) if times[-1] > times[0] else 0.0
+
+    def acquisition_MBps(self):
+        """Data rate produced by the cameras while acquiring a stack."""
+        slice_bytes = self.stack_bytes * self.total_stacks / self.total_slices if self.total_slices else 0
+        return slice_bytes / self.slice_s / 1e6 if self.slice_s > 0 else 0.0
+
+    def write_MBps(self):
+        return self.write_Bps / 1e6
+
+    def disk_limited(self):
+        """True once the measured write rate is below the rate the cameras produce data."""
+        return self.stacks_done > 0 and self.write_MBps() < self.acquisition_MBps()
+
+    def snapshot(self):
+        """Everything shown by the progress dialog."""
+        slices_per_s = self.slices_per_s()
+        with self._lock:
+            remaining = self.remaining()
+            return {
+                "elapsed": time.perf_counter() - self.t0,
+                "remaining": remaining,
+                "eta": time.time() + remaining,
+                "slices_per_s": slices_per_s,
+                "write_MBps": self.write_MBps() if self.stacks_done else None,
+                "acquisition_MBps": self.acquisition_MBps(),
+                "waiting": self.waiting(),
+                "waits_left": self.n_waits - self.waits_done,
+                "disk_limited": self.disk_limited(),
+            }
+
+    def report(self):
+        elapsed = time.perf_counter() - self.t0
+        write_s = self.stack_bytes / self.write_Bps if self.write_Bps > 0 else 0
+        return (f"[Timing] estimated {self.estimate_s:.0f} s, took {elapsed:.0f} s | "
+                f"slice {self.slice_s * 1000:.1f} ms, channel start {self.channel_s:.2f} s, "
+                f"stack write {write_s:.2f} s ({self.write_MBps():.0f} MB/s vs "
+                f"{self.acquisition_MBps():.0f} MB/s acquired), waits {self.waited_seconds:.0f} s")
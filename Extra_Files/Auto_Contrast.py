@@ -0,0 +1,113 @@
+import numpy as np
+
+
+############################################################################################################
+# Percentile based contrast limits
+
+def percentile_limits(frame, low_percentile=0.5, high_percentile=99.8, max_samples=65536):
+    """
+    Computes the (low, high) percentile intensities of a frame from a strided subsample.
+
+    Integer frames (8/16 bits) use a histogram (np.bincount), which is much faster than np.percentile.
+    """
+    frame = np.asarray(frame)
+    if frame.size == 0:
+        return 0.0, 1.0
+
+    # Stride so that only ~max_samples pixels are looked at
+    stride = max(1, int(np.ceil(np.sqrt(frame.size / max_samples))))
+    sample = frame[..., ::stride, ::stride].ravel()
+
+    if sample.dtype.kind == "u" and sample.dtype.itemsize <= 2:
+        hist = np.bincount(sample)
+        cdf = np.cumsum(hist)
+        total = cdf[-1]
+        low = float(np.searchsorted(cdf, total * low_percentile / 100.0))
+        high = float(np.searchsorted(cdf, total * high_percentile / 100.0))
+    else:
+        low, high = (float(v) for v in np.percentile(sample, (low_percentile, high_percentile)))
+
+    # Never give an empty range to the viewer
+    if high <= low:
+        high = low + 1.0
+
+    return low, high
+
+
+def saturated_fraction(frame, max_samples=65536):
+    """Fraction (0-1) of the pixels at the maximum value of the frame's integer type, from a strided subsample."""
+    frame = np.asarray(frame)
+    if frame.size == 0 or frame.dtype.kind not in "ui":
+        return 0.0
+
+    stride = max(1, int(np.ceil(np.sqrt(frame.size / max_samples))))
+    sample = frame[..., ::stride, ::stride]
+
+    return float(np.count_nonzero(sample >= np.iinfo(frame.dtype).max)) / sample.size
+
+
+class Auto_Contrast:
+    """Per camera auto-contrast state: percentile limits with EMA smoothing and hysteresis."""
+
+    def __init__(self, low_percentile=0.5, high_percentile=99.8, smoothing=0.3, hysteresis=0.05, max_samples=65536):
+        self.low_percentile = low_percentile
+        self.high_percentile = high_percentile
+        self.smoothing = smoothing      # EMA weight of the newest frame (0-1)
+        self.hysteresis = hysteresis    # Fraction of the current range needed to change the limits
+        self.max_samples = max_samples
+
+        self.limits = None
+        self._ema = None
+
+    def reset(self):
+        """Forgets the previous frames (e.g. after a change of exposure, ROI or dynamic range)."""
+        self.limits = None
+        self._ema = None
+
+    def update(self, frame):
+        """Feeds a new frame. Returns True when the published limits changed."""
+        low, high = percentile_limits(frame, self.low_percentile, self.high_percentile, self.max_samples)
+
+        if self._ema is None:
+            self._ema = (low, high)
+        else:
+            a = self.smoothing
+            self._ema = (a * low + (1 - a) * self._ema[0], a * high + (1 - a) * self._ema[1])
+
+        if self.limits is None:
+            self.limits = self._ema
+            return True
+
+        # Only move the limits when the smoothed values leave the hysteresis band
+        band = self.hysteresis * max(self.limits[1] - self.limits[0], 1.0)
+        if abs(self._ema[0] - self.limits[0]) > band or abs(self._ema[1] - self.limits[1]) > band:
+            self.limits = self._ema
+            return True
+
+        return False
+
+
+def channel_windows(array, low_percentile=0.5, high_percentile=99.8):
+    """
+    Computes the OMERO (start, end) window of each channel of a (T, C, Z, Y, X) array,
+    from the middle Z plane of the first timepoint (a single chunk read per channel).
+
+    Returns a list with one (start, end) tuple per channel, or None for an empty channel.
+    """
+    T, C, Z, Y, X = array.shape
+    windows = []
+    for c in range(C):
+        try:
+            plane = np.asarray(array[0, c, Z // 2])
+        except Exception:
+            windows.append(None)
+            continue
+
+        if plane.size == 0 or not plane.any():
+            windows.append(None)
+            continue
+
+        low, high = percentile_limits(plane, low_percentile, high_percentile)
+        windows.append((int(low), int(high)))
+
+    return windows
@@ -0,0 +1,136 @@
+import math
+
+from Extra_Files.Focus_Metrics import focus_metric
+
+
+############################################################################################################
+# Autofocus: coarse scan (with early stop) followed by a golden-section refinement
+
+GOLDEN = (math.sqrt(5) - 1) / 2  # ~0.618
+
+# Default search settings of each axis:
+#   Beam Offset - RTC5 bits of the galvo perpendicular to the sweep (moves the light-sheet plane)
+#   Stage Z     - mm of the stage axis '3'
+AUTOFOCUS_AXES = {
+    "Beam Offset": {"search_range": 2000, "tolerance": 20},
+    "Stage Z":     {"search_range": 0.02, "tolerance": 0.0005},
+}
+
+
+class Autofocus:
+    """
+    Finds the position of an axis that maximizes a focus metric.
+
+    The search is hardware agnostic: it only needs move(value) and measure() -> metric (None if no frame).
+    """
+
+    def __init__(self, axis="Beam Offset", method="Tenengrad", search_range=None, tolerance=None,
+                 coarse_steps=7, drop=0.15, bracket_samples=2, max_fine_iterations=12):
+        self.axis = axis
+        self.method = method
+        self.search_range = search_range if search_range is not None else AUTOFOCUS_AXES[axis]["search_range"]
+        self.tolerance = tolerance if tolerance is not None else AUTOFOCUS_AXES[axis]["tolerance"]
+        self.coarse_steps = max(3, int(coarse_steps))
+        self.drop = drop                  # Relative drop after the best value that counts as "bracketed"
+        self.bracket_samples = max(1, int(bracket_samples))    # consecutive decreasing samples needed for it
+        self.max_fine_iterations = max_fine_iterations
+
+        # Best value found at each position (the next search is centered on it)
+        self.last_best = {}
+        # Records of every search, written into the metadata
+        self.records = []
+
+    def max_evaluations(self):
+        """Upper bound of the number of measurements of a search (frames needed from the camera)."""
+        return self.coarse_steps + self.max_fine_iterations + 2
+
+    def metric(self, frame):
+        return focus_metric(frame, self.method)
+
+    def search(self, move, measure, center, stop_event=None):
+        """
+        Runs the search around center. Returns (best_value, best_metric, n_evaluations),
+        or None if it was interrupted by stop_event or a measurement failed (measure() returned None).
+        """
+        evaluations = {}
+
+        def evaluate(x):
+            if x not in evaluations:
+                move(x)
+                m = measure()
+                if m is None:
+                    return None
+                evaluations[x] = m
+            return evaluations[x]
+
+        #..................................................................
+        # 1) Coarse scan, stopped as soon as the maximum is bracketed
+
+        step = 2 * self.search_range / (self.coarse_steps - 1)
+        xs = [center - self.search_range + n * step for n in range(self.coarse_steps)]
+
+        best_x, best_m = None, -math.inf
+        previous = None
+        falling = 0         # consecutive samples lower than the one before, after the best
+        for n, x in enumerate(xs):
+            if stop_event is not None and stop_event.is_set():
+                return None
+
+            m = evaluate(x)
+            if m is None:
+                return None
+            if m > best_m:
+                best_x, best_m = x, m
+                falling = 0
+            else:
+                falling = falling + 1 if m < previous else 0
+                if best_x != xs[0] and falling >= self.bracket_samples and m < best_m * (1 - self.drop):
+                    # Values on both sides of the best are lower (not a single noisy frame): bracketed
+                    break
+            previous = m
+
+        #..................................................................
+        # 2) Golden-section refinement in [best - step, best + step]
+
+        a, b = best_x - step, best_x + step
+        c = b - GOLDEN * (b - a)
+        d = a + GOLDEN * (b - a)
+        fc, fd = evaluate(c), evaluate(d)
+        if fc is None or fd is None:
+            return None
+
+        iterations = 0
+        while (b - a) > self.tolerance and iterations < self.max_fine_iterations:
+            if stop_event is not None and stop_event.is_set():
+                return None
+
+            if fc > fd:
+                b, d, fd = d, c, fc
+                c = b - GOLDEN * (b - a)
+                fc = evaluate(c)
+            else:
+                a, c, fc = c, d, fd
+                d = a + GOLDEN * (b - a)
+                fd = evaluate(d)
+            if fc is None or fd is None:
+                return None
+            iterations += 1
+
+        best_x, best_m = max(evaluations.items(), key=lambda item: item[1])
+        return best_x, best_m, len(evaluations)
+
+    def record(self, position, time_point, value, metric, evaluations):
+        """Keeps the result of a search (for the OME-Zarr metadata) and centers the next search on it."""
+        self.last_best[position] = value
+        self.records.append({
+            "position": position,
+            "time_point": time_point,
+            "axis": self.axis,
+            "value": value,
+            "metric": self.method,
+            "metric_value": metric,
+            "evaluations": evaluations,
+        })
+
+    def records_for(self, position):
+        return [r for r in self.records if r["position"] == position]
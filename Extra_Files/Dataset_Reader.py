@@ -0,0 +1,434 @@
+import argparse
+import itertools
+import json
+import operator
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import numcodecs
+
+from Extra_Files.Resource_Planner import available_memory
+
+
+############################################################################################################
+# Reader of the VitaSlice OME-Zarr stores, also while they are still being acquired (e.g. napari in another process)
+#
+#   python -m Extra_Files.Dataset_Reader "D:/Data/Experiment 3/Position 1/Position1_Camera1.ome.zarr"
+#
+# The stores are written through zarr's DirectoryStore, which writes every chunk and metadata file to a temporary
+# file and renames it into place: a chunk file is either absent or whole. Which stacks are complete comes from
+# the "acquisition" attributes (y_stack._stack_completed); the chunks of the other stacks are never cached.
+
+CACHE_FRACTION = 0.25           # fraction of the available memory for the shared chunk cache
+DEFAULT_CACHE_BYTES = 2 << 30   # cache size when the available memory is unknown
+PREFETCH_PLANES = 4             # planes read ahead along Z in the scrubbing direction (one behind, one along T)
+PREFETCH_WORKERS = 4            # threads reading the prefetched planes
+REFRESH_S = 1.0                 # minimum time between two checks of the progress of a store
+
+NAPARI_COLORMAPS = {"0000FF": "blue", "00FF00": "green", "FFFF00": "yellow", "FF00FF": "magenta", "FF0000": "red"}
+
+
+class Chunk_Cache:
+    """Decoded chunks by key, the least recently used evicted once they take more than max_bytes (thread-safe)."""
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            memory = available_memory()
+            max_bytes = int(CACHE_FRACTION * memory) if memory else DEFAULT_CACHE_BYTES
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._chunks
+
+    def get(self, key):
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                self.misses += 1
+                return None
+            self._chunks.move_to_end(key)
+            self.hits += 1
+            return chunk
+
+    def put(self, key, chunk):
+        if chunk.nbytes > self.max_bytes:
+            return
+        chunk.flags.writeable = False       # shared by every reader of the chunk
+        with self._lock:
+            previous = self._chunks.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._chunks[key] = chunk
+            self.nbytes += chunk.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._chunks.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self.nbytes = 0
+
+    def report(self):
+        total = self.hits + self.misses
+        return (f"[Reader] cache {self.nbytes / 2**20:.0f} / {self.max_bytes / 2**20:.0f} MB, "
+                f"{len(self._chunks)} chunks, {self.hits / total if total else 0:.0%} hits")
+
+
+_shared_cache = None
+
+
+def shared_cache():
+    """The chunk cache of every Dataset_Reader of the process (unless given another one)."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = Chunk_Cache()
+    return _shared_cache
+
+
+def _normalize_key(key, shape):
+    """(starts, stops, steps, dropped axes) of a numpy index of integers and slices."""
+    key = key if isinstance(key, tuple) else (key,)
+    if any(k is Ellipsis for k in key):
+        i = key.index(Ellipsis)
+        key = key[:i] + (slice(None),) * (len(shape) - len(key) + 1) + key[i + 1:]
+    if len(key) > len(shape):
+        raise IndexError(f"too many indices: {len(key)} for {len(shape)} dimensions")
+    key = key + (slice(None),) * (len(shape) - len(key))
+
+    starts, stops, steps, dropped = [], [], [], []
+    for axis, (k, n) in enumerate(zip(key, shape)):
+        if isinstance(k, slice):
+            start, stop, step = k.indices(n)
+            if step < 0:
+                raise IndexError("negative steps are not supported")
+            stop = max(start, stop)
+        else:
+            start = operator.index(k)
+            start += n if start < 0 else 0
+            if not 0 <= start < n:
+                raise IndexError(f"index {k} is out of bounds for axis {axis} with size {n}")
+            stop, step = start + 1, 1
+            dropped.append(axis)
+        starts.append(start)
+        stops.append(stop)
+        steps.append(step)
+    return starts, stops, steps, dropped
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class Dataset_Array:
+    """
+    One array of a store, read chunk by chunk through the cache of its reader: an array-like with shape, dtype
+    and numpy indexing (integers and slices), as napari takes it. Its .zarray is read once: the acquisition
+    allocates the whole array before the first frame, so its shape never changes.
+    """
+
+    def __init__(self, reader, path):
+        self.reader = reader
+        self.path = path
+        with open(os.path.join(path, ".zarray")) as f:
+            meta = json.load(f)
+        self.shape = tuple(meta["shape"])
+        self.chunks = tuple(meta["chunks"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.ndim = len(self.shape)
+        self.order = meta.get("order", "C")
+        self.separator = meta.get("dimension_separator") or "."
+        self.compressor = numcodecs.get_codec(meta["compressor"]) if meta.get("compressor") else None
+        self.filters = [numcodecs.get_codec(f) for f in meta.get("filters") or []]
+        fill_value = meta.get("fill_value")
+        self.fill_value = np.array(0 if fill_value is None else fill_value).astype(self.dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __getitem__(self, key):
+        starts, stops, steps, dropped = _normalize_key(key, self.shape)
+        region = self.read(starts, stops)
+        self.reader.prefetch_around(self, starts, stops)
+        return region[tuple(0 if axis in dropped else slice(None, None, step) for axis, step in enumerate(steps))]
+
+    def read(self, starts, stops):
+        """The region starts..stops (one entry per axis), assembled from its chunks."""
+        region = np.empty([stop - start for start, stop in zip(starts, stops)], dtype=self.dtype)
+        grid = [range(start // c, -(-stop // c)) for start, stop, c in zip(starts, stops, self.chunks)]
+        for index in itertools.product(*grid):
+            chunk = self.reader.chunk(self, index)
+            source, target = [], []
+            for i, start, stop, c in zip(index, starts, stops, self.chunks):
+                low, high = max(start, i * c), min(stop, (i + 1) * c)
+                source.append(slice(low - i * c, high - i * c))
+                target.append(slice(low - start, high - start))
+            region[tuple(target)] = chunk[tuple(source)] if chunk.ndim else chunk
+        return region
+
+    def load_chunk(self, index):
+        """Decoded chunk at a chunk index, or None if it is not (or not completely) on disk yet."""
+        path = os.path.join(self.path, self.separator.join(map(str, index)))
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            if self.compressor is not None:
+                data = self.compressor.decode(data)
+            for codec in reversed(self.filters):
+                data = codec.decode(data)
+            return np.frombuffer(data, dtype=self.dtype).reshape(self.chunks, order=self.order)
+        except (ValueError, RuntimeError, TypeError):
+            # Not a whole chunk (a writer without the temporary file + rename): read it again next time
+            self.reader.partial += 1
+            return None
+
+
+class _Channel:
+    """One channel of a (t, c, z, y, x) Dataset_Array, as a (t, z, y, x) array-like (a napari layer per channel)."""
+
+    def __init__(self, array, channel):
+        self.array = array
+        self.channel = channel
+        self.shape = array.shape[:1] + array.shape[2:]
+        self.dtype = array.dtype
+        self.ndim = len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        return self.array[(key[0] if key else slice(None), self.channel) + key[1:]]
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class Dataset_Reader:
+    """
+    A VitaSlice OME-Zarr store (an acquired position or a stitched output), also while it is being written:
+    its multiscale levels as Dataset_Array, read through a shared Chunk_Cache, with the planes around the
+    last one read prefetched along Z (in the scrubbing direction) and T.
+    """
+
+    def __init__(self, path, cache=None, prefetch=PREFETCH_PLANES, workers=PREFETCH_WORKERS):
+        self.path = os.path.normpath(path)
+        self.cache = cache if cache is not None else shared_cache()
+        self.prefetch = prefetch
+        self.partial = 0
+        self.attrs = {}
+        self.version = 0                # number of changes of the attributes (new stacks) seen
+        self._attrs_mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._last = {}
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="Dataset_Reader") if prefetch else None
+
+        self.refresh()
+        datasets = self.attrs.get("multiscales", [{}])[0].get("datasets") or [{"path": "0"}]
+        self.levels = [Dataset_Array(self, os.path.join(self.path, d["path"])) for d in datasets]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Progress of the acquisition
+
+    def refresh(self):
+        """Reads the attributes again if they changed (at most every REFRESH_S). Returns True if they did."""
+        now = time.monotonic()
+        if now - self._checked < REFRESH_S:
+            return False
+        self._checked = now
+        path = os.path.join(self.path, ".zattrs")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self._attrs_mtime:
+                return False
+            with open(path) as f:
+                self.attrs = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self._attrs_mtime = mtime
+        self.version += 1
+        return True
+
+    @property
+    def progress(self):
+        """The "acquisition" attributes (None for a store written at once, e.g. a stitched output)."""
+        return self.attrs.get("acquisition")
+
+    @property
+    def complete(self):
+        progress = self.progress
+        return progress is None or bool(progress.get("complete"))
+
+    def _final(self, array, index):
+        """Whether the chunk at index can no longer change: its stack (last t and c of the chunk) is complete."""
+        progress = self.progress
+        if progress is None or progress.get("complete") or array.ndim != 5:
+            return True
+        channels = progress.get("channels") or array.shape[1]
+        t = min((index[0] + 1) * array.chunks[0], array.shape[0]) - 1
+        c = min((index[1] + 1) * array.chunks[1], array.shape[1]) - 1
+        return t * channels + c < progress.get("completed_stacks", 0)
+
+    def chunk(self, array, index):
+        """Decoded chunk (from the cache if it is there), or the fill value if it is not written yet."""
+        key = (array.path, index)
+        chunk = self.cache.get(key)
+        if chunk is not None:
+            return chunk
+        self.refresh()
+        chunk = array.load_chunk(index)
+        if chunk is None:
+            return array.fill_value
+        if self._final(array, index):
+            self.cache.put(key, chunk)
+        return chunk
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Prefetch
+
+    def prefetch_around(self, array, starts, stops):
+        """After a read of a single (t, z) plane: reads ahead the next planes along Z and T in the background."""
+        if self._executor is None or array.ndim != 5 or stops[0] - starts[0] != 1 or stops[2] - starts[2] != 1:
+            return
+        t, z = starts[0], starts[2]
+        last_t, last_z, direction = self._last.get(array.path, (t, z, 1))
+        if z != last_z:
+            direction = 1 if z > last_z else -1
+        self._last[array.path] = (t, z, direction)
+
+        planes = [(t, z + direction * n) for n in range(1, self.prefetch + 1)]
+        planes += [(t, z - direction), (t + 1, z), (t - 1, z)]
+        for plane_t, plane_z in planes:
+            if 0 <= plane_t < array.shape[0] and 0 <= plane_z < array.shape[2]:
+                self._schedule(array, (plane_t, starts[1], plane_z) + tuple(starts[3:]),
+                               (plane_t + 1, stops[1], plane_z + 1) + tuple(stops[3:]))
+
+    def _schedule(self, array, starts, stops):
+        grid = [range(start // c, -(-stop // c)) for start, stop, c in zip(starts, stops, array.chunks)]
+        keys = [(array.path, index) for index in itertools.product(*grid)]
+        if not self._final(array, keys[0][1]) or all(key in self.cache for key in keys):
+            return
+        plane = (array.path, tuple(starts), tuple(stops))
+        with self._lock:
+            if plane in self._pending or len(self._pending) >= 4 * self.prefetch:
+                return
+            self._pending.add(plane)
+
+        def load():
+            try:
+                array.read(starts, stops)
+            finally:
+                with self._lock:
+                    self._pending.discard(plane)
+
+        try:
+            self._executor.submit(load)
+        except RuntimeError:        # closed
+            with self._lock:
+                self._pending.discard(plane)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Display
+
+    def transform(self, kind, level=0):
+        """The (t, c, z, y, x) scale or translation of a level from the multiscales metadata (None if absent)."""
+        try:
+            transforms = self.attrs["multiscales"][0]["datasets"][level]["coordinateTransformations"]
+        except (KeyError, IndexError):
+            return None
+        for transform in transforms:
+            if transform.get("type") == kind:
+                return transform[kind]
+        return None
+
+    def channels(self):
+        """OMERO channels (label, color and window), one per channel of the store."""
+        channels = self.attrs.get("omero", {}).get("channels", [])
+        C = self.levels[0].shape[1]
+        return [channels[c] if c < len(channels) else {"label": f"Channel {c}"} for c in range(C)]
+
+    def add_to_viewer(self, viewer):
+        """Adds one napari layer per channel (every level, so napari reads only the visible resolution)."""
+        scale = self.transform("scale")
+        translation = self.transform("translation")
+        name = os.path.basename(self.path).replace(".ome.zarr", "")
+        layers = []
+        for c, channel in enumerate(self.channels()):
+            window = channel.get("window", {})
+            limits = (window["start"], window["end"]) if "start" in window and window["end"] > window["start"] else None
+            data = [_Channel(level, c) for level in self.levels]
+            layers.append(viewer.add_image(
+                data if len(data) > 1 else data[0],
+                multiscale=len(data) > 1,
+                name=f"{name} {channel.get('label', c)}",
+                colormap=NAPARI_COLORMAPS.get(str(channel.get("color", "")).upper(), "gray"),
+                blending="additive",
+                contrast_limits=limits,
+                scale=[scale[0]] + scale[2:] if scale else None,
+                translate=[translation[0]] + translation[2:] if translation else None,
+            ))
+        return layers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Opens VitaSlice OME-Zarr stores in napari, also while they are acquired.")
+    parser.add_argument("stores", nargs="+", help="OME-Zarr stores (PositionN_CameraN.ome.zarr or Stitched_CameraN.ome.zarr)")
+    parser.add_argument("--cache-mb", type=int, default=None, help="chunk cache size (default: a quarter of the free memory)")
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_PLANES, help="planes read ahead along Z (0: none)")
+    args = parser.parse_args(argv)
+
+    import napari
+    from PySide6.QtCore import QTimer
+
+    cache = Chunk_Cache(args.cache_mb * 2**20 if args.cache_mb else None)
+    readers = [Dataset_Reader(store, cache, prefetch=args.prefetch) for store in args.stores]
+    viewer = napari.Viewer(title="VitaSlice Dataset Reader")
+    layers = {reader: reader.add_to_viewer(viewer) for reader in readers}
+    versions = {reader: reader.version for reader in readers}
+
+    # Redraw the layers of the stores that are still being acquired when new stacks are complete
+    def refresh():
+        for reader, reader_layers in layers.items():
+            reader.refresh()
+            if reader.version != versions[reader]:
+                versions[reader] = reader.version
+                for layer in reader_layers:
+                    layer.refresh()
+
+    timer = QTimer()
+    timer.timeout.connect(refresh)
+    timer.start(int(REFRESH_S * 1000))
+    napari.run()
+
+    for reader in readers:
+        reader.close()
+    print(cache.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from microscope.controllers.zaber import _ZaberFilterWheel, _ZaberConnection
 
 # Laserbox import
 import pyvisa
+from Extra_Files.Laserbox_Driver import Laserbox_Driver
 
 # Scanner import
 import ctypes
@@ -15,6 +16,39 @@ from pipython import GCSDevice, pitools
 # Cameras imports
 from pylablib.devices import DCAM
 
+import os
+import json
+
+# Positions saved by the Stages widget when the software closes
+STAGE_POSITIONS_JSON = os.path.join(os.path.dirname(__file__), "Stage_Positions.json")
+
+
+def stages_already_referenced(pidevice, axes=('3', '4'), z_tolerance=0.01, theta_tolerance=0.1):
+    """
+    True if the controller reports the axes as referenced and their positions agree with the ones
+    saved in Stage_Positions.json (i.e. the controller stayed on since the last session).
+    """
+    try:
+        referenced = pidevice.qFRF(list(axes))
+        if not all(referenced[axis] for axis in axes):
+            return False
+
+        with open(STAGE_POSITIONS_JSON, "r") as f:
+            saved = json.load(f)
+
+        positions = pidevice.qPOS(list(axes))
+        if '3' in axes and abs(positions['3'] - saved["Z"] / 1000) > z_tolerance:
+            return False
+        if '4' in axes:
+            difference = abs(positions['4'] % 360 - saved["theta"]) % 360
+            if min(difference, 360 - difference) > theta_tolerance:
+                return False
+        return True
+
+    except Exception as e:
+        print(f"Stages reference check failed ({e}), referencing")
+        return False
+
 
 class device_initializations:
     
@@ -35,7 +69,8 @@ class device_initializations:
         laserbox.read_termination = "\r\n"
         laserbox.write_termination = "\r\n"
 
-        return laserbox
+        # State cache and batched commands on top of the VISA resource
+        return Laserbox_Driver(laserbox)
     
     def scanner(self):
         """Load the rtc5_board dll"""
@@ -93,18 +128,24 @@ class device_initializations:
         pidevice.VEL(['1', '2', '3'], [velocity_x, velocity_y, velocity_z])
 
 
-            # reference Z to the maximum position
-        pidevice.SPA('3', 0x70, 6)
-        pidevice.SPA('3', 0x16, 25)
-        pidevice.FRF('3')
-        pitools.waitontarget(pidevice, axes=['3'])
-        pidevice.RON('3', 0)  
-        pidevice.POS('3', 25)
+            # warm start: the controller kept the references of the last session
+        if stages_already_referenced(pidevice):
+            print("Stages already referenced, skipping FRF")
+            pidevice.SVO('4', True)
 
-            # initialize and reference the Rotation Stage
-        pidevice.SVO('4', True)
-        pidevice.FRF('4')
-        pitools.waitontarget(pidevice, axes=['4'])
+        else:
+                # reference Z to the maximum position
+            pidevice.SPA('3', 0x70, 6)
+            pidevice.SPA('3', 0x16, 25)
+            pidevice.FRF('3')
+            pitools.waitontarget(pidevice, axes=['3'])
+            pidevice.RON('3', 0)  
+            pidevice.POS('3', 25)
+
+                # initialize and reference the Rotation Stage
+            pidevice.SVO('4', True)
+            pidevice.FRF('4')
+            pitools.waitontarget(pidevice, axes=['4'])
 
             # move the XY stages to the middle positions
         pidevice.MOV("1", 2.50000)    # move X
@@ -117,6 +158,11 @@ class device_initializations:
 
         return camera
 
+    def cameras(self):
+        """Opens every connected camera (index -> camera)"""
+        number_of_cameras = DCAM.DCAM.get_cameras_number()
+        return {idx: DCAM.DCAMCamera(idx) for idx in range(number_of_cameras)}
+
 
 import time
 class device_closings:
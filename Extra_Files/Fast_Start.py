@@ -0,0 +1,114 @@
+import importlib
+import re
+import subprocess
+import sys
+import threading
+import time
+
+
+############################################################################################################
+# Fast start: the heavy modules are imported on a background thread while the Launcher is open
+
+# In import order (the later ones import most of the earlier ones)
+HEAVY_MODULES = [
+    "numpy",
+    "vispy.app",
+    "napari",
+    "napari.layers",
+    "napari.utils.theme",
+    "zarr",
+    "ome_zarr.writer",
+    "skimage.transform",
+    "superqt",
+    "pylablib.devices.DCAM",
+    "pipython",
+    "pyvisa",
+    "microscope.controllers.zaber",
+    "Camera_Widget_py",
+    "Filterwheels_Widget_py",
+    "Lasers_Widget_py",
+    "Scanner_Widget_py",
+    "Stages_Widget_py",
+    "YStack_Widget_py",
+    "File_Explorer_py",
+    "Extra_Files.Acquisition_Thread_Code",
+    "Extra_Files.Devices_Connections",
+    "Extra_Files.Snap_Service",
+]
+
+
+class Module_Preloader(threading.Thread):
+    """Imports the modules one by one (keeping the time of each) so the later imports are instant."""
+
+    def __init__(self, modules=None):
+        super().__init__(name="Module_Preloader", daemon=True)
+        self.modules = list(modules if modules is not None else HEAVY_MODULES)
+        self.timings = []       # (module, seconds, error or None)
+        self.total = 0.0
+        self._done = threading.Event()
+
+    def run(self):
+        t0 = time.perf_counter()
+        try:
+            for name in self.modules:
+                t = time.perf_counter()
+                try:
+                    importlib.import_module(name)
+                    error = None
+                except Exception as e:
+                    # The main thread import will raise it again where it matters
+                    error = str(e)
+                self.timings.append((name, time.perf_counter() - t, error))
+        finally:
+            self.total = time.perf_counter() - t0
+            self._done.set()
+
+    def wait(self, timeout=None):
+        """Waits for the imports to finish. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def report(self):
+        lines = [f"[Startup] modules preloaded in {self.total:.2f} s"]
+        for name, seconds, error in sorted(self.timings, key=lambda item: -item[1]):
+            lines.append(f"  {seconds:7.3f} s  {name}" + (f"  (failed: {error})" if error else ""))
+        return "\n".join(lines)
+
+
+############################################################################################################
+# Benchmark mode: -X importtime profile of the startup imports
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_profile(modules=None, top=30):
+    """
+    Imports the modules in a fresh interpreter with -X importtime and returns the slowest
+    ones (cumulative time, i.e. including what they import) as text.
+    """
+    modules = list(modules if modules is not None else HEAVY_MODULES)
+    # A failing import doesn't stop the profile of the others
+    code = "".join(f"try:\n    import {name}\nexcept Exception as e:\n    print('{name}:', e)\n" for name in modules)
+
+    t0 = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(cumulative_us), int(self_us), len(indent) // 2, name))
+
+    # Only the modules imported directly or by the listed ones (top two levels of the import tree)
+    entries = [e for e in entries if e[2] <= 1]
+    entries.sort(reverse=True)
+
+    lines = [f"[Import profile] {len(modules)} modules in {wall:.2f} s (interpreter included)"]
+    for failure in result.stdout.splitlines():
+        lines.append(f"  import failed - {failure}")
+    lines.append(f"  {'cumulative':>11} {'self':>9}  module")
+    for cumulative_us, self_us, _, name in entries[:top]:
+        lines.append(f"  {cumulative_us / 1e6:9.3f} s {self_us / 1e3:7.1f} ms  {name}")
+    return "\n".join(lines)
@@ -0,0 +1,86 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+############################################################################################################
+# Focus metrics (computed on a downsampled frame)
+
+FOCUS_METHODS = ("Normalized Variance", "Brenner", "Tenengrad")
+
+
+def downsample(frame, max_size=256):
+    """Block-mean downsampling so the largest side is at most ~max_size pixels (also averages out the noise)."""
+    frame = np.asarray(frame)
+    step = max(1, int(np.ceil(max(frame.shape[-2:]) / max_size)))
+    if step == 1:
+        return frame.astype(np.float32)
+
+    h = (frame.shape[0] // step) * step
+    w = (frame.shape[1] // step) * step
+    blocks = frame[:h, :w].reshape(h // step, step, w // step, step)
+    return blocks.mean(axis=(1, 3), dtype=np.float32)
+
+
+def normalized_variance(img):
+    """Variance of the intensities divided by their mean (insensitive to the illumination level)."""
+    mean = float(img.mean())
+    if mean <= 0:
+        return 0.0
+    return float(img.var()) / mean
+
+
+def brenner(img):
+    """Brenner gradient: mean squared difference between pixels two columns apart."""
+    if img.shape[1] < 3:
+        return 0.0
+    d = img[:, 2:] - img[:, :-2]
+    return float(np.mean(d * d))
+
+
+def tenengrad(img):
+    """Tenengrad: mean squared Sobel gradient magnitude."""
+    if img.shape[0] < 3 or img.shape[1] < 3:
+        return 0.0
+    gx = (img[:-2, 2:] + 2 * img[1:-1, 2:] + img[2:, 2:]) - (img[:-2, :-2] + 2 * img[1:-1, :-2] + img[2:, :-2])
+    gy = (img[2:, :-2] + 2 * img[2:, 1:-1] + img[2:, 2:]) - (img[:-2, :-2] + 2 * img[:-2, 1:-1] + img[:-2, 2:])
+    return float(np.mean(gx * gx + gy * gy))
+
+
+_METRICS = {
+    "Normalized Variance": normalized_variance,
+    "Brenner": brenner,
+    "Tenengrad": tenengrad,
+}
+
+
+def focus_metric(frame, method="Tenengrad", max_size=256):
+    """Computes the chosen focus metric of a frame, on its downsampled version."""
+    if method not in _METRICS:
+        raise ValueError(f"Unknown focus metric: {method}")
+    return _METRICS[method](downsample(frame, max_size))
+
+
+class Focus_History:
+    """Time series of the focus metric of one camera: (time in s, value)."""
+
+    def __init__(self, maxlen=600):
+        self._data = deque(maxlen=maxlen)
+
+    def append(self, value, t=None):
+        self._data.append((time.perf_counter() if t is None else t, value))
+
+    def clear(self):
+        self._data.clear()
+
+    def series(self):
+        """Returns (times, values) arrays from a snapshot (safe while the grabber thread appends)."""
+        data = list(self._data)
+        return np.array([t for t, _ in data]), np.array([v for _, v in data])
+
+    def last(self):
+        return self._data[-1][1] if self._data else None
+
+    def __len__(self):
+        return len(self._data)
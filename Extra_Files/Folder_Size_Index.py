@@ -0,0 +1,282 @@
+import json
+import os
+import sys
+import threading
+import time
+from math import prod
+
+
+############################################################################################################
+# Folder size index: per-directory sizes cached by mtime, Zarr arrays sized from their metadata
+
+INDEX_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Folder_Size_Index.json")
+SAVE_INTERVAL = 30          # s between two saves of the index
+ZARR_SAMPLE = 32            # chunk files stat'ed to estimate the size of a compressed array
+ACQUISITION_PAUSE = 0.002   # s slept after every directory scanned while acquiring
+
+# SetThreadPriority modes: lower the IO (and memory) priority of the calling thread
+_BACKGROUND_BEGIN = 0x00010000
+_BACKGROUND_END = 0x00020000
+
+
+def _background_io(begin):
+    """Moves the calling thread in/out of the Windows background processing mode (no-op elsewhere)."""
+    if sys.platform != "win32":
+        return
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetThreadPriority(kernel32.GetCurrentThread(), _BACKGROUND_BEGIN if begin else _BACKGROUND_END)
+    except Exception:
+        pass
+
+
+def _itemsize(dtype):
+    """Bytes per element of a zarr v2 dtype string ('<u2' -> 2), None if not a simple type."""
+    try:
+        return int(dtype[2:]) if isinstance(dtype, str) and dtype[1] in "biufc" else None
+    except (ValueError, IndexError):
+        return None
+
+
+class Folder_Size_Index:
+    """
+    Sizes of directory trees, built with os.scandir.
+
+    Every directory is cached with its mtime, the bytes of its own files and its subdirectories:
+    a directory whose mtime didn't change is not listed again, so refreshing a tree costs one stat
+    per directory. Zarr arrays (the levels of the .ome.zarr stores) are sized from their .zarray
+    metadata and chunk count instead of a stat per chunk. The index is saved to a JSON file.
+    """
+
+    def __init__(self, json_path=INDEX_JSON):
+        self.json_path = json_path
+        self.acquiring = False
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirs = {}         # path -> [mtime_ns, own bytes, subdirectories, estimated]
+        self._totals = {}       # path -> [bytes, estimated, up to date]
+        self._last_save = time.monotonic()
+        self._dirty = False
+        self.load()
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Directory scans
+
+    def _scan(self, path):
+        """Lists one directory: [own bytes, subdirectories, estimated]."""
+        with os.scandir(path) as it:
+            entries = list(it)
+
+        if any(e.name == ".zarray" for e in entries):
+            scanned = self._scan_zarr_array(path, entries)
+            if scanned is not None:
+                return scanned
+
+        own = 0
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                else:
+                    own += entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                pass
+        return [own, subdirs, False]
+
+    def _scan_zarr_array(self, path, entries):
+        """
+        Size of a zarr v2 array with flat chunk files: chunk count x chunk size for uncompressed
+        arrays, chunk count x mean size of a sample of chunks for compressed ones.
+        Returns None if the layout isn't recognised (the directory is then scanned normally).
+        """
+        try:
+            with open(os.path.join(path, ".zarray")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("dimension_separator", ".") != ".":
+            return None
+
+        own = 0
+        chunks = []
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.name.startswith("."):
+                    own += entry.stat(follow_symlinks=False).st_size
+                else:
+                    chunks.append(entry)
+            except OSError:
+                pass
+
+        if not chunks:
+            return [own, subdirs, False]
+
+        itemsize = _itemsize(meta.get("dtype"))
+        if meta.get("compressor") is None and not meta.get("filters") and itemsize:
+            return [own + len(chunks) * prod(meta["chunks"]) * itemsize, subdirs, False]
+
+        step = max(1, len(chunks) // ZARR_SAMPLE)
+        sample = []
+        for entry in chunks[::step][:ZARR_SAMPLE]:
+            try:
+                sample.append(entry.stat(follow_symlinks=False).st_size)
+            except OSError:
+                pass
+        if not sample:
+            return None
+        estimated = len(sample) < len(chunks)
+        return [own + int(sum(sample) / len(sample) * len(chunks)), subdirs, estimated]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def size(self, path):
+        """
+        Total size of the tree under path: (bytes, estimated).
+        Only the directories whose mtime changed are listed again.
+        """
+        path = os.path.normpath(path)
+        low_priority = self.acquiring
+        if low_priority:
+            _background_io(True)
+
+        total = 0
+        estimated = False
+        try:
+            stack = [path]
+            while stack:
+                directory = stack.pop()
+                try:
+                    mtime = os.stat(directory).st_mtime_ns
+                except OSError:
+                    with self._lock:
+                        self._dirs.pop(directory, None)
+                    continue
+
+                with self._lock:
+                    cached = self._dirs.get(directory)
+                if cached is None or cached[0] != mtime:
+                    try:
+                        own, subdirs, approx = self._scan(directory)
+                    except OSError:
+                        continue
+                    cached = [mtime, own, subdirs, approx]
+                    with self._lock:
+                        self._dirs[directory] = cached
+                        self._dirty = True
+                    if self.acquiring:
+                        # Leave the disk to the acquisition
+                        time.sleep(ACQUISITION_PAUSE)
+
+                total += cached[1]
+                estimated = estimated or cached[3]
+                stack.extend(os.path.join(directory, name) for name in cached[2])
+        finally:
+            if low_priority:
+                _background_io(False)
+
+        with self._lock:
+            self._totals[path] = [total, estimated, True]
+        return total, estimated
+
+    def cached_total(self, path):
+        """Last computed (bytes, estimated, up to date) of path, or None."""
+        with self._lock:
+            total = self._totals.get(os.path.normpath(path))
+            return tuple(total) if total is not None else None
+
+    def subdirectories(self, path, limit=None):
+        """Cached directories of the tree under path (path included), without listing anything."""
+        result = []
+        stack = [os.path.normpath(path)]
+        with self._lock:
+            while stack and (limit is None or len(result) < limit):
+                directory = stack.pop()
+                result.append(directory)
+                cached = self._dirs.get(directory)
+                if cached is not None:
+                    stack.extend(os.path.join(directory, name) for name in cached[2])
+        return result
+
+    def invalidate(self, path):
+        """Marks the total of path and of all its parents as out of date (they are still returned)."""
+        path = os.path.normpath(path)
+        with self._lock:
+            self._dirs.pop(path, None)
+            while True:
+                if path in self._totals:
+                    self._totals[path][2] = False
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+
+    def invalidate_all(self):
+        with self._lock:
+            for total in self._totals.values():
+                total[2] = False
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Persistence
+
+    def load(self):
+        try:
+            with open(self.json_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._dirs = {path: entry for path, entry in data.get("dirs", {}).items() if len(entry) == 4}
+
+    def save(self):
+        """Writes the index to a temporary file and replaces the JSON file with it."""
+        with self._save_lock:
+            self._save()
+
+    def _save(self):
+        with self._lock:
+            data = {"dirs": dict(self._dirs)}
+            self._dirty = False
+            self._last_save = time.monotonic()
+        tmp = f"{self.json_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.json_path)
+        except OSError as e:
+            print(f"Could not save the folder size index: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def maybe_save(self):
+        """
+        Saves the index if it changed and the last save is older than SAVE_INTERVAL.
+        Called by the size workers: a save already running in another thread is not repeated.
+        """
+        if not self._save_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                due = self._dirty and time.monotonic() - self._last_save > SAVE_INTERVAL
+            if due and not self.acquiring:
+                self._save()
+        finally:
+            self._save_lock.release()
+
+
+# One index for the whole application
+_index = None
+
+
+def get_folder_size_index():
+    global _index
+    if _index is None:
+        _index = Folder_Size_Index()
+    return _index
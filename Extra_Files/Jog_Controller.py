@@ -0,0 +1,81 @@
+import time
+
+from PySide6.QtCore import QObject, QTimer
+
+
+############################################################################################################
+# Jog controller: coalesces the (auto-repeated) jog presses into one multi-axis MOV at a bounded rate
+
+MOV_INTERVAL_MS = 50        # Minimum time between two MOV commands
+TARGET_HOLD = 0.5           # s after the last press during which the local target is kept as the base
+
+
+class Jog_Controller(QObject):
+    """
+    Keeps a local target of every jogged axis and accumulates the presses on it.
+    The targets are sent with a single MOV for all the changed axes, at most every MOV_INTERVAL_MS.
+    The actual position is only read from the stage telemetry cache.
+    """
+
+    def __init__(self, pidevice, telemetry, limits=None, parent=None):
+        super().__init__(parent)
+        self.pidevice = pidevice
+        self.telemetry = telemetry
+        self.limits = limits or {}      # axis -> (min, max)
+
+        self._targets = {}              # axis -> local target
+        self._pending = set()           # axes whose target wasn't sent yet
+        self._last_jog = 0.0
+        self._last_mov = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def jog(self, deltas):
+        """Adds {axis: delta} to the targets and schedules the MOV."""
+        now = time.perf_counter()
+        if now - self._last_jog > TARGET_HOLD and not self._pending:
+            # Idle for a while: start again from the actual position
+            self._targets.clear()
+        self._last_jog = now
+
+        for axis, delta in deltas.items():
+            if axis not in self._targets:
+                position = self.telemetry.position(axis)
+                if position is None:
+                    position = self.pidevice.qPOS(axis)[axis]
+                self._targets[axis] = position
+
+            target = self._targets[axis] + delta
+            if axis in self.limits:
+                low, high = self.limits[axis]
+                target = min(max(target, low), high)
+            self._targets[axis] = target
+            self._pending.add(axis)
+
+        # Send right away if the last MOV is old enough, otherwise when it is
+        wait_ms = MOV_INTERVAL_MS - (now - self._last_mov) * 1000
+        if wait_ms <= 0:
+            self.flush()
+        elif not self._timer.isActive():
+            self._timer.start(int(wait_ms) + 1)
+
+    def flush(self):
+        """Sends the pending targets in one MOV."""
+        if not self._pending:
+            return
+        axes = sorted(self._pending)
+        self._pending.clear()
+
+        self.pidevice.MOV(axes, [self._targets[a] for a in axes])
+        self._last_mov = time.perf_counter()
+        self.telemetry.notify_move()
+
+    def reset(self):
+        """Forgets the local targets (call it after an absolute move)."""
+        self._timer.stop()
+        self._pending.clear()
+        self._targets.clear()
@@ -0,0 +1,186 @@
+import re
+import threading
+import time
+from collections import deque, defaultdict
+
+
+############################################################################################################
+# Laserbox driver: state cache per SOURce, redundant writes suppressed, batched SCPI transactions
+
+SOURCES = (2, 3, 4, 5)
+
+# "SOURce3:AM:STATe ON" -> ("3", "AM:STATe", "ON")
+_SETTING = re.compile(r"^SOURce(\d+):([A-Za-z:]+)\s+(\S+)$")
+
+
+class Laserbox_Driver:
+    """
+    Wraps the pyvisa resource of the laserbox (same write / query / close interface).
+
+    Every setting written is cached per SOURce: writing the value already set is skipped,
+    except turning a laser OFF, which is always sent (it may have been turned ON elsewhere).
+    Several settings can go out in one semicolon-joined SCPI transaction (once the laserbox
+    reports no error for the first one), and the latency of every transaction is recorded.
+    """
+
+    def __init__(self, resource, batching=True, maxlen=5000):
+        self.resource = resource
+        self.batching = batching
+        self._batching_checked = False
+        self._lock = threading.Lock()
+        self._state = {}                            # (source, setting) -> value
+        self.latencies = deque(maxlen=maxlen)       # (command(s), seconds)
+        self.suppressed = 0
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def _is_cached(self, command):
+        match = _SETTING.match(command.strip())
+        if match is None:
+            return False
+        source, setting, value = match.groups()
+        if setting.upper() == "AM:STATE" and value.upper() == "OFF":
+            return False        # safety: never skipped
+        return self._state.get((source, setting.upper())) == value.upper()
+
+    def _remember(self, command):
+        match = _SETTING.match(command.strip())
+        if match is not None:
+            source, setting, value = match.groups()
+            self._state[(source, setting.upper())] = value.upper()
+
+    def _send(self, commands):
+        """Writes the commands (already filtered) in one transaction, or one by one."""
+        if self.batching and len(commands) > 1:
+            # ';:' starts the next command from the root of the SCPI tree
+            line = ";:".join(commands)
+            if not self._batching_checked:
+                self._read_errors()         # errors left from before are not the batch's
+            t0 = time.perf_counter()
+            try:
+                self.resource.write(line)
+            except Exception as e:
+                print(f"[Laserbox] batched write failed ({e}), sending the commands one by one")
+                self.batching = False
+            else:
+                self.latencies.append((line, time.perf_counter() - t0))
+                if self._batching_checked:
+                    return
+                # An unsupported compound line does not fail the write, the laserbox queues an SCPI error
+                errors = self._read_errors()
+                self._batching_checked = True
+                if not errors:
+                    return
+                print(f"[Laserbox] batched write not supported ({errors[0]}), sending the commands one by one")
+                self.batching = False
+
+        for command in commands:
+            t0 = time.perf_counter()
+            self.resource.write(command)
+            self.latencies.append((command, time.perf_counter() - t0))
+
+    def _read_errors(self, max_errors=10):
+        """Empties the SCPI error queue (SYST:ERR?). Returns the errors read (unreadable queue: one error)."""
+        errors = []
+        for _ in range(max_errors):
+            try:
+                answer = self.resource.query("SYST:ERR?").strip()
+            except Exception as e:
+                return errors + [str(e)]
+            if answer.lstrip("+").split(",")[0].strip() in ("0", ""):
+                break
+            errors.append(answer)
+        return errors
+
+    def write_many(self, commands):
+        """Writes the commands that change something, in one transaction. Returns the number written."""
+        with self._lock:
+            changed = [c for c in commands if not self._is_cached(c)]
+            self.suppressed += len(commands) - len(changed)
+            commands = changed
+            if not commands:
+                return 0
+            self._send(commands)
+            for command in commands:
+                self._remember(command)
+            return len(commands)
+
+    def write(self, command):
+        """Same as the pyvisa write, but skipped if the setting already has this value."""
+        with self._lock:
+            if self._is_cached(command):
+                self.suppressed += 1
+                return
+            self._send([command])
+            self._remember(command)
+
+    def query(self, command):
+        with self._lock:
+            t0 = time.perf_counter()
+            answer = self.resource.query(command)
+            self.latencies.append((command, time.perf_counter() - t0))
+            self._remember(command)
+            return answer
+
+    def close(self):
+        self.resource.close()
+
+    def invalidate(self, source=None):
+        """Forgets the cached state (of one source, or all of them)."""
+        with self._lock:
+            if source is None:
+                self._state.clear()
+            else:
+                for key in [k for k in self._state if k[0] == str(source)]:
+                    del self._state[key]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Laser settings
+
+    def set_source(self, source, on, power_W=None):
+        """
+        Turns a laser ON (at power_W, in W) or OFF in a single transaction.
+        The power is set before the STATe ON, so the laser never emits at the previous power.
+        """
+        if not on:
+            return self.write_many([f"SOURce{source}:AM:STATe OFF"])
+        commands = []
+        if power_W is not None:
+            commands.append(f"SOURce{source}:POWer:LEVel:IMMediate:AMPLitude %.5f" % power_W)
+        commands.append(f"SOURce{source}:AM:STATe ON")
+        return self.write_many(commands)
+
+    def all_off(self, sources=SOURCES):
+        return self.write_many([f"SOURce{s}:AM:STATe OFF" for s in sources])
+
+    def cw_mode(self, sources=SOURCES):
+        return self.write_many([f"SOURce{s}:AM:INTernal CWP" for s in sources])
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Latency
+
+    def clear_latencies(self):
+        self.latencies.clear()
+        self.suppressed = 0
+
+    def latency_summary(self):
+        """Per command (setting name, or 'batch') -> (count, mean ms, max ms)."""
+        groups = defaultdict(list)
+        for command, seconds in list(self.latencies):
+            if ";" in command:
+                name = "batch"
+            else:
+                match = _SETTING.match(command.strip())
+                name = match.group(2) if match else command.split()[0]
+            groups[name].append(seconds * 1000)
+        return {name: (len(v), sum(v) / len(v), max(v)) for name, v in groups.items()}
+
+    def report(self):
+        summary = self.latency_summary()
+        if not summary:
+            return f"[Laserbox] no command sent ({self.suppressed} redundant writes skipped)"
+        lines = [f"[Laserbox] {sum(n for n, _, _ in summary.values())} transactions, "
+                 f"{self.suppressed} redundant writes skipped"]
+        for name, (n, mean, peak) in sorted(summary.items()):
+            lines.append(f"  {name:<32} {n:5d} x  {mean:6.2f} ms (max {peak:.2f} ms)")
+        return "\n".join(lines)
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+############################################################################################################
+# Viewport-aware decimation of the Live frames
+
+def viewport_window(frame_shape, viewport, margin=0.25):
+    """
+    Computes the part of the frame that is visible on the Napari canvas, and the decimation step
+    that matches the screen resolution.
+
+    Parameters:
+        frame_shape (tuple): (height, width) of the full camera frame
+        viewport (tuple): (canvas_height, canvas_width, zoom, center_y, center_x) or None
+        margin (float): extra fraction of the visible area kept around it, so small pans don't show empty borders
+
+    Returns:
+        tuple: (y0, y1, x0, x1, step) in full frame pixels
+    """
+    height, width = frame_shape[:2]
+
+    if viewport is None:
+        return 0, height, 0, width, 1
+
+    canvas_h, canvas_w, zoom, center_y, center_x = viewport
+    if zoom <= 0 or canvas_h <= 0 or canvas_w <= 0:
+        return 0, height, 0, width, 1
+
+    # Screen pixels per frame pixel -> keep ~1 frame pixel per screen pixel
+    step = max(1, int(1.0 / zoom))
+
+    # Visible half-sizes in frame pixels (world coordinates = full frame pixels)
+    half_h = 0.5 * canvas_h / zoom * (1 + margin)
+    half_w = 0.5 * canvas_w / zoom * (1 + margin)
+
+    y0 = max(0, int(center_y - half_h))
+    y1 = min(height, int(np.ceil(center_y + half_h)))
+    x0 = max(0, int(center_x - half_w))
+    x1 = min(width, int(np.ceil(center_x + half_w)))
+
+    # Viewport is completely outside of the frame, send the whole (decimated) frame
+    if y1 <= y0 or x1 <= x0:
+        return 0, height, 0, width, step
+
+    return y0, y1, x0, x1, step
+
+
+def decimate_for_display(frame, viewport, mirror=False, margin=0.25):
+    """
+    Crops and decimates a frame for display only (the full frame is never changed).
+
+    Returns:
+        tuple: (display_frame, offset_y, offset_x, step), where the offsets/step are what
+        the Napari layer needs as translate/scale to stay in full frame coordinates
+    """
+    if mirror:
+        frame = np.fliplr(frame)
+
+    y0, y1, x0, x1, step = viewport_window(frame.shape, viewport, margin)
+    display = np.ascontiguousarray(frame[y0:y1:step, x0:x1:step])
+
+    return display, y0, x0, step
@@ -0,0 +1,287 @@
+import csv
+import json
+from dataclasses import asdict, fields, replace
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtWidgets import (QWidget, QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QTableView, QPushButton,
+                               QLabel, QLineEdit, QHeaderView, QFileDialog, QMessageBox, QAbstractItemView)
+
+from Extra_Files.Stack_Parameters import Stack_Parameters, _to_float, _to_int
+from Extra_Files.Acquisition_Timing import TIME_UNITS
+from Extra_Files.Tiling import Tile_Grid, tile_fov, DEFAULT_OVERLAP
+
+
+############################################################################################################
+# Position table: the positions of large mosaics in a model/view table, instead of one tab per position
+
+# Columns: field, header (Nsteps is derived, so read-only)
+TABLE_COLUMNS = [
+    ('x', "X (µm)"), ('z', "Z (µm)"), ('theta', "θ (º)"),
+    ('yi', "Yi (µm)"), ('yf', "Yf (µm)"), ('Ystep', "Y step (µm)"), ('Nsteps', "Steps"),
+    ('Tpoints', "T points"), ('Tstep', "T step"), ('Tstep_unit', "T unit"),
+]
+POSITION_FIELDS = [f.name for f in fields(Stack_Parameters)]
+
+
+def _parse_field(name, value, default):
+    """Value of a Stack_Parameters field from a text/JSON value (default if missing)."""
+    if value is None or value == "":
+        return default
+    if name in ('mode_yl', 'mode_ly'):
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes")
+    if name == 'Tpoints':
+        return _to_int(str(value))
+    if name == 'Tstep_unit':
+        return value if value in TIME_UNITS else default
+    return _to_float(str(value))
+
+
+def position_from_dict(values, template=None):
+    """Stack_Parameters from a dictionary; the missing fields come from the template."""
+    template = template or Stack_Parameters()
+    return Stack_Parameters(**{name: _parse_field(name, values.get(name), getattr(template, name))
+                               for name in POSITION_FIELDS})
+
+
+def load_positions(path, template=None):
+    """Reads the positions of a .csv (one column per field) or .json (list of dictionaries) file."""
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            data = json.load(f)
+        rows = data.get("positions", []) if isinstance(data, dict) else data
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    return [position_from_dict(row, template) for row in rows]
+
+
+def save_positions(path, positions):
+    """Writes the positions to a .csv or .json file."""
+    rows = [asdict(p) for p in positions]
+    if path.lower().endswith(".json"):
+        with open(path, "w") as f:
+            json.dump({"positions": rows}, f, indent=4)
+    else:
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=POSITION_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class Position_Table_Model(QAbstractTableModel):
+    """Table model of Stack_Parameters (one row per position). Only the visible cells are ever formatted."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._positions = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._positions)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(TABLE_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return TABLE_COLUMNS[section][1]
+        return f"Pos. {section + 1}"
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if TABLE_COLUMNS[index.column()][0] != 'Nsteps':
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        value = getattr(self._positions[index.row()], TABLE_COLUMNS[index.column()][0])
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            # The editor gets the full precision: committing it unchanged must not round the coordinates
+            return f"{value:.2f}" if role == Qt.DisplayRole else repr(value)
+        return str(value)
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        name = TABLE_COLUMNS[index.column()][0]
+        position = self._positions[index.row()]
+        self._positions[index.row()] = replace(position, **{name: _parse_field(name, value, getattr(position, name))})
+        # The number of steps of the row may change too
+        self.dataChanged.emit(self.index(index.row(), 0), self.index(index.row(), len(TABLE_COLUMNS) - 1))
+        return True
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def positions(self):
+        return list(self._positions)
+
+    def set_positions(self, positions):
+        self.beginResetModel()
+        self._positions = list(positions)
+        self.endResetModel()
+
+    def append_positions(self, positions):
+        if not positions:
+            return
+        start = len(self._positions)
+        self.beginInsertRows(QModelIndex(), start, start + len(positions) - 1)
+        self._positions.extend(positions)
+        self.endInsertRows()
+
+    def remove_rows(self, rows):
+        """Removes the rows (any order), in contiguous blocks from the bottom."""
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._positions[first:last + 1]
+            self.endRemoveRows()
+
+    def all_complete(self):
+        return bool(self._positions) and all(p.complete for p in self._positions)
+
+    def snapshot(self):
+        """Parameters of every position, as the YStack_Widget.get_zstackwidget_parameters entries."""
+        return [p.to_dict() for p in self._positions]
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+class Grid_Dialog(QDialog):
+    """Region (edges of the area to cover), overlap, angles and tile size of a serpentine tile grid."""
+
+    def __init__(self, parent=None, x=None, z=None, fov=None):
+        super().__init__(parent)
+        self.setWindowTitle("Generate Tile Grid")
+        fov_x, fov_z = fov or tile_fov()
+
+        layout = QGridLayout(self)
+        self.edits = {}
+        rows = [("x_min", "X from (µm)", x), ("x_max", "X to (µm)", x),
+                ("z_min", "Z from (µm)", z), ("z_max", "Z to (µm)", z),
+                ("overlap", "Overlap (%)", DEFAULT_OVERLAP * 100),
+                ("fov_x", "Tile X (µm)", fov_x), ("fov_z", "Tile Z (µm)", fov_z),
+                ("thetas", "Angles (º, optional)", "")]
+        for row, (key, label, value) in enumerate(rows):
+            layout.addWidget(QLabel(label), row, 0)
+            self.edits[key] = QLineEdit(value if isinstance(value, str) else "" if value is None else f"{value:g}")
+            layout.addWidget(self.edits[key], row, 1)
+        self.edits["thetas"].setPlaceholderText("e.g. 0, 90, 180, 270")
+
+        buttons = QHBoxLayout()
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        ok_button = QPushButton("Generate")
+        ok_button.clicked.connect(self.accept)
+        buttons.addStretch()
+        buttons.addWidget(cancel_button)
+        buttons.addWidget(ok_button)
+        layout.addLayout(buttons, len(rows), 0, 1, 2)
+
+    def grid(self):
+        """The Tile_Grid of the values, or None if a value is missing or invalid."""
+        values = {key: _to_float(edit.text()) for key, edit in self.edits.items() if key != "thetas"}
+        thetas = [_to_float(text) for text in self.edits["thetas"].text().split(",") if text.strip()]
+        if None in values.values() or None in thetas or values["fov_x"] <= 0 or values["fov_z"] <= 0:
+            return None
+        try:
+            return Tile_Grid(values["x_min"], values["x_max"], values["z_min"], values["z_max"],
+                             values["fov_x"], values["fov_z"], values["overlap"] / 100, thetas)
+        except ValueError:
+            return None
+
+
+class Position_Table_Widget(QWidget):
+    """
+    Window with the position table: editing, CSV/JSON import and export, and tile grid generation.
+    New positions take the parameters they don't set (Y range, step, time) from template(),
+    the tiles their size from fov() (the camera ROI and binning).
+    """
+
+    def __init__(self, model, template=None, fov=None, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Position Table")
+        self.model = model
+        self.template = template or Stack_Parameters
+        self.fov = fov or tile_fov
+
+        layout = QVBoxLayout(self)
+
+        self.view = QTableView()
+        self.view.setModel(model)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        # Fixed row height: no per-row size computation with thousands of rows
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(22)
+        layout.addWidget(self.view)
+
+        self.count_label = QLabel("")
+        layout.addWidget(self.count_label)
+
+        buttons = QHBoxLayout()
+        for text, slot in (("Import...", self.on_import), ("Export...", self.on_export),
+                           ("Grid...", self.on_grid), ("Remove", self.on_remove), ("Clear", self.on_clear)):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        for signal in (model.modelReset, model.rowsInserted, model.rowsRemoved):
+            signal.connect(self._update_count)
+        self._update_count()
+        self.resize(820, 500)
+
+    def _update_count(self, *args):
+        self.count_label.setText(f"{self.model.rowCount()} positions")
+
+    def on_import(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Positions", "", "Positions (*.csv *.json)")
+        if not path:
+            return
+        try:
+            positions = load_positions(path, self.template())
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            QMessageBox.warning(self, "Error", f"Could not import the positions:\n{e}")
+            return
+        self.model.append_positions(positions)
+
+    def on_export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Positions", "positions.csv", "CSV (*.csv);;JSON (*.json)")
+        if not path:
+            return
+        try:
+            save_positions(path, self.model.positions())
+        except OSError as e:
+            QMessageBox.warning(self, "Error", f"Could not export the positions:\n{e}")
+
+    def on_grid(self):
+        template = self.template()
+        dialog = Grid_Dialog(self, template.x, template.z, self.fov())
+        if dialog.exec() != QDialog.Accepted:
+            return
+        grid = dialog.grid()
+        if grid is None:
+            QMessageBox.warning(self, "Error", "Fill in all the grid values (overlap below 100%).")
+            return
+        angles, rows, columns = grid.shape
+        print(f"[Tiling] {len(grid)} tiles: {angles} angle(s) x {rows} rows x {columns} columns, "
+              f"{grid.overlap:.0%} overlap")
+        self.model.append_positions(grid.positions(template))
+
+    def on_remove(self):
+        self.model.remove_rows(index.row() for index in self.view.selectionModel().selectedRows())
+
+    def on_clear(self):
+        self.model.set_positions([])
@@ -6,6 +6,8 @@ import sys
 from PySide6.QtWidgets import QApplication, QPushButton, QVBoxLayout, QWidget
 from PySide6.QtCore import QThread, Signal, Slot, QObject
 
+from Extra_Files.RTC5_List_Program import get_sweep_program
+
 
 class RTC5_Board():
 
@@ -54,23 +56,10 @@ class RTC5_Board():
         """
         Function to form a lightsheet
         It jumps to Xtop, marks from Xtop to Xbottom.
-        It's supposed to use in a loop
+        It's supposed to use in a loop: the list is only rebuilt when Xtop, Xbottom or speed change
         """
-        self.rtc5_board.set_start_list(1)
-
         Xi = -Xtop
-        Yi = 0
         Xf = -Xbottom
-        Yf = 0
-
-        self.rtc5_board.set_jump_speed(ctypes.c_double(800000))
-        self.rtc5_board.set_mark_speed(ctypes.c_double(speed))
-
-        self.rtc5_board.jump_abs(ctypes.c_int(Xi), ctypes.c_int(Yi))
-        self.rtc5_board.mark_abs(ctypes.c_int(Xf), ctypes.c_int(Yf))
-
-        self.rtc5_board.set_end_of_list()
 
-        self.rtc5_board.execute_list(1)
+        get_sweep_program(self.rtc5_board).sweep(Xi, Xf, speed)
 
-        self.rtc5_board.execute_list(1)
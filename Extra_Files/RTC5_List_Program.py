@@ -0,0 +1,104 @@
+import ctypes
+import threading
+
+from Extra_Files.Scan_Patterns import SINGLE_SWEEP
+
+
+############################################################################################################
+# Persistent light-sheet sweep in the RTC5 list memory
+
+JUMP_SPEED = 800000         # bits/ms
+LIST = 1                    # List memory used for the sweep
+LIVE_REPEATS = 10000        # Sweeps executed by the board per execute_list in the Live (list_repeat/list_until)
+
+BUSY_BIT = 0x00000001
+INTERNAL_BUSY_BIT = 0x00008000
+
+
+class Sweep_Program:
+    """
+    Keeps the light-sheet sweep (jump to top, mark to bottom, or a Scan_Pattern) loaded in the RTC5 list memory.
+
+    The list is only rebuilt when the sweep changes (top, bottom, speed, offset, pattern, repeats);
+    otherwise a sweep is a single execute_list call. The list can also loop on the board (repeats > 1).
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self._lock = threading.Lock()
+        self._loaded = None         # Parameters of the list in memory (None: list unknown / overwritten)
+        self.rebuilds = 0
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def is_busy(self):
+        status = ctypes.c_uint()
+        position = ctypes.c_int()
+        self.board.get_status(ctypes.byref(status), ctypes.byref(position))
+        return bool(status.value & (BUSY_BIT | INTERNAL_BUSY_BIT))
+
+    def invalidate(self):
+        """Forgets the loaded sweep (call it when something else writes into the list)."""
+        with self._lock:
+            self._loaded = None
+
+    def load(self, top, bottom, speed, offset=0, repeats=1, pattern=None):
+        """Writes the sweep into the list memory, unless the same sweep is already there. Returns True if rebuilt."""
+        pattern = pattern or SINGLE_SWEEP
+        params = (int(top), int(bottom), float(speed), int(offset), max(1, int(repeats)), pattern.key())
+
+        with self._lock:
+            if params == self._loaded:
+                return False
+
+            # A list can't be rewritten while it is being executed
+            if self.is_busy():
+                self.board.stop_execution()
+
+            top, bottom, speed, offset, repeats, _ = params
+            board = self.board
+
+            board.set_start_list(LIST)
+            board.set_jump_speed(ctypes.c_double(JUMP_SPEED))
+            board.set_mark_speed(ctypes.c_double(speed))
+            if repeats > 1:
+                board.list_repeat()
+            # All the marks of the pattern, jumping only when a mark doesn't start where the previous one ended
+            current = None
+            for start, end in pattern.segments(top, bottom, offset):
+                if start != current:
+                    board.jump_abs(ctypes.c_int(start[0]), ctypes.c_int(start[1]))
+                board.mark_abs(ctypes.c_int(end[0]), ctypes.c_int(end[1]))
+                current = end
+            if repeats > 1:
+                board.list_until(ctypes.c_uint(repeats))
+            board.set_end_of_list()
+
+            self._loaded = params
+            self.rebuilds += 1
+            return True
+
+    def execute(self):
+        """Runs the loaded list once (a single sweep, or its repeats)."""
+        self.board.execute_list(LIST)
+
+    def sweep(self, top, bottom, speed, offset=0, pattern=None):
+        """One sweep (or pattern) from top to bottom. Only the first sweep with new parameters rebuilds the list."""
+        self.load(top, bottom, speed, offset, pattern=pattern)
+        self.execute()
+
+    def stop(self):
+        """Stops the list being executed (e.g. the Live loop)."""
+        self.board.stop_execution()
+
+
+# One program per board, shared by the Scanner widget and the Y-stack algorithms
+_programs = {}
+
+
+def get_sweep_program(board):
+    program = _programs.get(id(board))
+    if program is None or program.board is not board:
+        program = Sweep_Program(board)
+        _programs[id(board)] = program
+    return program
@@ -0,0 +1,214 @@
+import os
+import shutil
+import sys
+import threading
+import time
+
+from Extra_Files.Acquisition_Timing import TIME_UNITS
+
+
+############################################################################################################
+# Pre-flight resource planner: checks that a Y-stack experiment fits before it starts
+
+READ_BATCH = 250            # largest batch of frames read from a camera at once (Y_Stack_Algorithms)
+DISK_MARGIN = 0.9           # warn above this fraction of the free disk space
+MEMORY_MARGIN = 0.8         # warn above this fraction of the available memory
+BENCHMARK_MB = 128          # MB written to measure the disk bandwidth
+
+# Measured write bandwidth per disk (MB/s), kept for the session
+_disk_bandwidth = {}
+_benchmark_lock = threading.Lock()
+
+
+def available_memory():
+    """Available physical memory in bytes (None if unknown)."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullAvailPhys
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _disk(directory):
+    return os.path.splitdrive(os.path.abspath(directory))[0] or os.stat(directory).st_dev
+
+
+def cached_disk_bandwidth(directory):
+    """Write bandwidth (MB/s) of the disk of directory if it was already measured, else None."""
+    try:
+        return _disk_bandwidth.get(_disk(directory))
+    except OSError:
+        return None
+
+
+def measure_disk_bandwidth(directory, size_mb=BENCHMARK_MB, stop_event=None):
+    """
+    Sustained write bandwidth (MB/s) of the disk of directory: writes size_mb to a temporary file
+    (flushed to the disk) and deletes it. Measured once per disk per session.
+    Blocks for the whole benchmark (YStack_Widget runs it in a worker thread on the first pre-flight
+    check); returns None, without keeping a result, if stop_event is set before it finishes.
+    """
+    with _benchmark_lock:
+        try:
+            disk = _disk(directory)
+        except OSError as e:
+            print(f"Could not measure the disk bandwidth of {directory}: {e}")
+            return None
+        if disk in _disk_bandwidth:
+            return _disk_bandwidth[disk]
+
+        path = os.path.join(directory, ".bandwidth_test.tmp")
+        block = os.urandom(1024 * 1024)
+        try:
+            t0 = time.perf_counter()
+            with open(path, "wb", buffering=0) as f:
+                for _ in range(size_mb):
+                    if stop_event is not None and stop_event.is_set():
+                        return None
+                    f.write(block)
+                os.fsync(f.fileno())
+            seconds = time.perf_counter() - t0
+        except OSError as e:
+            print(f"Could not measure the disk bandwidth of {directory}: {e}")
+            return None
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        _disk_bandwidth[disk] = size_mb * 1.048576 / seconds
+        return _disk_bandwidth[disk]
+
+
+def _format_bytes(size):
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} PB"
+
+
+def _format_seconds(seconds):
+    hours, rem = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rem, 60)
+    return f"{hours} h. {minutes} min." if hours else f"{minutes} min. {seconds} sec."
+
+
+class Resource_Plan:
+    """
+    Resources needed by an acquisition, compared with what the machine has.
+        stacks  - per position: the Y-stack tab parameters plus 'channels'
+        cameras - (width_x, height_y, binning, dynamic_range) of every selected camera
+        timing  - the pre-run Acquisition_Timing estimate
+    The disk bandwidth is the one measured for the disk of the save directory (None if it wasn't).
+    errors block the start, warnings ask for a confirmation.
+    """
+
+    def __init__(self, stacks, cameras, save_dir, timing, same_timepoints=True):
+        self.errors = []
+        self.warnings = []
+
+        frame_bytes = [int(w / b) * int(h / b) * (2 if dr == 16 else 1) for w, h, b, dr in cameras]
+        slices = [s['Nsteps'] * max(1, s['Tpoints']) * s['channels'] for s in stacks]
+
+        # 1) Data volume (uncompressed): T x C x Y steps x frame per camera
+        self.data_bytes = sum(slices) * sum(frame_bytes)
+        try:
+            self.free_bytes = shutil.disk_usage(save_dir).free
+        except OSError:
+            self.free_bytes = None
+
+        # 2) Peak memory: host buffer of a full stack per camera, plus the batch read from it
+        max_steps = max((s['Nsteps'] for s in stacks), default=0)
+        self.memory_bytes = sum((max_steps + min(max_steps, READ_BATCH)) * fb for fb in frame_bytes)
+        self.available_memory = available_memory()
+
+        # 3) Write bandwidth: the stacks have to be written as fast as the cameras acquire them
+        self.required_MBps = timing.acquisition_MBps()
+        self.disk_MBps = cached_disk_bandwidth(save_dir)
+        if self.disk_MBps:
+            timing.seed_write_MBps(self.disk_MBps)
+
+        # 4) Duration and data of a time point (all positions if they share the time points) vs time spacing
+        # (the writes only count with a measured disk, not with the default rate of the timing model)
+        write_Bps = self.disk_MBps * 1e6 if self.disk_MBps else None
+
+        def stack_seconds(n_slices):
+            write_s = n_slices * sum(frame_bytes) / write_Bps if write_Bps else 0.0
+            return n_slices * timing.slice_s + timing.channel_s + write_s
+
+        self.timepoint_seconds = [s['channels'] * stack_seconds(s['Nsteps']) for s in stacks]
+        self.timepoint_bytes = [s['channels'] * s['Nsteps'] * sum(frame_bytes) for s in stacks]
+        if same_timepoints:
+            self.timepoint_seconds = [sum(self.timepoint_seconds)]
+            self.timepoint_bytes = [sum(self.timepoint_bytes)]
+        self.spacings = [s['Tstep'] * TIME_UNITS.get(s['Tstep_unit'], 1) for s in stacks]
+        self.total_seconds = timing.estimate_s
+
+        self._check(stacks, same_timepoints)
+
+    def _check(self, stacks, same_timepoints):
+        if self.free_bytes is not None:
+            if self.data_bytes > self.free_bytes:
+                self.errors.append(f"Not enough disk space: {_format_bytes(self.data_bytes)} needed, "
+                                   f"{_format_bytes(self.free_bytes)} free.")
+            elif self.data_bytes > DISK_MARGIN * self.free_bytes:
+                self.warnings.append(f"The data ({_format_bytes(self.data_bytes)}) fills more than "
+                                     f"{DISK_MARGIN:.0%} of the free disk space ({_format_bytes(self.free_bytes)}).")
+
+        if self.available_memory is not None:
+            if self.memory_bytes > self.available_memory:
+                self.errors.append(f"The camera buffers ({_format_bytes(self.memory_bytes)}) don't fit in the "
+                                   f"available memory ({_format_bytes(self.available_memory)}): use fewer Y steps.")
+            elif self.memory_bytes > MEMORY_MARGIN * self.available_memory:
+                self.warnings.append(f"The camera buffers ({_format_bytes(self.memory_bytes)}) use more than "
+                                     f"{MEMORY_MARGIN:.0%} of the available memory.")
+
+        if self.disk_MBps is not None and self.disk_MBps < self.required_MBps:
+            self.warnings.append(f"The disk writes {self.disk_MBps:.0f} MB/s, the cameras acquire "
+                                 f"{self.required_MBps:.0f} MB/s: writing will slow down every stack.")
+
+        # In the acquisition the time spacing is waited after every time point: the data of a time point
+        # has to be written at (its bytes / time spacing) to keep up, compared with the measured disk
+        tpoints = [max(1, s['Tpoints']) for s in stacks]
+        spacings = self.spacings[:1] if same_timepoints else self.spacings
+        pairs = zip(self.timepoint_bytes, self.timepoint_seconds, spacings, tpoints)
+        for idx, (nbytes, duration, spacing, n) in enumerate(pairs):
+            if n <= 1 or spacing <= 0:
+                continue
+            where = "A time point" if same_timepoints else f"Position {idx + 1}: a time point"
+            spacing_MBps = nbytes / spacing / 1e6
+            if self.disk_MBps is not None and spacing_MBps > self.disk_MBps:
+                self.warnings.append(f"{where} writes {_format_bytes(nbytes)} per time spacing "
+                                     f"({_format_seconds(spacing)}): {spacing_MBps:.0f} MB/s needed, the disk "
+                                     f"writes {self.disk_MBps:.0f} MB/s. Time points will start "
+                                     f"{_format_seconds(duration + spacing)} apart.")
+            elif spacing < duration:
+                self.warnings.append(f"{where} takes {_format_seconds(duration)}, longer than the time spacing "
+                                     f"({_format_seconds(spacing)}): time points will start "
+                                     f"{_format_seconds(duration + spacing)} apart.")
+
+    def summary(self):
+        lines = [f"Data volume: {_format_bytes(self.data_bytes)} (uncompressed)"
+                 + (f", {_format_bytes(self.free_bytes)} free" if self.free_bytes is not None else ""),
+                 f"Peak memory: {_format_bytes(self.memory_bytes)}"
+                 + (f", {_format_bytes(self.available_memory)} available" if self.available_memory is not None else ""),
+                 f"Write bandwidth: {self.required_MBps:.0f} MB/s required"
+                 + (f", {self.disk_MBps:.0f} MB/s measured" if self.disk_MBps is not None else ", disk not measured yet"),
+                 "Time point: " + ", ".join(_format_seconds(t) for t in self.timepoint_seconds),
+                 f"Total duration: {_format_seconds(self.total_seconds)}"]
+        return "\n".join(lines)
@@ -0,0 +1,72 @@
+############################################################################################################
+# Light-sheet scan patterns executed by the RTC5 board as a single list
+
+# Name in the Scanner widget -> what the "N" field sets
+SCAN_PATTERNS = {
+    "Single Sweep":   None,
+    "Repeated Sweep": "repeats",
+    "Bidirectional":  "repeats",
+    "Tiled Sheet":    "tiles",
+}
+
+
+class Scan_Pattern:
+    """
+    Sweeps made by the board during one exposure.
+
+    repeats        - sweeps per exposure (per tile), for a more uniform illumination
+    bidirectional  - every other sweep goes back from bottom to top (no jump back between sweeps)
+    tiles          - sheets at several beam offsets, tile_spacing bits apart and centered on the offset
+    """
+
+    def __init__(self, name="Single Sweep", repeats=1, tiles=1, tile_spacing=0, bidirectional=False):
+        self.name = name
+        self.repeats = max(1, int(repeats))
+        self.tiles = max(1, int(tiles))
+        self.tile_spacing = int(tile_spacing)
+        self.bidirectional = bool(bidirectional)
+
+    def key(self):
+        """Identifies the pattern (the RTC5 list is only rebuilt when it changes)."""
+        return (self.repeats, self.tiles, self.tile_spacing, self.bidirectional)
+
+    def offsets(self, offset=0):
+        """Beam offsets of the tiles."""
+        first = offset - (self.tiles - 1) * self.tile_spacing / 2
+        return [int(round(first + n * self.tile_spacing)) for n in range(self.tiles)]
+
+    def segments(self, top, bottom, offset=0):
+        """List of marks ((x_start, y), (x_end, y)), in the order they are executed."""
+        segments = []
+        for y in self.offsets(offset):
+            for n in range(self.repeats):
+                if self.bidirectional and n % 2 == 1:
+                    segments.append(((bottom, y), (top, y)))
+                else:
+                    segments.append(((top, y), (bottom, y)))
+        return segments
+
+    def expected_ms(self, top, bottom, speed):
+        """Duration of the marks of the pattern (the jumps are negligible at the jump speed)."""
+        return len(self.segments(top, bottom)) * abs(int(top) - int(bottom)) / max(float(speed), 1e-9)
+
+    def to_dict(self):
+        return {"name": self.name, "repeats": self.repeats, "tiles": self.tiles,
+                "tile_spacing": self.tile_spacing, "bidirectional": self.bidirectional}
+
+    def __repr__(self):
+        return f"Scan_Pattern({self.to_dict()})"
+
+
+def make_pattern(name, n=1, spacing=0):
+    """Builds the pattern selected in the Scanner widget."""
+    if name == "Repeated Sweep":
+        return Scan_Pattern(name, repeats=n)
+    if name == "Bidirectional":
+        return Scan_Pattern(name, repeats=n, bidirectional=True)
+    if name == "Tiled Sheet":
+        return Scan_Pattern(name, tiles=n, tile_spacing=spacing)
+    return Scan_Pattern("Single Sweep")
+
+
+SINGLE_SWEEP = Scan_Pattern()
@@ -0,0 +1,151 @@
+import ctypes
+import time
+from collections import deque
+
+import numpy as np
+
+from Extra_Files.RTC5_List_Program import BUSY_BIT, INTERNAL_BUSY_BIT, JUMP_SPEED
+
+
+############################################################################################################
+# RTC5 status: precise "sweep finished" waits and sweep-duration statistics
+
+def expected_sweep_ms(top, bottom, speed, jump_from=None):
+    """Duration of a sweep in ms from its length (bits) and mark speed (bits/ms), plus the jump back to top."""
+    duration = abs(int(top) - int(bottom)) / max(float(speed), 1e-9)
+    if jump_from is not None:
+        duration += abs(int(jump_from) - int(top)) / JUMP_SPEED
+    return duration
+
+
+def matched_speed(top, bottom, exposure_ms):
+    """Mark speed (bits/ms) for which one sweep lasts exactly one camera exposure."""
+    return abs(int(top) - int(bottom)) / max(float(exposure_ms), 1e-9)
+
+
+class Scanner_Monitor:
+    """
+    Waits for the end of the sweeps of the RTC5 board: a short busy spin (sweeps that are almost over
+    are caught without the sleep granularity) followed by short sleeps, with a timeout.
+    The measured sweep durations are kept to build histograms.
+    """
+
+    def __init__(self, board, spin=0.002, poll=0.0005, maxlen=10000):
+        self.board = board
+        self.spin = spin        # s of busy spinning before sleeping between the polls
+        self.poll = poll        # s of sleep between polls after the spin
+        self.durations = deque(maxlen=maxlen)      # ms
+        self.timeouts = 0
+        self._started = None
+        self._expected = None
+
+        self._status = ctypes.c_uint()
+        self._position = ctypes.c_int()
+
+    def is_busy(self):
+        self.board.get_status(ctypes.byref(self._status), ctypes.byref(self._position))
+        return bool(self._status.value & (BUSY_BIT | INTERNAL_BUSY_BIT))
+
+    def wait_idle(self, timeout=1.0, stop_event=None):
+        """Waits until the list is not busy anymore. Returns False on timeout (or stop)."""
+        t0 = time.perf_counter()
+        while self.is_busy():
+            elapsed = time.perf_counter() - t0
+            if elapsed > timeout or (stop_event is not None and stop_event.is_set()):
+                return False
+            if elapsed > self.spin:
+                time.sleep(self.poll)
+        return True
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def sweep_started(self, expected_ms=None):
+        """Call it right after execute_list."""
+        self._started = time.perf_counter()
+        self._expected = expected_ms
+
+    def wait_sweep_finished(self, timeout=None, stop_event=None):
+        """
+        Waits for the end of the last started sweep and records its duration.
+        Returns the duration in ms, or None on timeout / stop / no sweep started.
+        """
+        if self._started is None:
+            return None
+
+        if timeout is None:
+            timeout = 0.5 + (2 * self._expected / 1000 if self._expected else 1.0)
+
+        # The spin and timeout count from the start of the sweep: sleep through most of it first
+        if self._expected:
+            remaining = self._expected / 1000 - (time.perf_counter() - self._started) - self.spin
+            if remaining > 0:
+                time.sleep(remaining)
+
+        started, self._started = self._started, None
+        if not self.wait_idle(max(0.0, timeout - (time.perf_counter() - started)), stop_event):
+            self.timeouts += 1
+            return None
+
+        duration = (time.perf_counter() - started) * 1000
+        self.durations.append(duration)
+        return duration
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def clear(self):
+        self.durations.clear()
+        self.timeouts = 0
+
+    def histogram(self, bins=20):
+        """(counts, bin edges in ms) of the recorded sweep durations."""
+        return np.histogram(np.fromiter(self.durations, dtype=float), bins=bins)
+
+    def summary(self):
+        if not self.durations:
+            return {"sweeps": 0, "timeouts": self.timeouts}
+        d = np.fromiter(self.durations, dtype=float)
+        return {
+            "sweeps":      int(d.size),
+            "timeouts":    self.timeouts,
+            "mean_ms":     float(d.mean()),
+            "std_ms":      float(d.std()),
+            "min_ms":      float(d.min()),
+            "max_ms":      float(d.max()),
+            "expected_ms": self._expected,
+        }
+
+    def report(self, exposure_ms=None, sweep=None, bins=10):
+        """
+        Text summary (with a histogram) of the sweeps, compared to the camera exposure if given.
+        With the sweep (top, bottom, mark_speed) too, it suggests the mark speed matched to the exposure.
+        """
+        s = self.summary()
+        if s["sweeps"] == 0:
+            return f"[Scanner] no sweep recorded ({s['timeouts']} timeouts)"
+
+        lines = [f"[Scanner] {s['sweeps']} sweeps: {s['mean_ms']:.2f} ± {s['std_ms']:.2f} ms "
+                 f"(min {s['min_ms']:.2f}, max {s['max_ms']:.2f}, {s['timeouts']} timeouts)"]
+        if exposure_ms:
+            lines.append(f"[Scanner] camera exposure {exposure_ms:.2f} ms, sweep/exposure = {s['mean_ms'] / exposure_ms:.2f}")
+            if sweep is not None and sweep[0] is not None:
+                top, bottom, speed = sweep
+                lines.append(f"[Scanner] mark speed {float(speed):.1f} bits/ms, matched to the exposure: "
+                             f"{matched_speed(top, bottom, exposure_ms):.1f} bits/ms")
+
+        counts, edges = self.histogram(bins)
+        top = max(int(counts.max()), 1)
+        for n, c in enumerate(counts):
+            lines.append(f"  {edges[n]:8.2f}-{edges[n + 1]:8.2f} ms | {'#' * int(round(40 * c / top))} {int(c)}")
+        return "\n".join(lines)
+
+
+# One monitor per board, shared by the Scanner widget and the Y-stack algorithms
+_monitors = {}
+
+
+def get_scanner_monitor(board):
+    monitor = _monitors.get(id(board))
+    if monitor is None or monitor.board is not board:
+        monitor = Scanner_Monitor(board)
+        _monitors[id(board)] = monitor
+    return monitor
@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from collections import deque
+
+import numpy as np
+from pipython import pitools
+
+
+############################################################################################################
+# Settle detection of the stages for the acquisition engine (replaces pitools.waitontarget per slice)
+
+# Tolerance, dwell and timeout of the settle criterion, editable without changing the code
+SETTLE_SETTINGS_JSON = os.path.join(os.path.dirname(__file__), "Settle_Settings.json")
+
+TOLERANCE = 0.0001      # mm (0.1 um) from the target that counts as settled (default of the settings)
+DWELL = 0.003           # s the position must stay within the tolerance (default of the settings)
+POLL = 0.0005           # s between the position queries
+TIMEOUT = 5.0           # s before falling back to the controller's on-target (default of the settings)
+PRESLEEP = 0.8          # fraction of the learned settle time slept before the first query
+LEARNING_RATE = 0.2     # weight of a new measurement in the learned settle times
+
+
+def load_settle_settings(path=SETTLE_SETTINGS_JSON):
+    """(tolerance in mm, dwell in s, timeout in s) from the settings file (the defaults for what is missing)."""
+    try:
+        with open(path) as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        settings = {}
+    try:
+        return (float(settings.get("tolerance_um", TOLERANCE * 1000)) / 1000,
+                float(settings.get("dwell_ms", DWELL * 1000)) / 1000,
+                float(settings.get("timeout_s", TIMEOUT)))
+    except (TypeError, ValueError) as e:
+        print(f"[Settle] invalid settings in {path} ({e}), using the defaults")
+        return TOLERANCE, DWELL, TIMEOUT
+
+
+class Settle_Detector:
+    """
+    Waits for an axis to settle at its target: the position (one qPOS per poll) must stay within
+    the tolerance for the minimum dwell time, so passing through the target does not count. A larger
+    tolerance settles sooner than the controller's on-target window, which is only checked (qONT)
+    after the timeout. The settle time of each step size is learned, so most of the move is slept
+    through before polling. Every settle time is recorded.
+    """
+
+    def __init__(self, pidevice, tolerance=TOLERANCE, dwell=DWELL, poll=POLL, timeout=TIMEOUT, presleep=PRESLEEP):
+        self.pidevice = pidevice
+        self.tolerance = tolerance
+        self.dwell = dwell
+        self.poll = poll
+        self.timeout = timeout
+        self.presleep = presleep
+
+        self._learned = {}          # (axis, step in 0.1 um) -> settle time (s)
+        self._last_target = {}      # axis -> last target
+        self.records = deque(maxlen=100000)     # (axis, step in mm, settle time in s, polls)
+        self.timeouts = 0
+
+    def _step_key(self, axis, step):
+        return axis, int(round(abs(step) * 10000))
+
+    def expected_time(self, axis, step):
+        """Learned settle time of a step (None if that step size was never measured)."""
+        return self._learned.get(self._step_key(axis, step))
+
+    def wait(self, axis, target, stop_event=None):
+        """
+        Waits until axis settles at target (call it right after the MOV).
+        Returns the settle time in s, or None if stopped.
+        """
+        t0 = time.perf_counter()
+        previous = self._last_target.get(axis)
+        self._last_target[axis] = target
+        step = abs(target - previous) if previous is not None else None
+
+        # 1) Sleep through most of the move
+        expected = self.expected_time(axis, step) if step is not None else None
+        if expected:
+            time.sleep(self.presleep * expected)
+
+        # 2) Poll the position until it stays within the tolerance for the dwell time
+        polls = 0
+        inside_since = None
+        timed_out = False
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return None
+
+            position = self.pidevice.qPOS(axis)[axis]
+            polls += 1
+            now = time.perf_counter()
+
+            if abs(position - target) <= self.tolerance:
+                if inside_since is None:
+                    inside_since = now
+                if now - inside_since >= self.dwell:
+                    break
+            else:
+                inside_since = None
+
+            if now - t0 > self.timeout:
+                print(f"[Settle] axis {axis} not within {self.tolerance * 1000:.2f} um of {target:.4f} "
+                      f"after {self.timeout:.1f} s, waiting for on-target")
+                self.timeouts += 1
+                timed_out = True
+                if not self.pidevice.qONT(axis)[axis]:
+                    pitools.waitontarget(self.pidevice, axes=[axis])
+                break
+
+            time.sleep(self.poll)
+
+        # 3) Learn and record the settle time (until the position entered the tolerance).
+        #    A timeout is not learned: one stuck move would lengthen the pre-sleep of every later move of its size
+        settled_at = inside_since if inside_since is not None else time.perf_counter()
+        settle_time = settled_at - t0
+        if step is not None and not timed_out:
+            key = self._step_key(axis, step)
+            if key in self._learned:
+                self._learned[key] += LEARNING_RATE * (settle_time - self._learned[key])
+            else:
+                self._learned[key] = settle_time
+        self.records.append((axis, step, time.perf_counter() - t0, polls))
+
+        return settle_time
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def load_settings(self, path=SETTLE_SETTINGS_JSON):
+        """Reads the tolerance, dwell and timeout from the settings file (before every acquisition)."""
+        self.tolerance, self.dwell, self.timeout = load_settle_settings(path)
+
+    def clear(self):
+        """Clears the records (the learned settle times are kept)."""
+        self.records.clear()
+        self.timeouts = 0
+        self._last_target.clear()
+
+    def report(self):
+        """Text summary of the recorded settle times (wait per slice, in ms)."""
+        if not self.records:
+            return "[Settle] no move recorded"
+        waits = np.array([r[2] for r in self.records]) * 1000
+        polls = np.array([r[3] for r in self.records])
+        return (f"[Settle] {waits.size} moves: {waits.mean():.1f} ± {waits.std():.1f} ms "
+                f"(median {np.median(waits):.1f}, max {waits.max():.1f}), "
+                f"{polls.mean():.1f} queries per move, {self.timeouts} timeouts")
+
+
+# One detector per controller (the learned settle times are kept between acquisitions)
+_detectors = {}
+
+
+def get_settle_detector(pidevice):
+    detector = _detectors.get(id(pidevice))
+    if detector is None or detector.pidevice is not pidevice:
+        tolerance, dwell, timeout = load_settle_settings()
+        detector = Settle_Detector(pidevice, tolerance=tolerance, dwell=dwell, timeout=timeout)
+        _detectors[id(pidevice)] = detector
+    return detector
@@ -0,0 +1,177 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import zarr
+from ome_zarr.io import parse_url
+from ome_zarr.writer import write_multiscales_metadata
+from ome_zarr.format import FormatV04
+from skimage.transform import downscale_local_mean
+
+from PySide6.QtCore import QObject, Signal
+
+from Extra_Files.Auto_Contrast import percentile_limits
+
+
+############################################################################################################
+# Writing of a Snap (T, Y, X) multiscale OME-Zarr
+
+def project_frames(frames, projection=None):
+    """Stacks the burst frames into (T, Y, X), or projects them into a single (1, Y, X) frame ("mean" or "max")."""
+    stack = np.stack(frames, axis=0)
+    dtype = stack.dtype
+
+    if projection == "mean":
+        stack = np.round(stack.mean(axis=0, dtype=np.float64))[np.newaxis].astype(dtype)
+    elif projection == "max":
+        stack = stack.max(axis=0)[np.newaxis]
+
+    return stack
+
+
+def write_snap(stack, output_file, label, pixel_size=0.65, t_spacing=1.0, max_levels=3):
+    """Writes a (T, Y, X) stack as a multiscale OME-Zarr (XY pyramid only) with OMERO rendering metadata."""
+    store = parse_url(output_file, mode="w").store
+    root = zarr.group(store=store, overwrite=True)
+
+    # ——— build an XY-only pyramid ———
+    stack = stack.astype(np.uint16)
+    pyramid = [stack]
+    for level in range(1, max_levels):
+        prev = pyramid[-1]
+        # downsample by 2× in Y and X only:
+        ds = downscale_local_mean(prev, (1, 2, 2)).astype(prev.dtype)
+        pyramid.append(ds)
+
+    # ——— write each pyramid level as its own array (one frame per chunk in T) ———
+    for idx, img in enumerate(pyramid):
+        chunks = (1, min(256, img.shape[1]), min(256, img.shape[2]))
+        root.create_dataset(str(idx), data=img, chunks=chunks, dtype=img.dtype)
+
+    # ——— assemble the multiscale metadata ———
+    datasets = []
+    for idx in range(len(pyramid)):
+        scale_factor = 2 ** idx
+        datasets.append({
+            "path": str(idx),
+            "coordinateTransformations": [{
+                "type": "scale",
+                "scale": [
+                    t_spacing,                  # T spacing
+                    pixel_size * scale_factor,  # Y spacing
+                    pixel_size * scale_factor,  # X spacing
+                ],
+            }],
+        })
+
+    axes = [
+        {"name": "t", "type": "time", "unit": "second"},
+        {"name": "y", "type": "space", "unit": "um"},
+        {"name": "x", "type": "space", "unit": "um"},
+    ]
+
+    write_multiscales_metadata(group=root, datasets=datasets, fmt=FormatV04(), axes=axes, name="image")
+
+    # ——— display window from the frame percentiles ———
+    low, high = percentile_limits(stack)
+    max_int = int(np.iinfo(stack.dtype).max)
+    root.attrs["omero"] = {
+        "id":       0,
+        "name":     os.path.basename(output_file),
+        "version":  "0.4",
+        "channels": [{
+            "label":  label,
+            "color":  "FFFFFF",
+            "window": {"min": 0, "max": max_int, "start": int(low), "end": int(high)},
+            "active": True,
+        }],
+        "rdefs":    {"model": "greyscale"},
+    }
+
+
+############################################################################################################
+# Snap service shared by both cameras
+
+class Snap_Service(QObject):
+    """
+    Takes single or burst Snaps from the frame grabbers and writes them on a worker thread,
+    so the GUI and the Live view are never blocked by the disk.
+    """
+    snap_saved = Signal(str)    # path of the written OME-Zarr
+    snap_failed = Signal(str)   # error message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # A single writer keeps the Snaps in order and the disk load low
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._reserved = set()      # Output files queued but not written yet
+        self._pending = {}          # cam_id -> (save_directory, prefix, projection) of a running burst
+        self._grabbers = {}         # cam_id -> frame grabber (connected to _on_burst_ready)
+
+    def next_snap_file(self, save_directory, prefix):
+        """Returns the next free '<prefix>_Snap<N>.ome.zarr' path (also counting the Snaps still being written)."""
+        pat = re.compile(rf"^{re.escape(prefix)}_Snap(\d+)\.ome\.zarr$")
+        with self._lock:
+            names = set(os.listdir(save_directory)) | {os.path.basename(p) for p in self._reserved}
+            nums = [int(m.group(1)) for m in (pat.match(n) for n in names) if m]
+            number = max(nums) + 1 if nums else 1
+            output_file = os.path.join(save_directory, f"{prefix}_Snap{number}.ome.zarr")
+            self._reserved.add(output_file)
+        return output_file
+
+    def snap(self, grabber, save_directory, prefix, n_frames=1, projection=None):
+        """Snaps n_frames from a Live camera grabber. A single frame is taken from the newest frame right away."""
+        if n_frames <= 1:
+            if grabber.latest_frame is None:
+                self.snap_failed.emit(f"{prefix}: no frame to snap.")
+                return
+            # The raw sensor orientation, as before the grabber rework: Camera 1 is only mirrored on display
+            self._submit([grabber.latest_frame.copy()], [0.0], save_directory, prefix, None)
+            return
+
+        if grabber.cam_id in self._pending:
+            print(f"[Snap] {prefix}: a burst is already running.")
+            return
+
+        if self._grabbers.get(grabber.cam_id) is not grabber:
+            grabber.burst_ready.connect(self._on_burst_ready)
+            self._grabbers[grabber.cam_id] = grabber
+
+        self._pending[grabber.cam_id] = (save_directory, prefix, projection)
+        grabber.start_burst(n_frames)
+
+    def cancel_burst(self, cam_id):
+        """Drops a running burst (e.g. when the Live stops before it is complete)."""
+        self._pending.pop(cam_id, None)
+        grabber = self._grabbers.get(cam_id)
+        if grabber is not None:
+            grabber.cancel_burst()
+
+    def _on_burst_ready(self, frames, times, cam_id):
+        if cam_id not in self._pending:
+            return
+        save_directory, prefix, projection = self._pending.pop(cam_id)
+        self._submit(frames, times, save_directory, prefix, projection)
+
+    def _submit(self, frames, times, save_directory, prefix, projection):
+        output_file = self.next_snap_file(save_directory, prefix)
+        self._executor.submit(self._write, frames, times, output_file, prefix, projection)
+
+    def _write(self, frames, times, output_file, prefix, projection):
+        try:
+            stack = project_frames(frames, projection)
+            t_spacing = float(np.mean(np.diff(times))) if len(times) > 1 and stack.shape[0] > 1 else 1.0
+            write_snap(stack, output_file, prefix, t_spacing=t_spacing)
+            self.snap_saved.emit(output_file)
+        except Exception as e:
+            self.snap_failed.emit(f"{prefix}: could not write {os.path.basename(output_file)} ({e})")
+        finally:
+            with self._lock:
+                self._reserved.discard(output_file)
+
+    def shutdown(self):
+        """Waits for the queued Snaps to be written."""
+        self._executor.shutdown(wait=True)
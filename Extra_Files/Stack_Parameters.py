@@ -0,0 +1,271 @@
+import math
+from dataclasses import dataclass, fields
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                               QPushButton, QLabel, QHeaderView, QLineEdit, QComboBox)
+
+
+############################################################################################################
+# Reactive parameter model of the Y-Stack tabs: one dataclass per tab, updated on the edit signals
+
+# Dataclass field -> key of the widget in the tab dictionary of the YStack_Widget
+FIELD_WIDGETS = {
+    'mode_yl': 'Mode Yl',
+    'mode_ly': 'Mode lY',
+    'yi': 'Yi',
+    'yf': 'Yf',
+    'x': 'X',
+    'z': 'Z',
+    'theta': 'Theta',
+    'Ystep': 'Ystep',
+    'Tpoints': 'Tpoints',
+    'Tstep': 'Tstep',
+    'Tstep_unit': 'Tstep unit',
+}
+
+
+def _to_float(text):
+    try:
+        return float(text.strip())
+    except ValueError:
+        return None
+
+
+def _to_int(text):
+    try:
+        return int(text.strip())
+    except ValueError:
+        return None
+
+
+@dataclass
+class Stack_Parameters:
+    """Parameters of one position tab (None: the field is empty or invalid)."""
+    mode_yl: bool = False
+    mode_ly: bool = True
+    yi: float | None = None
+    yf: float | None = None
+    x: float | None = None
+    z: float | None = None
+    theta: float | None = None
+    Ystep: float | None = None
+    Tpoints: int | None = 1
+    Tstep: float | None = None
+    Tstep_unit: str = "seconds"
+
+    @classmethod
+    def from_widgets(cls, tab):
+        values = {}
+        for field in fields(cls):
+            widget = tab[FIELD_WIDGETS[field.name]]
+            if isinstance(widget, QComboBox):
+                values[field.name] = widget.currentText()
+            elif isinstance(widget, QLineEdit):
+                values[field.name] = (_to_int if field.name == 'Tpoints' else _to_float)(widget.text())
+            else:
+                values[field.name] = widget.isChecked()
+        return cls(**values)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Derived values
+
+    @property
+    def Ysize(self):
+        if self.yi is None or self.yf is None:
+            return None
+        return abs(self.yf - self.yi)
+
+    @property
+    def Nsteps(self):
+        if self.Ysize is None or self.Ystep is None:
+            return None
+        if self.Ystep == 0:
+            return 1
+        return int(math.floor(round(self.Ysize / self.Ystep))) + 1 or 1
+
+    @property
+    def center_ready(self):
+        return None not in (self.yi, self.yf, self.x, self.z, self.theta)
+
+    @property
+    def complete(self):
+        """All the coordinates are set (and the time step, if there is more than one time point)."""
+        if not self.center_ready or self.Ystep is None or self.Tpoints is None:
+            return False
+        return self.Tpoints in (0, 1) or self.Tstep is not None
+
+    def to_dict(self):
+        """Same dictionary as the YStack_Widget.get_zstackwidget_parameters entries."""
+        return {
+            'mode_yl': self.mode_yl,
+            'mode_ly': self.mode_ly,
+            'yi': self.yi,
+            'yf': self.yf,
+            'x': self.x,
+            'z': self.z,
+            'theta': self.theta,
+            'Ystep': self.Ystep,
+            'Nsteps': self.Nsteps,
+            'Tpoints': self.Tpoints,
+            'Tstep': self.Tstep or 0.0,
+            'Tstep_unit': self.Tstep_unit,
+        }
+
+
+class Stack_Parameters_Model(QObject):
+    """
+    Keeps a Stack_Parameters per tab. A tab is parsed again only when one of its widgets is edited,
+    and its derived widgets (Y size, number of steps, Center button) are updated only if they changed.
+    """
+    changed = Signal(int)       # index of the tab
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tabs = []          # tab dictionaries (same order as the YStack_Widget.content_tabs)
+        self.parameters = []    # Stack_Parameters of every tab
+
+    def add(self, tab):
+        self.tabs.append(tab)
+        self.parameters.append(None)    # the first read always updates the derived widgets
+        for key in FIELD_WIDGETS.values():
+            widget = tab[key]
+            if isinstance(widget, QComboBox):
+                widget.currentTextChanged.connect(lambda _text, tab=tab: self.read(tab))
+            elif isinstance(widget, QLineEdit):
+                widget.textChanged.connect(lambda _text, tab=tab: self.read(tab))
+            else:
+                widget.toggled.connect(lambda _checked, tab=tab: self.read(tab))
+        self.read(tab)
+
+    def remove(self, tab):
+        for idx, entry in enumerate(self.tabs):
+            if entry is tab:
+                del self.tabs[idx]
+                del self.parameters[idx]
+                self.changed.emit(-1)
+                return
+
+    def read(self, tab):
+        """Parses the widgets of a tab (call it after changing them with the signals blocked)."""
+        for idx, entry in enumerate(self.tabs):
+            if entry is tab:
+                break
+        else:
+            return
+
+        params = Stack_Parameters.from_widgets(tab)
+        if params == self.parameters[idx]:
+            return
+        self.parameters[idx] = params
+
+        ysize = f"{params.Ysize:.3f}" if params.Ysize is not None else ""
+        if tab['Ysize'].text() != ysize:
+            tab['Ysize'].setText(ysize)
+        nsteps = str(params.Nsteps) if params.Nsteps is not None else ""
+        if tab['Nsteps'].text() != nsteps:
+            tab['Nsteps'].setText(nsteps)
+        if tab['Center'].isEnabled() != params.center_ready:
+            tab['Center'].setEnabled(params.center_ready)
+
+        self.changed.emit(idx)
+
+    def read_all(self):
+        for tab in list(self.tabs):
+            self.read(tab)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def all_complete(self):
+        return bool(self.parameters) and all(p.complete for p in self.parameters)
+
+    def snapshot(self):
+        """Parameters of every tab as dictionaries (nothing is parsed)."""
+        return [p.to_dict() for p in self.parameters]
+
+    def set_values(self, changes):
+        """
+        Bulk editing: changes is {(tab index, field): text}. The texts are written in the widgets
+        (so the tabs show them), which updates the model through the edit signals.
+        """
+        for (idx, field), text in changes.items():
+            widget = self.tabs[idx][FIELD_WIDGETS[field]]
+            if isinstance(widget, QComboBox):
+                widget.setCurrentText(text)
+            elif isinstance(widget, QLineEdit):
+                widget.setText(text)
+
+
+############################################################################################################
+# Bulk editing of the tabs in a table
+
+# Editable columns: field, header
+BULK_COLUMNS = [
+    ('yi', "Yi (µm)"), ('yf', "Yf (µm)"), ('Ystep', "Y step (µm)"),
+    ('x', "X (µm)"), ('z', "Z (µm)"), ('theta', "θ (º)"),
+    ('Tpoints', "T points"), ('Tstep', "T step"), ('Tstep_unit', "T unit"),
+]
+
+
+class Bulk_Edit_Dialog(QDialog):
+    """
+    Table with a row per position and a column per parameter. Typing in a cell while several
+    cells are selected writes the value in all of them (spreadsheet fill).
+    """
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Edit Positions")
+        self.model = model
+        self._filling = False
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("Select several cells and type a value to set them all."))
+
+        self.table = QTableWidget(len(model.tabs), len(BULK_COLUMNS))
+        self.table.setHorizontalHeaderLabels([header for _, header in BULK_COLUMNS])
+        self.table.setVerticalHeaderLabels([f"Pos. {i + 1}" for i in range(len(model.tabs))])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+
+        for row, tab in enumerate(model.tabs):
+            for column, (field, _) in enumerate(BULK_COLUMNS):
+                widget = tab[FIELD_WIDGETS[field]]
+                text = widget.currentText() if isinstance(widget, QComboBox) else widget.text()
+                self.table.setItem(row, column, QTableWidgetItem(text))
+        self.table.itemChanged.connect(self._fill_selection)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        apply_button = QPushButton("Apply")
+        apply_button.clicked.connect(self.accept)
+        buttons.addWidget(cancel_button)
+        buttons.addWidget(apply_button)
+        layout.addLayout(buttons)
+
+        self.resize(760, min(600, 120 + 30 * len(model.tabs)))
+
+    def _fill_selection(self, item):
+        if self._filling:
+            return
+        self._filling = True
+        try:
+            for other in self.table.selectedItems():
+                if other is not item:
+                    other.setText(item.text())
+        finally:
+            self._filling = False
+
+    def changes(self):
+        """{(tab index, field): text} of the cells that differ from the tabs."""
+        result = {}
+        for row, tab in enumerate(self.model.tabs):
+            for column, (field, _) in enumerate(BULK_COLUMNS):
+                widget = tab[FIELD_WIDGETS[field]]
+                current = widget.currentText() if isinstance(widget, QComboBox) else widget.text()
+                text = self.table.item(row, column).text().strip()
+                if text != current:
+                    result[(row, field)] = text
+        return result
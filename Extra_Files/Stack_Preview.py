@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+############################################################################################################
+# Live preview of the stack being acquired: rolling MIP and orthogonal views of decimated slices
+
+PREVIEW_PX = 256            # longest side of the decimated slices
+GRAB_HZ = 10                # slices taken per second per camera (the others are only acquired)
+EMIT_HZ = 4                 # preview images sent to the viewer per second per camera
+GAP_PX = 4                  # blank pixels between the views
+
+
+class _Stack_State:
+    """Decimated projections of the stack of one camera: XY maximum projection, and per slice its X and Y profiles."""
+
+    def __init__(self, key, n_slices, shape):
+        self.key = key
+        self.mip = np.zeros(shape)
+        self.xz = np.zeros((n_slices, shape[1]))     # per slice: maximum over Y (-> XZ view)
+        self.yz = np.zeros((n_slices, shape[0]))     # per slice: maximum over X (-> YZ view)
+        self.filled = np.zeros(n_slices, dtype=bool)
+        self.last_emit = 0.0
+
+
+class Stack_Preview:
+    """
+    Previews the slices of the stack being acquired, at most GRAB_HZ per camera and only when the preview
+    thread is idle. The acquisition loop only hands over the index of a slice already in the camera buffer:
+    the preview thread copies it from the camera, so the readout never waits for it. It decimates the slices,
+    keeps the rolling maximum projection and the orthogonal views of the current stack, and sends them as
+    one image (XY | YZ over XZ) with emit(image, camera_id, time_point, channel, slice) at most EMIT_HZ per camera.
+    """
+
+    def __init__(self, emit, pixel_size=0.65):
+        self.emit = emit
+        self.pixel_size = pixel_size
+        self._queue = queue.Queue(maxsize=4)
+        self._last_grab = {}
+        self._states = {}
+        self._thread = None
+        self.grabbed = 0
+        self.skipped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="Stack_Preview", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=1)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=2)
+        self._thread = None
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Acquisition thread
+
+    def grab(self, camera, camera_id, time_point, channel, slice_idx, n_slices, z_step_um, binning, force=False):
+        """
+        Offers slice slice_idx of the stack (its frame index in the camera buffer, already acquired).
+        Returns at once: nothing is read from the camera here. force offers it even if not due (last slice).
+        """
+        now = time.perf_counter()
+        if not force and now - self._last_grab.get(camera_id, 0.0) < 1.0 / GRAB_HZ:
+            return
+        self._last_grab[camera_id] = now
+        try:
+            self._queue.put_nowait((camera, camera_id, time_point, channel, slice_idx, n_slices, z_step_um, binning))
+        except queue.Full:
+            self.skipped += 1
+
+    def sync(self):
+        """Waits until the offered slices are read (before the camera buffer of the stack is cleared)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Preview thread
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                camera, camera_id, time_point, channel, slice_idx, n_slices, z_step_um, binning = item
+                frame = camera.read_multiple_images(rng=(slice_idx, slice_idx + 1), peek=True)[0]
+                self.grabbed += 1
+                self._add(frame, camera_id, time_point, channel, slice_idx, n_slices, z_step_um, binning)
+            except Exception as e:
+                print(f"[Preview] {e}")
+            finally:
+                self._queue.task_done()
+
+    def _add(self, frame, camera_id, time_point, channel, slice_idx, n_slices, z_step_um, binning):
+        step = max(1, -(-max(frame.shape) // PREVIEW_PX))
+        small = frame[::step, ::step]
+
+        # A new stack (time point, channel or position) starts a new preview
+        key = (time_point, channel, n_slices, small.shape)
+        state = self._states.get(camera_id)
+        if state is None or state.key != key or (slice_idx < n_slices and state.filled[slice_idx:].any()):
+            state = _Stack_State(key, n_slices, small.shape)
+            self._states[camera_id] = state
+
+        k = min(slice_idx, n_slices - 1)
+        np.maximum(state.mip, small, out=state.mip)
+        state.xz[k] = small.max(axis=0)
+        state.yz[k] = small.max(axis=1)
+        state.filled[k] = True
+
+        now = time.perf_counter()
+        if now - state.last_emit >= 1.0 / EMIT_HZ:
+            state.last_emit = now
+            aspect = z_step_um / (self.pixel_size * (binning or 1) * step)
+            self.emit(self._compose(state, aspect).astype(frame.dtype), camera_id, time_point, channel, slice_idx)
+
+    def _compose(self, state, aspect):
+        """XY projection with the YZ view on its right and the XZ view below (Z scaled to the XY pixels)."""
+        h, w = state.mip.shape
+        n = len(state.filled)
+
+        # The slices not taken show the last one taken before them (the rest of the stack is still blank)
+        taken = np.where(state.filled, np.arange(n), -1)
+        nearest = np.maximum.accumulate(taken)
+        valid = (nearest >= 0) & (np.arange(n) <= taken.max())
+        xz = np.zeros_like(state.xz)
+        yz = np.zeros_like(state.yz)
+        xz[valid] = state.xz[nearest[valid]]
+        yz[valid] = state.yz[nearest[valid]]
+
+        depth = int(np.clip(round(n * aspect), 1, max(h, w)))
+        rows = np.linspace(0, n - 1, depth).astype(int)
+
+        image = np.zeros((h + GAP_PX + depth, w + GAP_PX + depth))
+        image[:h, :w] = state.mip
+        image[:h, w + GAP_PX:] = yz[rows].T
+        image[h + GAP_PX:, :w] = xz[rows]
+        return image
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from PySide6.QtCore import QObject, Signal
+
+
+############################################################################################################
+# Stage position telemetry: one multi-axis qPOS at an adaptive rate, shared by every consumer
+
+AXES = ['1', '2', '3', '4']     # X, Y, Z, Theta
+
+FAST_INTERVAL = 0.02        # s, while the stages move
+IDLE_INTERVAL = 0.25        # s, when nothing moves
+ACQUIRING_INTERVAL = 1.0    # s, during acquisitions (the controller is busy with MOV / on-target queries)
+
+MOVE_TOLERANCE = 1e-5       # mm (or degrees) of change between two reads that counts as "moving"
+MOVE_HOLDOFF = 0.5          # s of fast reads after a move was notified
+
+
+class Stage_Telemetry(QObject):
+    """
+    Reads the position of all the axes of the C-884 with a single qPOS on a background thread
+    and keeps it cached. The widgets read the cache (position()) or listen to position_updated
+    instead of querying the controller themselves.
+    """
+    position_updated = Signal(object)   # {'1': x, '2': y, '3': z, '4': theta} (raw, mm and degrees)
+
+    def __init__(self, pidevice, parent=None):
+        super().__init__(parent)
+        self.pidevice = pidevice
+
+        self._lock = threading.Lock()
+        self._positions = None
+        self._timestamp = 0.0
+        self._moved_at = 0.0
+        self._acquiring = False
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="Stage_Telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            moving = False
+            try:
+                positions = dict(self.pidevice.qPOS(AXES))
+                with self._lock:
+                    previous = self._positions
+                    self._positions = positions
+                    self._timestamp = time.perf_counter()
+
+                changed = previous is None or any(abs(positions[a] - previous[a]) > MOVE_TOLERANCE for a in AXES)
+                if changed:
+                    self.position_updated.emit(positions)
+                moving = changed and previous is not None
+            except Exception as e:
+                print(f"Stage_Telemetry Error: {e}")
+
+            if moving:
+                self._moved_at = time.perf_counter()
+
+            self._wake.wait(self._interval())
+            self._wake.clear()
+
+    def _interval(self):
+        if self._acquiring:
+            return ACQUIRING_INTERVAL
+        if time.perf_counter() - self._moved_at < MOVE_HOLDOFF:
+            return FAST_INTERVAL
+        return IDLE_INTERVAL
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    def notify_move(self):
+        """Call it after a MOV: the position is read right away and then at the fast rate."""
+        self._moved_at = time.perf_counter()
+        self._wake.set()
+
+    def set_acquiring(self, acquiring):
+        """Throttles the reads while an acquisition drives the stages."""
+        self._acquiring = bool(acquiring)
+        self._wake.set()
+
+    def position(self, axis=None):
+        """Cached position of an axis, or a copy of all of them (None before the first read)."""
+        with self._lock:
+            if self._positions is None:
+                return None
+            return self._positions[axis] if axis is not None else dict(self._positions)
+
+    def age(self):
+        """Seconds since the last read."""
+        return time.perf_counter() - self._timestamp
+
+
+# One service per controller, shared by the Stages and Y-Stack widgets
+_services = {}
+
+
+def get_stage_telemetry(pidevice):
+    service = _services.get(id(pidevice))
+    if service is None or service.pidevice is not pidevice:
+        service = Stage_Telemetry(pidevice)
+        _services[id(pidevice)] = service
+        service.start()
+    return service
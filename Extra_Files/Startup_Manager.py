@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+############################################################################################################
+# Parallel initialization of the devices, with a per-device timeline
+
+class Startup_Manager:
+    """
+    Runs the (name, callable) initialization tasks in parallel and keeps when each one started and ended.
+    """
+
+    def __init__(self, tasks):
+        self.tasks = list(tasks)
+        self.results = {}
+        self.timings = {}       # name -> (start s, end s, error or None), relative to the start of run()
+        self._t0 = None
+
+    def _timed(self, name, fn):
+        start = time.perf_counter() - self._t0
+        try:
+            result = fn()
+        except Exception as e:
+            self.timings[name] = (start, time.perf_counter() - self._t0, str(e))
+            raise
+        self.timings[name] = (start, time.perf_counter() - self._t0, None)
+        return result
+
+    def run(self):
+        """Initializes every device. Raises RuntimeError (after the timeline is printed) if one fails."""
+        self._t0 = time.perf_counter()
+        failures = []
+
+        with ThreadPoolExecutor(max_workers=len(self.tasks)) as exe:
+            futures = {exe.submit(self._timed, name, fn): name for name, fn in self.tasks}
+            for fut in as_completed(futures):
+                name = futures[fut]
+                try:
+                    self.results[name] = fut.result()
+                except Exception as e:
+                    failures.append(f"Failed to init {name}: {e}")
+
+        print(self.timeline())
+        if failures:
+            raise RuntimeError("\n".join(failures))
+        return self.results
+
+    def timeline(self, width=40):
+        """Text timeline of the initializations (one bar per device)."""
+        if not self.timings:
+            return "[Startup] nothing initialized"
+
+        total = max(end for _, end, _ in self.timings.values())
+        scale = width / total if total > 0 else 0
+        lines = [f"[Startup] devices initialized in {total:.2f} s"]
+        for name, (start, end, error) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            offset = min(int(start * scale), width - 1)
+            bar = " " * offset + "#" * min(max(1, int((end - start) * scale)), width - offset)
+            status = f"FAILED ({error})" if error else ""
+            lines.append(f"  {name:<14} |{bar:<{width}}| {start:6.2f} -> {end:6.2f} s {status}")
+        return "\n".join(lines)
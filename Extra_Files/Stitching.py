@@ -0,0 +1,452 @@
+import argparse
+import glob
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import zarr
+from zarr import Blosc
+from zarr.storage import DirectoryStore
+from ome_zarr.writer import write_multiscales_metadata
+from ome_zarr.format import FormatV04
+
+from Extra_Files.Resource_Planner import available_memory
+
+
+############################################################################################################
+# Stitching of the tiles of a multi-position acquisition into a fused multiscale OME-Zarr
+#
+#   python -m Extra_Files.Stitching "D:/Data/Experiment 3" [--camera 1] [--workers 4]
+#
+# The File Explorer runs it as a separate process (QProcess), so the process pool never re-imports the GUI,
+# and stops it (a "stop" line on its standard input) when an acquisition starts.
+
+CHUNK = 1024                # Y/X chunk of the fused arrays (a fusion task is a band of CHUNK rows)
+DOWNSAMPLE = 4              # Y/X downsampling of the registration images
+REG_PLANES = 16             # planes of a stack in its registration image (maximum projection)
+MIN_CORRELATION = 0.05      # phase correlation peak below which a pair is not trusted
+PRIOR_WEIGHT = 0.01         # weight of the stage positions against the registered pairs
+BLEND_PX = 64               # width of the linear blending ramp at the tile edges
+MAX_LEVELS = 5              # levels of the fused pyramid
+MEMORY_FRACTION = 0.5       # fraction of the available memory used by the fusion workers
+
+_STORE = re.compile(r"^Position(\d+)_Camera(\d+)\.ome\.zarr$")
+
+
+def find_tiles(experiment_dir, camera):
+    """
+    Tiles of a camera in an experiment folder: the 'Position N/PositionN_CameraC.ome.zarr' stores
+    with tile coordinates (written after the acquisition). Sorted by position.
+    """
+    tiles = []
+    for path in glob.glob(os.path.join(experiment_dir, "Position *", f"Position*_Camera{camera}.ome.zarr")):
+        match = _STORE.match(os.path.basename(path))
+        if match is None:
+            continue
+        try:
+            root = zarr.open_group(path, mode="r")
+            tile = root.attrs["tile"]
+            shape = root["0"].shape
+        except (KeyError, ValueError) as e:
+            print(f"[Stitching] Skipping {path}: no tile coordinates or data ({e})")
+            continue
+        tiles.append(dict(tile, path=path, shape=shape, position=int(match.group(1))))
+    return sorted(tiles, key=lambda tile: tile["position"])
+
+
+def cameras_of(experiment_dir):
+    """Cameras with stores in an experiment folder."""
+    cameras = set()
+    for path in glob.glob(os.path.join(experiment_dir, "Position *", "Position*_Camera*.ome.zarr")):
+        match = _STORE.match(os.path.basename(path))
+        if match:
+            cameras.add(int(match.group(2)))
+    return sorted(cameras)
+
+
+def _downsample(image, factor):
+    h, w = (image.shape[0] // factor) * factor, (image.shape[1] // factor) * factor
+    return image[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3), dtype=np.float32)
+
+
+def phase_correlation(a, b):
+    """Shift (dy, dx) of image b relative to image a (b(x) = a(x - shift)), and the correlation peak (0 to 1)."""
+    window = np.outer(np.hanning(a.shape[0]), np.hanning(a.shape[1])).astype(np.float32)
+    fa = np.fft.rfft2((a - a.mean()) * window)
+    fb = np.fft.rfft2((b - b.mean()) * window)
+    cross = fb * np.conj(fa)
+    cross /= np.abs(cross) + 1e-12
+    correlation = np.fft.irfft2(cross, s=a.shape)
+    peak = np.unravel_index(np.argmax(correlation), correlation.shape)
+    shift = [p if p <= n // 2 else p - n for p, n in zip(peak, correlation.shape)]
+    return shift, float(correlation[peak])
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Process pool workers (they open the arrays once per process)
+
+_plan = None
+_arrays = {}
+
+
+def _init_worker(plan):
+    global _plan
+    _plan = plan
+    _arrays.clear()
+
+
+def _array(path):
+    if path not in _arrays:
+        _arrays[path] = zarr.open_array(path, mode="r+" if path.startswith(_plan["output"]) else "r")
+    return _arrays[path]
+
+
+def _registration_image(path, t, c):
+    """Maximum projection of REG_PLANES planes of a stack, downsampled by DOWNSAMPLE."""
+    array = _array(os.path.join(path, "0"))
+    planes = np.unique(np.linspace(0, array.shape[2] - 1, min(array.shape[2], REG_PLANES)).astype(int))
+    mip = None
+    for z in planes:
+        plane = array[t, c, z]
+        mip = plane if mip is None else np.maximum(mip, plane)
+    return _downsample(mip, DOWNSAMPLE)
+
+
+def _ramp(n):
+    """Blending weights along one tile axis: rising over BLEND_PX at both edges."""
+    distance = np.minimum(np.arange(n), np.arange(n)[::-1]) + 1
+    return np.minimum(distance / BLEND_PX, 1.0).astype(np.float32)
+
+
+def _fuse_band(t, c, z, y0):
+    """Fuses the rows y0..y0+CHUNK of plane (t, c, z) of level 0 (whole chunks, so no two tasks share one)."""
+    out = _array(os.path.join(_plan["output"], "0"))
+    y1 = min(y0 + CHUNK, out.shape[3])
+    acc = np.zeros((y1 - y0, out.shape[4]), dtype=np.float32)
+    weight = np.zeros_like(acc)
+
+    for path, (oz, oy, ox), (Z, Y, X) in _plan["tiles"]:
+        if not (oz <= z < oz + Z and oy < y1 and oy + Y > y0):
+            continue
+        plane = _array(os.path.join(path, "0"))[t, c, z - oz]
+        ty0, ty1 = max(y0, oy) - oy, min(y1, oy + Y) - oy
+        w = np.outer(_ramp(Y)[ty0:ty1], _ramp(X))
+        acc[oy + ty0 - y0:oy + ty1 - y0, ox:ox + X] += plane[ty0:ty1].astype(np.float32) * w
+        weight[oy + ty0 - y0:oy + ty1 - y0, ox:ox + X] += w
+
+    np.divide(acc, weight, out=acc, where=weight > 0)
+    out[t, c, z, y0:y1] = np.round(acc).astype(out.dtype)
+    return y1 - y0
+
+
+def _downsample_band(level, t, c, z, y0):
+    """Rows y0..y0+CHUNK of plane (t, c, z) of a level, from twice as many rows of the level below."""
+    source = _array(os.path.join(_plan["output"], str(level - 1)))
+    out = _array(os.path.join(_plan["output"], str(level)))
+    y1 = min(y0 + CHUNK, out.shape[3])
+    rows = source[t, c, z, 2 * y0:2 * y1]
+    rows = np.pad(rows, ((0, 2 * (y1 - y0) - rows.shape[0]), (0, 2 * out.shape[4] - rows.shape[1])), mode="edge")
+    out[t, c, z, y0:y1] = np.round(_downsample(rows, 2)).astype(out.dtype)
+    return y1 - y0
+
+
+def _run(pool, function, tasks, workers, progress, stop_event, done, total):
+    """Runs the tasks keeping at most 2 x workers in flight (bounded memory). Returns the tasks done."""
+    pending = set()
+    tasks = iter(tasks)
+    while True:
+        while len(pending) < 2 * workers and (stop_event is None or not stop_event.is_set()):
+            task = next(tasks, None)
+            if task is None:
+                break
+            pending.add(pool.submit(function, *task))
+        if not pending:
+            return done
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            future.result()
+            done += 1
+            if progress is not None:
+                progress(done, total)
+
+
+############################################################################################################
+
+class Stitcher:
+    """
+    Stitches the tiles of one camera (and one angle) of an experiment.
+        1) Initial positions from the stage coordinates of the tiles (their "tile" metadata)
+        2) Refinement: phase correlation of the overlaps of neighbouring tiles on downsampled
+           maximum projections, then a least-squares fit of all the pairs (anchored to the stage)
+        3) Fusion with linear blending, in bands of CHUNK rows on a process pool, then the pyramid
+    Only the bands in flight are in memory, so the size of the dataset doesn't matter.
+    """
+
+    def __init__(self, experiment_dir, camera=1, angle=0, workers=None, refine=True,
+                 flip_x=False, flip_y=False, reference_channel=0):
+        self.experiment_dir = experiment_dir
+        self.camera = camera
+        self.angle = angle
+        self.refine = refine
+        self.reference_channel = reference_channel
+        self.tiles = [t for t in find_tiles(experiment_dir, camera) if t.get("angle", 0) == angle]
+        if not self.tiles:
+            raise ValueError(f"No tiles of camera {camera} (angle {angle}) in {experiment_dir}")
+
+        suffix = f"_Angle{angle}" if angle else ""
+        self.output = os.path.join(experiment_dir, f"Stitched_Camera{camera}{suffix}.ome.zarr")
+
+        # Stage positions in pixels of level 0: (z, y, x), the image rows follow the stage Z
+        first = zarr.open_group(self.tiles[0]["path"], mode="r")
+        self.scale = self._level0_scale(first)
+        y_stage = [t["stage_um"]["y"] for t in self.tiles]
+        self.nominal = np.array([[round((ys - min(y_stage)) / self.scale[2]) if self.scale[2] else 0,
+                                  t["offset_px"]["y"], t["offset_px"]["x"]]
+                                 for t, ys in zip(self.tiles, y_stage)], dtype=np.float64)
+        for axis, flip in ((1, flip_y), (2, flip_x)):
+            if flip:
+                self.nominal[:, axis] = self.nominal[:, axis].max() - self.nominal[:, axis]
+        self.positions = self.nominal.copy()
+        self.pairs = []
+
+        frame_bytes = max(t["shape"][3] * t["shape"][4] for t in self.tiles) * 8
+        self.workers = workers or self._default_workers(frame_bytes)
+
+    @staticmethod
+    def _level0_scale(root):
+        """(t, c, z, y, x) scale of level 0 of a store (ones if there is no multiscales metadata)."""
+        try:
+            for transform in root.attrs["multiscales"][0]["datasets"][0]["coordinateTransformations"]:
+                if transform["type"] == "scale":
+                    return transform["scale"]
+        except (KeyError, IndexError):
+            pass
+        return [1, 1, 1, 1, 1]
+
+    def _default_workers(self, frame_bytes):
+        """Processes that fit in memory: every task holds a band of the fused plane and a tile plane."""
+        width = int(self.nominal[:, 2].max()) + max(t["shape"][4] for t in self.tiles)
+        task_bytes = CHUNK * width * 8 + 2 * frame_bytes
+        memory = available_memory()
+        by_memory = int(MEMORY_FRACTION * memory // task_bytes) // 2 if memory else 2
+        return max(1, min(os.cpu_count() or 1, by_memory))
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Registration
+
+    def _overlap(self, i, j):
+        """Overlap (y0, y1, x0, x1) of tiles i and j at their stage positions (level 0), or None."""
+        (_, yi, xi), (_, yj, xj) = self.nominal[i], self.nominal[j]
+        Yi, Xi = self.tiles[i]["shape"][3:]
+        Yj, Xj = self.tiles[j]["shape"][3:]
+        y0, y1 = max(yi, yj), min(yi + Yi, yj + Yj)
+        x0, x1 = max(xi, xj), min(xi + Xi, xj + Xj)
+        if y1 - y0 < 16 * DOWNSAMPLE or x1 - x0 < 16 * DOWNSAMPLE:
+            return None
+        return y0, y1, x0, x1
+
+    def register(self, pool, progress=None, stop_event=None):
+        """Refines the tile positions in Y/X from the overlaps of the neighbouring tiles."""
+        n = len(self.tiles)
+        neighbours = [(i, j, box) for i in range(n) for j in range(i + 1, n)
+                      if (box := self._overlap(i, j)) is not None]
+        if not neighbours:
+            return
+
+        futures = {i: pool.submit(_registration_image, t["path"], 0, self.reference_channel)
+                   for i, t in enumerate(self.tiles)}
+        images = {}
+        for i, future in futures.items():
+            images[i] = future.result()
+            if progress is not None:
+                progress(i + 1, n)
+            if stop_event is not None and stop_event.is_set():
+                return
+
+        for i, j, (y0, y1, x0, x1) in neighbours:
+            crops = []
+            for k in (i, j):
+                _, oy, ox = self.nominal[k]
+                crops.append(images[k][int(y0 - oy) // DOWNSAMPLE:int(y1 - oy) // DOWNSAMPLE,
+                                       int(x0 - ox) // DOWNSAMPLE:int(x1 - ox) // DOWNSAMPLE])
+            if crops[0].shape != crops[1].shape or min(crops[0].shape) < 8:
+                continue
+            (sy, sx), peak = phase_correlation(*crops)
+            # The content of tile j is shifted by -error from where the stage puts it
+            error = (-sy * DOWNSAMPLE, -sx * DOWNSAMPLE)
+            if peak < MIN_CORRELATION or abs(error[0]) > (y1 - y0) / 2 or abs(error[1]) > (x1 - x0) / 2:
+                continue
+            self.pairs.append((i, j, error, peak))
+
+        self._solve()
+
+    def _solve(self):
+        """Least squares of the registered pairs, with the stage positions as a weak prior."""
+        n = len(self.tiles)
+        rows = len(self.pairs) + n
+        A = np.zeros((rows, n))
+        for axis in (1, 2):
+            b = np.zeros(rows)
+            for k, (i, j, error, peak) in enumerate(self.pairs):
+                A[k, i], A[k, j] = -peak, peak
+                b[k] = peak * (self.nominal[j, axis] - self.nominal[i, axis] + error[axis - 1])
+            for i in range(n):
+                A[len(self.pairs) + i, i] = PRIOR_WEIGHT
+                b[len(self.pairs) + i] = PRIOR_WEIGHT * self.nominal[i, axis]
+            self.positions[:, axis] = np.linalg.lstsq(A, b, rcond=None)[0]
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Fusion
+
+    def _create_output(self):
+        """Creates the fused pyramid arrays (level 0 extent from the refined positions)."""
+        offsets = np.round(self.positions - self.positions.min(axis=0)).astype(int)
+        shapes = [t["shape"] for t in self.tiles]
+        T = max(s[0] for s in shapes)
+        C = max(s[1] for s in shapes)
+        extent = [int(max(o[k] + s[k + 2] for o, s in zip(offsets, shapes))) for k in range(3)]
+        source = zarr.open_array(os.path.join(self.tiles[0]["path"], "0"), mode="r")
+
+        root = zarr.group(store=DirectoryStore(self.output), overwrite=True)
+        levels = []
+        Y, X = extent[1], extent[2]
+        for level in range(MAX_LEVELS):
+            levels.append(root.create_dataset(
+                name=str(level),
+                shape=(T, C, extent[0], Y, X),
+                chunks=(1, 1, 1, min(CHUNK, Y), min(CHUNK, X)),
+                dtype=source.dtype,
+                compressor=Blosc()
+            ))
+            if max(Y, X) <= CHUNK:
+                break
+            Y, X = (Y + 1) // 2, (X + 1) // 2
+
+        plan = {"output": self.output,
+                "tiles": [(t["path"], tuple(int(v) for v in o), tuple(t["shape"][2:]))
+                          for t, o in zip(self.tiles, offsets)]}
+        return root, levels, plan, offsets
+
+    def _write_metadata(self, root, n_levels, offsets):
+        t_scale, _, z_scale, y_scale, x_scale = self.scale
+        first = zarr.open_group(self.tiles[0]["path"], mode="r")
+        try:
+            axes = first.attrs["multiscales"][0]["axes"]
+        except (KeyError, IndexError):
+            axes = [{"name": "t", "type": "time"}, {"name": "c", "type": "channel"},
+                    {"name": "z", "type": "space", "unit": "µm"}, {"name": "y", "type": "space", "unit": "µm"},
+                    {"name": "x", "type": "space", "unit": "µm"}]
+        write_multiscales_metadata(
+            group=root,
+            datasets=[{"path": str(level), "coordinateTransformations": [{
+                          "type": "scale",
+                          "scale": [t_scale, 1, z_scale, y_scale * 2**level, x_scale * 2**level]}]}
+                      for level in range(n_levels)],
+            fmt=FormatV04(),
+            axes=axes,
+            name=os.path.basename(self.output),
+        )
+        if "omero" in first.attrs:
+            root.attrs["omero"] = dict(first.attrs["omero"], name=os.path.basename(self.output))
+        root.attrs["stitching"] = {
+            "camera": self.camera,
+            "angle": self.angle,
+            "registered_pairs": len(self.pairs),
+            "tiles": [{"position": t["position"], "offset_px": [int(v) for v in o],
+                       "stage_offset_px": [float(v) for v in nominal]}
+                      for t, o, nominal in zip(self.tiles, offsets, self.nominal - self.nominal.min(axis=0))],
+        }
+
+    def run(self, progress=None, stop_event=None):
+        """
+        Registers and fuses the tiles. progress(done, total, stage) is called from the calling thread.
+        Returns the path of the fused OME-Zarr (None if stopped).
+        """
+        t0 = time.perf_counter()
+
+        def report(stage):
+            return None if progress is None else (lambda done, total: progress(done, total, stage))
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=({"output": self.output, "tiles": []},)) as pool:
+            if self.refine and len(self.tiles) > 1:
+                self.register(pool, report("Registering"), stop_event)
+        t_register = time.perf_counter() - t0
+
+        if stop_event is not None and stop_event.is_set():
+            return None
+
+        root, levels, plan, offsets = self._create_output()
+        T, C, Z, Y, _ = levels[0].shape
+        planes = [(t, c, z) for t in range(T) for c in range(C) for z in range(Z)]
+        total = sum(len(planes) * -(-level.shape[3] // CHUNK) for level in levels)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(plan,)) as pool:
+            tasks = ((t, c, z, y0) for t, c, z in planes for y0 in range(0, Y, CHUNK))
+            done = _run(pool, _fuse_band, tasks, self.workers, report("Fusing"), stop_event, 0, total)
+            for level in range(1, len(levels)):
+                tasks = ((level, t, c, z, y0) for t, c, z in planes for y0 in range(0, levels[level].shape[3], CHUNK))
+                done = _run(pool, _downsample_band, tasks, self.workers, report("Pyramid"), stop_event, done, total)
+
+        if stop_event is not None and stop_event.is_set():
+            return None
+
+        self._write_metadata(root, len(levels), offsets)
+        print(f"[Stitching] Camera {self.camera}: {len(self.tiles)} tiles, {len(self.pairs)} registered pairs, "
+              f"{levels[0].shape[3]} x {levels[0].shape[4]} px, {self.workers} workers | "
+              f"registration {t_register:.1f} s, total {time.perf_counter() - t0:.1f} s")
+        return self.output
+
+
+def stitch_experiment(experiment_dir, cameras=None, progress=None, stop_event=None, **options):
+    """Stitches every camera (and angle) of an experiment. Returns the fused OME-Zarr paths."""
+    outputs = []
+    for camera in cameras or cameras_of(experiment_dir):
+        angles = sorted({t.get("angle", 0) for t in find_tiles(experiment_dir, camera)})
+        for angle in angles:
+            output = Stitcher(experiment_dir, camera, angle, **options).run(progress, stop_event)
+            if output is None:
+                return outputs
+            outputs.append(output)
+    return outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stitches the positions of a tiled acquisition into a fused OME-Zarr.")
+    parser.add_argument("experiment_dir", help="experiment folder (with the 'Position N' folders)")
+    parser.add_argument("--camera", type=int, action="append", help="camera to stitch (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="fusion processes (default: from the memory)")
+    parser.add_argument("--no-refine", action="store_true", help="use the stage positions only")
+    parser.add_argument("--flip-x", action="store_true", help="the image X runs against the stage X")
+    parser.add_argument("--flip-y", action="store_true", help="the image Y runs against the stage Z")
+    parser.add_argument("--stop-on-stdin", action="store_true", help="stop cleanly when a 'stop' line is read on stdin")
+    args = parser.parse_args(argv)
+
+    stop_event = threading.Event()
+    if args.stop_on_stdin:
+        def watch_stdin():
+            for line in sys.stdin:
+                if line.strip() == "stop":
+                    stop_event.set()
+                    return
+        threading.Thread(target=watch_stdin, name="Stitching_Stop", daemon=True).start()
+
+    def progress(done, total, stage):
+        print(f"\r{stage}: {done}/{total}", end="" if done < total else "\n", flush=True)
+
+    outputs = stitch_experiment(args.experiment_dir, args.camera, progress, stop_event, workers=args.workers,
+                                refine=not args.no_refine, flip_x=args.flip_x, flip_y=args.flip_y)
+    for output in outputs:
+        print(f"Stitched: {output}", flush=True)
+    if stop_event.is_set():
+        print("Stopped", flush=True)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import math
+import os
+from bisect import bisect_right
+from dataclasses import replace
+
+import zarr
+
+from Extra_Files.Stack_Parameters import Stack_Parameters
+
+
+############################################################################################################
+# Tiling: serpentine grids of X/Z (and theta) positions covering a region, for mosaic acquisitions
+
+PIXEL_SIZE_UM = 0.65        # sample pixel size of the cameras, without binning
+FULL_FRAME_PX = 2048        # full frame of the cameras (Stages_Widget.fov_increment = 2048 x 0.65 um)
+DEFAULT_OVERLAP = 0.10      # overlap fraction between neighbouring tiles
+
+
+def tile_fov(width_x=FULL_FRAME_PX, height_y=FULL_FRAME_PX, binning=1, pixel_size=PIXEL_SIZE_UM):
+    """
+    Field of view (um) of a frame along the stage X and Z: the ROI of the camera (sensor pixels)
+    read out in binned pixels of binning x pixel_size. The image columns follow X, the rows Z.
+    """
+    binning = binning or 1
+    return int(width_x / binning) * binning * pixel_size, int(height_y / binning) * binning * pixel_size
+
+
+def _axis_centers(low, high, fov, overlap):
+    """
+    Tile centers covering [low, high] with tiles of size fov overlapping by exactly overlap.
+    The grid is centered on the region, so it can go a bit past both of its edges.
+    """
+    low, high = min(low, high), max(low, high)
+    step = fov * (1 - overlap)
+    n = max(1, math.ceil((high - low - fov) / step - 1e-9) + 1)
+    first = (low + high) / 2 - (n - 1) * step / 2
+    return [first + i * step for i in range(n)]
+
+
+class Tile_Grid:
+    """
+    Serpentine grid of tiles over the region x_min..x_max, z_min..z_max (um, edges of the area to cover),
+    repeated for every angle of thetas. Rows run along Z and every other row is acquired backwards in X,
+    so consecutive tiles are always neighbours; the angles are the outer loop (fewest rotations).
+    """
+
+    def __init__(self, x_min, x_max, z_min, z_max, fov_x, fov_z, overlap=DEFAULT_OVERLAP, thetas=None):
+        if not 0 <= overlap < 1:
+            raise ValueError("The overlap must be between 0 and 1")
+        self.fov_x = fov_x
+        self.fov_z = fov_z
+        self.overlap = overlap
+        self.xs = _axis_centers(x_min, x_max, fov_x, overlap)
+        self.zs = _axis_centers(z_min, z_max, fov_z, overlap)
+        self.thetas = list(thetas) if thetas else [None]
+
+        self.tiles = []
+        for angle, theta in enumerate(self.thetas):
+            for row, z in enumerate(self.zs):
+                columns = range(len(self.xs)) if row % 2 == 0 else reversed(range(len(self.xs)))
+                for column in columns:
+                    self.tiles.append({"angle": angle, "theta": theta, "row": row, "column": column,
+                                       "x": round(self.xs[column], 3), "z": round(z, 3)})
+
+    def __len__(self):
+        return len(self.tiles)
+
+    @property
+    def shape(self):
+        """(angles, rows, columns)"""
+        return len(self.thetas), len(self.zs), len(self.xs)
+
+    def extent(self):
+        """Area covered by the tiles (um): (x_min, x_max, z_min, z_max)."""
+        return (self.xs[0] - self.fov_x / 2, self.xs[-1] + self.fov_x / 2,
+                self.zs[0] - self.fov_z / 2, self.zs[-1] + self.fov_z / 2)
+
+    def positions(self, template=None):
+        """The tiles as Stack_Parameters for the multi-position engine (the rest of the fields from template)."""
+        template = template or Stack_Parameters()
+        return [replace(template, x=tile["x"], z=tile["z"],
+                        theta=tile["theta"] if tile["theta"] is not None else template.theta)
+                for tile in self.tiles]
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Tile coordinates of the acquired positions
+
+def _grid_index(values, tolerance):
+    """Index of every value among the distinct values (sorted, merged when closer than tolerance)."""
+    distinct = []
+    for value in sorted(values):
+        if not distinct or value - distinct[-1] > tolerance:
+            distinct.append(value)
+    return [bisect_right(distinct, value) - 1 for value in values]
+
+
+def tile_coordinates(zstackwidget_parameters, fov_x, fov_z):
+    """
+    Tile coordinates of the positions of an acquisition (the YStack_Widget parameter dictionaries):
+    row/column/angle in the mosaic and the stage offset (um) from the first tile of the same angle.
+    Works for any set of positions (tabs, imported or generated), as it only uses their coordinates.
+    """
+    thetas = [p['theta'] for p in zstackwidget_parameters]
+    angles = _grid_index(thetas, 0.01)
+    columns = _grid_index([p['x'] for p in zstackwidget_parameters], fov_x / 4)
+    rows = _grid_index([p['z'] for p in zstackwidget_parameters], fov_z / 4)
+
+    # First tile (lowest X and Z) of every angle
+    origins = {}
+    for p, angle in zip(zstackwidget_parameters, angles):
+        x0, z0 = origins.get(angle, (p['x'], p['z']))
+        origins[angle] = (min(x0, p['x']), min(z0, p['z']))
+
+    tiles = []
+    for idx, p in enumerate(zstackwidget_parameters):
+        x0, z0 = origins[angles[idx]]
+        tiles.append({
+            "position": idx + 1,
+            "angle": angles[idx], "row": rows[idx], "column": columns[idx],
+            "stage_um": {"x": p['x'], "y": p['yi'], "z": p['z'], "theta": p['theta']},
+            "offset_um": {"x": round(p['x'] - x0, 3), "z": round(p['z'] - z0, 3)},
+            "fov_um": {"x": round(fov_x, 3), "z": round(fov_z, 3)},
+        })
+    return tiles
+
+
+def write_tile_metadata(root, tile, binning=1, pixel_size=PIXEL_SIZE_UM):
+    """
+    Writes the tile coordinates in the attributes ("tile") of an OME-Zarr store (its open root group, or its path),
+    with the offset in pixels of its level 0, and adds the offset as a translation to the multiscales coordinate
+    transformations (so it is written after the OME metadata).
+    """
+    if not isinstance(root, zarr.Group):
+        if not os.path.isdir(root):
+            return
+        root = zarr.open_group(root, mode="r+")
+    pixel = pixel_size * (binning or 1)
+    root.attrs["tile"] = dict(tile, pixel_size_um=pixel,
+                              offset_px={"x": round(tile["offset_um"]["x"] / pixel, 2),
+                                         "y": round(tile["offset_um"]["z"] / pixel, 2)})
+
+    # (t, c, z, y, x): the image rows follow the stage Z, the columns the stage X
+    multiscales = root.attrs.get("multiscales")
+    if not multiscales:
+        return
+    translation = [0, 0, 0, tile["offset_um"]["z"], tile["offset_um"]["x"]]
+    for dataset in multiscales[0].get("datasets", []):
+        transforms = [t for t in dataset.get("coordinateTransformations", []) if t.get("type") != "translation"]
+        dataset["coordinateTransformations"] = transforms + [{"type": "translation", "translation": translation}]
+    root.attrs["multiscales"] = multiscales
@@ -10,22 +10,8 @@ from zarr.storage import DirectoryStore
 
 from pathlib import Path
 
-# Filterwheel imports
-import microscope
-from microscope.controllers.zaber import _ZaberFilterWheel, _ZaberConnection
-
-# Laserbox import
-import pyvisa
-
-# Scanner import
-import ctypes
-
 # Stages import
-from pipython import GCSDevice
-from pipython import GCSDevice, pitools
-
-# Cameras
-from pylablib.devices import DCAM
+from pipython import pitools
 
 import time
 
@@ -50,14 +36,37 @@ from zarr.convenience import copy
 from zarr import group, Blosc
 from zarr.storage import DirectoryStore
 
+from Extra_Files.Auto_Contrast import percentile_limits
+from Extra_Files.Tiling import write_tile_metadata
+from Extra_Files.RTC5_List_Program import get_sweep_program
+from Extra_Files.Scanner_Monitor import get_scanner_monitor, expected_sweep_ms
+from Extra_Files.Settle_Detector import get_settle_detector
+
 
 class y_stack():
 
+    # Scan pattern of every slice (None: a single sweep), set from the Scanner's settings
+    scan_pattern = None
+
+    # Timing model of the acquisition (Acquisition_Timing), fed with the stack writes and time spacing waits
+    timing = None
+
+    # Live preview of the stack being acquired (Stack_Preview), offered the newest slice before every mark
+    # and the last one after the stack
+    preview = None
+
+    # Metadata of the acquisition (Acquisition_Metadata): the OME metadata of every store is written from it when
+    # its array is created and its progress after every stack, so a partial dataset is always a valid OME-Zarr
+    metadata = None
+
+    # Times of the marks of the current stack (time.time(), one per slice)
+    _frame_times = ()
+
     #################################################################################
     # For the lY Stack first
 
-    def camera_parameters(self, camera, dynamic_range, binning, format_width_x, format_height_y, single_stack_n_frames):
-        """Function that defines a single camera's parameters and starts the acquisition"""
+    def camera_parameters(self, camera, dynamic_range, binning, format_width_x, format_height_y, single_stack_n_frames, settle_s=1):
+        """Function that defines a single camera's parameters and starts the acquisition (settle_s: pause after the stop)"""
 
         # 0) Convert the Dynamic Range parameter for input
         if dynamic_range == 8:
@@ -75,7 +84,8 @@ class y_stack():
         camera.stop_acquisition()
         camera.clear_acquisition()
 
-        time.sleep(1)
+        if settle_s:
+            time.sleep(settle_s)
 
         # 3) arrange the External Trigger Mode
         camera.set_trigger_mode("ext")
@@ -96,29 +106,194 @@ class y_stack():
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 
-    def mark_toptobottom(self, board, Xtop, Xbottom, speed):
-        """Function that scans the laser through the FOV, exposing the camera at the same time"""
+    def mark_toptobottom(self, board, Xtop, Xbottom, speed, offset=0):
+        """Function that scans the laser through the FOV, exposing the camera at the same time.
+        The offset moves the light-sheet plane (galvo perpendicular to the sweep), e.g. from the autofocus.
+        It returns once the sweep is finished, so the stage never moves during a sweep"""
+
+        # The sweep stays in the list memory: only the first slice (or a new offset) rebuilds it
+        get_sweep_program(board).sweep(Xtop, Xbottom, speed, offset, self.scan_pattern)
+
+        monitor = get_scanner_monitor(board)
+        if self.scan_pattern is not None:
+            monitor.sweep_started(self.scan_pattern.expected_ms(Xtop, Xbottom, speed))
+        else:
+            monitor.sweep_started(expected_sweep_ms(Xtop, Xbottom, speed))
+        if monitor.wait_sweep_finished() is None:
+            print("[Scanner] sweep did not finish in time")
+
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-        Zi = Xtop
-        Yi = 0
-        Zf = Xbottom
-        Yf = 0
+    def autofocus_stack(self, autofocus, pos_idx, time_point, Ys, Z,
+                        camera, camera_settings, filterwheel, filter_position,
+                        laserbox, laser, laser_power_W,
+                        rtc5_board, pidevice, scan_top, scan_bottom, mark_speed, beam_offset,
+                        stop_event, roots=()):
+        """Function that runs the autofocus at the center of a stack. Returns the (beam_offset, Z) to acquire with,
+        and writes the chosen value in the 'autofocus' attributes of the OME-Zarr roots"""
+
+        t0 = time.perf_counter()
+        dynamic_range, binning, format_x, format_y = camera_settings
+        settle_detector = get_settle_detector(pidevice)
+
+        # 1) Laser ON first, so it warms up during the camera set up, the filter change and the move.
+        #    The camera is set up once for every frame of the search (no pause: nothing is running on it)
+        t_laser = time.perf_counter()
+        if laser_power_W != 0:
+            laserbox.set_source(laser, True, laser_power_W)    # AMPLitude and STATe ON in one transaction
+        self.camera_parameters(camera, dynamic_range, binning, format_x, format_y, autofocus.max_evaluations(), settle_s=0)
+        filterwheel.set_position(filter_position)
+
+        pidevice.MOV('2', Ys[len(Ys) // 2])
+        settle_detector.wait('2', Ys[len(Ys) // 2], stop_event)
+
+        # Only the part of the 300 ms laser turn ON that is not over yet
+        if self._interruptible_sleep(max(0.0, 0.3 - (time.perf_counter() - t_laser)), stop_event):
+            laserbox.write(f"SOURce{laser}:AM:STATe OFF")
+            return beam_offset, Z
+
+        # 2) How to move the axis and measure the focus
+        current = {"offset": beam_offset}
+
+        def move(value):
+            if autofocus.axis == "Stage Z":
+                pidevice.MOV('3', value)
+                settle_detector.wait('3', value, stop_event)
+            else:
+                current["offset"] = value
+
+        def measure():
+            """Focus metric of a new frame, None if stopped or if the camera sent no frame (the search is aborted)"""
+            acquired = camera.get_frames_status()[0]
+            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed, current["offset"])
+
+            t_wait = time.perf_counter()
+            while camera.get_frames_status()[0] <= acquired:
+                if self._interruptible_sleep(0.001, stop_event):
+                    return None
+                if time.perf_counter() - t_wait > 2:
+                    print(f"Autofocus - Position {pos_idx+1}, T {time_point+1}: no frame from the camera "
+                          f"after 2 s, search aborted (keeping {autofocus.axis} = {center:.4f})")
+                    return None
+            return autofocus.metric(camera.read_newest_image())
+
+        # 3) Search around the last best value of this position
+        center = autofocus.last_best.get(pos_idx + 1, Z if autofocus.axis == "Stage Z" else beam_offset)
+        result = autofocus.search(move, measure, center, stop_event)
+
+        laserbox.write(f"SOURce{laser}:AM:STATe OFF")
+        camera.stop_acquisition()
+        camera.clear_acquisition()
 
-        board.set_start_list(1)
+        if result is None:
+            return beam_offset, Z
 
-        board.set_jump_speed(ctypes.c_double(800000))
-        board.set_mark_speed(ctypes.c_double(speed))
+        # 4) Go to the best value and keep it in the metadata
+        best, best_metric, evaluations = result
+        autofocus.record(pos_idx + 1, time_point, best, best_metric, evaluations)
 
-        board.jump_abs(ctypes.c_int(Zi), ctypes.c_int(Yi))
-        board.mark_abs(ctypes.c_int(Zf), ctypes.c_int(Yf))
+        if autofocus.axis == "Stage Z":
+            move(best)
+            Z = best
+        else:
+            beam_offset = best
 
-        board.set_end_of_list()
+        for root in roots:
+            root.attrs["autofocus"] = autofocus.records_for(pos_idx + 1)
 
-        board.execute_list(1)
+        print(f"Autofocus - Position {pos_idx+1}, T {time_point+1}: {autofocus.axis} = {best:.4f} "
+              f"({evaluations} frames, {time.perf_counter() - t0:.2f} s)")
 
+        return beam_offset, Z
 
     #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+    def _stack_written(self, t0, *arrays):
+        """Reports the read + write of a channel stack (started at t0) to the timing model."""
+        if self.timing is not None:
+            nbytes = sum(a.dtype.itemsize * int(np.prod(a.shape[2:])) for a in arrays)
+            self.timing.stack_written(nbytes, time.perf_counter() - t0)
+
+    def _wait_started(self, time_spacing):
+        if self.timing is not None and time_spacing > 0:
+            self.timing.wait_started(time_spacing)
+
+    def _before_mark(self, i, j, k, Y_steps, Y_spacing, *cameras):
+        """
+        Records the time of the mark of slice k, and offers slice k-1 (the newest frame, before slice k is marked)
+        of every camera to the live preview.
+        """
+        if k == 0:
+            self._frame_times = []
+        self._frame_times.append(time.time())
+        if self.preview is None or k == 0:
+            return
+        for camera_id, camera, binning in cameras:
+            self.preview.grab(camera, camera_id, i, j, k - 1, Y_steps, abs(Y_spacing) * 1000, binning)
+
+    def _stack_acquired(self, i, j, Y_steps, Y_spacing, *cameras):
+        """Offers the last slice of every camera to the live preview, once all the frames of the stack arrived."""
+        if self.preview is None:
+            return
+        for camera_id, camera, binning in cameras:
+            self.preview.grab(camera, camera_id, i, j, Y_steps - 1, Y_steps, abs(Y_spacing) * 1000, binning, force=True)
+
+    def _dataset_created(self, root, camera, pos_idx, acq_dir):
+        """
+        Writes the OME metadata and the tile coordinates of a new store from the plan, before its first frame
+        (the dataset is a valid OME-Zarr from now on), with an empty "timestamps" (T, C, Z) array of the frames
+        and the settings file of the position.
+        """
+        if self.metadata is None:
+            return
+        try:
+            self.write_metadata(root, **self.metadata.ome_parameters(camera, pos_idx))
+            tile = self.metadata.tile_parameters(camera, pos_idx)
+            if tile is not None:
+                write_tile_metadata(root, **tile)
+            T, C, Z = root["0"].shape[:3]
+            root.create_dataset("timestamps", shape=(T, C, Z), chunks=(1, 1, Z), dtype="float64",
+                                fill_value=np.nan, compressor=None, overwrite=True)
+            root.attrs["acquisition"] = self.metadata.progress(T, C)
+            settings = self.metadata.settings_parameters(pos_idx, acq_dir)
+            if settings is not None:
+                self.write_txt_settings(**settings)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[Metadata] Position {pos_idx+1}, Camera {camera}: could not write the metadata: {e}")
+
+    def _stack_completed(self, i, j, *arrays):
+        """
+        Updates the stores after the stack of time point i, channel j: the times of its frames (seconds from the
+        start), the channel window (from its middle slice, in the first time point) and the completed stacks.
+        Every write replaces a single file, so a reader never sees a half-written one.
+        Also waits for the live preview to read the slices offered from the stack (its camera buffer is cleared next).
+        """
+        if self.preview is not None:
+            self.preview.sync()
+        if self.metadata is None:
+            return
+        times = np.asarray(self._frame_times, dtype=float) - self.metadata.start
+        for array in arrays:
+            T, C, Z = array.shape[:3]
+            try:
+                root = group(store=array.store, overwrite=False)
+                stamps = np.full(Z, np.nan)
+                stamps[:min(Z, len(times))] = times[:Z]
+                root["timestamps"][i, j] = stamps
+
+                attributes = {"acquisition": self.metadata.progress(T, C, i * C + j + 1)}
+                omero = root.attrs.get("omero")
+                if i == 0 and omero and j < len(omero["channels"]):
+                    plane = np.asarray(array[i, j, Z // 2])
+                    if plane.any():
+                        low, high = percentile_limits(plane)
+                        omero["channels"][j]["window"].update(start=int(low), end=int(high))
+                        attributes["omero"] = omero
+                root.attrs.update(attributes)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"[Metadata] Could not update the progress of {array.store.path}: {e}")
+
     def _interruptible_sleep(self, duration, stop_event):
         """
         Wait up to `duration` seconds, but return immediately if stop_event is set.
@@ -141,8 +316,11 @@ class y_stack():
                 scan_top, scan_bottom, mark_speed,
                 save_dir,
                 slice_callback=None, channel_callback=None, timepoint_callback=None, position_callback=None,
-                stop_event=None):
+                stop_event=None, autofocus=None):
         """Function that performs Y Stacks with the Lambda-Y order, doing all time points in a single position, and then moving on to the next"""
+
+        # Light-sheet plane offset of the scanner (changed by the autofocus)
+        beam_offset = 0
         
         #.................................................................................................................
         # Setup the acquisition
@@ -254,6 +432,7 @@ class y_stack():
                     dtype = "uint16" if camera1_dynamic_range == 16 else "uint8",
                     compressor=Blosc()
                 )
+                self._dataset_created(root1, 1, pos_idx, acq_dir)
                 full_array2 = root2.create_dataset(
                     name="0",
                     shape=(time_points, nr_lasers, Y_steps, camera2_effective_format_y, camera2_effective_format_x),
@@ -261,10 +440,21 @@ class y_stack():
                     dtype = "uint16" if camera2_dynamic_range == 16 else "uint8",
                     compressor=Blosc()
                 )
+                self._dataset_created(root2, 2, pos_idx, acq_dir)
                 
                 # Loop to iterate over the time points
                 for i in range(time_points):
 
+                    # Autofocus at the center of the stack (before each position and time point)
+                    if autofocus is not None:
+                        beam_offset, Z = self.autofocus_stack(autofocus, pos_idx, i, Ys, Z,
+                                                              camera1, (camera1_dynamic_range, camera1_binning, camera1_format_x, camera1_format_y),
+                                                              filterwheel1, filters1[0], laserbox, lasers[0], laser_powers_W[0],
+                                                              rtc5_board, pidevice, scan_top, scan_bottom, mark_speed, beam_offset,
+                                                              stop_event, roots=[root1, root2])
+                        if stop_event.is_set():
+                            return [i, 0, 0]
+
                     # Loop to iterate over the Lasers
                     for j in range(nr_lasers):
 
@@ -288,7 +478,7 @@ class y_stack():
 
                             # Move the stage
                             pidevice.MOV('2', Ys[k])
-                            pitools.waitontarget(pidevice, axes=['2'])
+                            get_settle_detector(pidevice).wait('2', Ys[k], stop_event)
 
                             # Information emission and stop check
                             if stop_event.is_set():
@@ -304,8 +494,7 @@ class y_stack():
                                 if laser_powers_W[j] == 0:
                                     laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
                                 else:
-                                    laserbox.write(f"SOURce{lasers[j]}:AM:STATe ON")
-                                    laserbox.write(f"SOURce{lasers[j]}:POWer:LEVel:IMMediate:AMPLitude %.5f" % laser_powers_W[j])
+                                    laserbox.set_source(lasers[j], True, laser_powers_W[j])    # STATe ON and AMPLitude in one transaction
                                 if self._interruptible_sleep(0.3, stop_event):    # wait 300 ms for the laser to turn ON
                                     return [i, j, k]
                                 
@@ -314,8 +503,11 @@ class y_stack():
                                 if self._interruptible_sleep(0.001, stop_event):
                                     return [i, j, k]
                             
+                            # Time of the mark, and the newest slice to the live preview (only if it is due)
+                            self._before_mark(i, j, k, Y_steps, Y_spacing, (1, camera1, camera1_binning), (2, camera2, camera2_binning))
+
                             # Mark and acquire
-                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed)
+                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed, beam_offset)
 
                             # Add a frame to the counter
                             k += 1
@@ -329,9 +521,14 @@ class y_stack():
                             if self._interruptible_sleep(0.001, stop_event):
                                 return [i, j, k]
 
+                        # The last slice to the live preview (the previous ones were offered before the marks)
+                        self._stack_acquired(i, j, Y_steps, Y_spacing, (1, camera1, camera1_binning), (2, camera2, camera2_binning))
+
                         # After using this laser, turn it OFF
                         laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
 
+                        write_t0 = time.perf_counter()
+
                         # Initialize frame counters for both cameras - 1 to miss the dummy frame
                         camera1_frame_counter = 0
                         camera2_frame_counter = 0
@@ -368,6 +565,10 @@ class y_stack():
                             full_array2[i,j,:,:,:] = camera2.read_multiple_images(rng=(0,Y_steps))
 
                     
+                        # Time of the read + write of this stack
+                        self._stack_written(write_t0, full_array1, full_array2)
+                        self._stack_completed(i, j, full_array1, full_array2)
+
                         # Clear the Cameras for another Stack
                         camera1.stop_acquisition()
                         camera1.clear_acquisition()
@@ -378,6 +579,7 @@ class y_stack():
                     # Stop the system for the Time Spacing
                     if i == time_points - 1:
                         time_spacing = 0
+                    self._wait_started(time_spacing)
                     if self._interruptible_sleep(time_spacing, stop_event):
                         return [i, j, k]
 
@@ -404,10 +606,21 @@ class y_stack():
                     dtype = "uint16" if camera1_dynamic_range == 16 else "uint8",
                     compressor=Blosc()
                 )
+                self._dataset_created(root1, 1, pos_idx, acq_dir)
 
                 # Loop to iterate over the Time positions
                 for i in range(time_points):
 
+                    # Autofocus at the center of the stack (before each position and time point)
+                    if autofocus is not None:
+                        beam_offset, Z = self.autofocus_stack(autofocus, pos_idx, i, Ys, Z,
+                                                              camera1, (camera1_dynamic_range, camera1_binning, camera1_format_x, camera1_format_y),
+                                                              filterwheel1, filters1[0], laserbox, lasers[0], laser_powers_W[0],
+                                                              rtc5_board, pidevice, scan_top, scan_bottom, mark_speed, beam_offset,
+                                                              stop_event, roots=[root1])
+                        if stop_event.is_set():
+                            return [i, 0, 0]
+
                     # Loop to iterate over the Lasers
                     for j in range(nr_lasers):
 
@@ -429,7 +642,7 @@ class y_stack():
                             
                             # Move the stage
                             pidevice.MOV('2', Ys[k])
-                            pitools.waitontarget(pidevice, axes=['2'])
+                            get_settle_detector(pidevice).wait('2', Ys[k], stop_event)
 
                             # Information emission and stop check
                             if stop_event.is_set():
@@ -446,8 +659,7 @@ class y_stack():
                                 if laser_powers_W[j] == 0:
                                     laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
                                 else:
-                                    laserbox.write(f"SOURce{lasers[j]}:AM:STATe ON")
-                                    laserbox.write(f"SOURce{lasers[j]}:POWer:LEVel:IMMediate:AMPLitude %.5f" % laser_powers_W[j])
+                                    laserbox.set_source(lasers[j], True, laser_powers_W[j])    # STATe ON and AMPLitude in one transaction
                                 if self._interruptible_sleep(0.3, stop_event):    # wait 300 ms for the laser to turn ON
                                     return [i, j, k]
 
@@ -456,8 +668,11 @@ class y_stack():
                                 if self._interruptible_sleep(0.001, stop_event):
                                     return [i, j, k]
                                 
+                            # Time of the mark, and the newest slice to the live preview (only if it is due)
+                            self._before_mark(i, j, k, Y_steps, Y_spacing, (1, camera1, camera1_binning))
+
                             # Mark and acquire
-                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed)
+                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed, beam_offset)
 
                             # Add a frame to the counter
                             k += 1
@@ -473,10 +688,15 @@ class y_stack():
                             #print(camera1.get_frames_status())
                             if self._interruptible_sleep(0.001, stop_event):
                                 return [i, j, k]
+
+                        # The last slice to the live preview (the previous ones were offered before the marks)
+                        self._stack_acquired(i, j, Y_steps, Y_spacing, (1, camera1, camera1_binning))
                             
                         # After using this laser, turn it OFF
                         laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
 
+                        write_t0 = time.perf_counter()
+
                         # Initialize frame counters for both cameras - 0 to miss the dummy frame
                         camera1_frame_counter = 0
 
@@ -506,6 +726,10 @@ class y_stack():
                             full_array1[i,j,:,:,:] = camera1.read_multiple_images(rng=(0,Y_steps))
 
                     
+                        # Time of the read + write of this stack
+                        self._stack_written(write_t0, full_array1)
+                        self._stack_completed(i, j, full_array1)
+
                         # Clear the Cameras for another Stack
                         camera1.stop_acquisition()
                         camera1.clear_acquisition()
@@ -514,6 +738,7 @@ class y_stack():
                     # Stop the system for the Time Spacing
                     if i == time_points - 1:
                         time_spacing = 0
+                    self._wait_started(time_spacing)
                     if self._interruptible_sleep(time_spacing, stop_event):
                         return [i, j, k]
                     
@@ -540,10 +765,21 @@ class y_stack():
                     dtype = "uint16" if camera2_dynamic_range == 16 else "uint8",
                     compressor=Blosc()
                 )
+                self._dataset_created(root2, 2, pos_idx, acq_dir)
 
                 # Loop to iterate over the Time positions
                 for i in range(time_points):
 
+                    # Autofocus at the center of the stack (before each position and time point)
+                    if autofocus is not None:
+                        beam_offset, Z = self.autofocus_stack(autofocus, pos_idx, i, Ys, Z,
+                                                              camera2, (camera2_dynamic_range, camera2_binning, camera2_format_x, camera2_format_y),
+                                                              filterwheel2, filters2[0], laserbox, lasers[0], laser_powers_W[0],
+                                                              rtc5_board, pidevice, scan_top, scan_bottom, mark_speed, beam_offset,
+                                                              stop_event, roots=[root2])
+                        if stop_event.is_set():
+                            return [i, 0, 0]
+
                     # Loop to iterate over the Lasers
                     for j in range(nr_lasers):
 
@@ -563,7 +799,7 @@ class y_stack():
                             
                             # Move the stage
                             pidevice.MOV('2', Ys[k])
-                            pitools.waitontarget(pidevice, axes=['2'])
+                            get_settle_detector(pidevice).wait('2', Ys[k], stop_event)
 
                             # Information emission and stop check
                             if stop_event.is_set():
@@ -579,8 +815,7 @@ class y_stack():
                                 if laser_powers_W[j] == 0:
                                     laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
                                 else:
-                                    laserbox.write(f"SOURce{lasers[j]}:AM:STATe ON")
-                                    laserbox.write(f"SOURce{lasers[j]}:POWer:LEVel:IMMediate:AMPLitude %.5f" % laser_powers_W[j])
+                                    laserbox.set_source(lasers[j], True, laser_powers_W[j])    # STATe ON and AMPLitude in one transaction
                                 if self._interruptible_sleep(0.3, stop_event):    # wait 300 ms for the laser to turn ON
                                     return [i, j, k]
                                 
@@ -589,8 +824,11 @@ class y_stack():
                                 if self._interruptible_sleep(0.001, stop_event):
                                     return [i, j, k]
                             
+                            # Time of the mark, and the newest slice to the live preview (only if it is due)
+                            self._before_mark(i, j, k, Y_steps, Y_spacing, (2, camera2, camera2_binning))
+
                             # Mark and acquire
-                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed)
+                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed, beam_offset)
 
                             # Add a frame to the counter
                             k += 1
@@ -605,10 +843,15 @@ class y_stack():
                         while (camera2.get_frames_status()[0] < Y_steps):
                             if self._interruptible_sleep(0.001, stop_event):
                                 return [i, j, k]
+
+                        # The last slice to the live preview (the previous ones were offered before the marks)
+                        self._stack_acquired(i, j, Y_steps, Y_spacing, (2, camera2, camera2_binning))
                             
                         # After using this laser, turn it OFF
                         laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
 
+                        write_t0 = time.perf_counter()
+
                         # Initialize frame counters for both cameras - 0 to miss the dummy frame
                         camera2_frame_counter = 0
 
@@ -637,6 +880,10 @@ class y_stack():
                         else:
                             full_array2[i,j,:,:,:] = camera2.read_multiple_images(rng=(0,Y_steps))
 
+                        # Time of the read + write of this stack
+                        self._stack_written(write_t0, full_array2)
+                        self._stack_completed(i, j, full_array2)
+
                         # Clear the Cameras for another Stack
                         camera2.stop_acquisition()
                         camera2.clear_acquisition()
@@ -644,6 +891,7 @@ class y_stack():
                     # Stop the system for the Time Spacing
                     if i == time_points - 1:
                         time_spacing = 0
+                    self._wait_started(time_spacing)
                     if self._interruptible_sleep(time_spacing, stop_event):
                         return [i, j, k]
 
@@ -664,8 +912,11 @@ class y_stack():
                 scan_top, scan_bottom, mark_speed,
                 save_dir,
                 slice_callback=None, channel_callback=None, timepoint_callback=None, position_callback=None,
-                stop_event=None):
+                stop_event=None, autofocus=None):
         """Function that performs Y Stacks with the Lambda-Y order, doing all multi-positions in a single time point."""
+
+        # Light-sheet plane offset of the scanner (changed by the autofocus)
+        beam_offset = 0
         
         
         #.................................................................................................................
@@ -780,6 +1031,7 @@ class y_stack():
                             dtype = "uint16" if camera1_dynamic_range == 16 else "uint8",
                             compressor=Blosc()
                         )
+                        self._dataset_created(root1, 1, pos_idx, acq_dir)
                         full_array2 = root2.create_dataset(
                             name="0",
                             shape=(time_points, nr_lasers, Y_steps, camera2_effective_format_y, camera2_effective_format_x),
@@ -787,6 +1039,7 @@ class y_stack():
                             dtype = "uint16" if camera2_dynamic_range == 16 else "uint8",
                             compressor=Blosc()
                         )
+                        self._dataset_created(root2, 2, pos_idx, acq_dir)
 
                     else:
                         # re-opens the same stores and grabs the dataset
@@ -799,6 +1052,16 @@ class y_stack():
                         full_array1 = root1["0"]
                         full_array2 = root2["0"]
 
+                    # Autofocus at the center of the stack (before each position and time point)
+                    if autofocus is not None:
+                        beam_offset, Z = self.autofocus_stack(autofocus, pos_idx, i, Ys, Z,
+                                                              camera1, (camera1_dynamic_range, camera1_binning, camera1_format_x, camera1_format_y),
+                                                              filterwheel1, filters1[0], laserbox, lasers[0], laser_powers_W[0],
+                                                              rtc5_board, pidevice, scan_top, scan_bottom, mark_speed, beam_offset,
+                                                              stop_event, roots=[root1, root2])
+                        if stop_event.is_set():
+                            return [i, 0, 0]
+
                     # Loop to iterate over the Lasers
                     for j in range(nr_lasers):
 
@@ -822,7 +1085,7 @@ class y_stack():
 
                             # Move the stage
                             pidevice.MOV('2', Ys[k])
-                            pitools.waitontarget(pidevice, axes=['2'])
+                            get_settle_detector(pidevice).wait('2', Ys[k], stop_event)
 
                             # Information emission and stop check
                             if stop_event.is_set():
@@ -838,8 +1101,7 @@ class y_stack():
                                 if laser_powers_W[j] == 0:
                                     laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
                                 else:
-                                    laserbox.write(f"SOURce{lasers[j]}:AM:STATe ON")
-                                    laserbox.write(f"SOURce{lasers[j]}:POWer:LEVel:IMMediate:AMPLitude %.5f" % laser_powers_W[j])
+                                    laserbox.set_source(lasers[j], True, laser_powers_W[j])    # STATe ON and AMPLitude in one transaction
                                 if self._interruptible_sleep(0.3, stop_event):    # wait 300 ms for the laser to turn ON
                                     return [i, j, k]
                                 
@@ -848,8 +1110,11 @@ class y_stack():
                                 if self._interruptible_sleep(0.001, stop_event):
                                     return [i, j, k]
                             
+                            # Time of the mark, and the newest slice to the live preview (only if it is due)
+                            self._before_mark(i, j, k, Y_steps, Y_spacing, (1, camera1, camera1_binning), (2, camera2, camera2_binning))
+
                             # Mark and acquire
-                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed)
+                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed, beam_offset)
 
                             # Add a frame to the counter
                             k += 1
@@ -863,9 +1128,14 @@ class y_stack():
                             if self._interruptible_sleep(0.001, stop_event):
                                 return [i, j, k]
 
+                        # The last slice to the live preview (the previous ones were offered before the marks)
+                        self._stack_acquired(i, j, Y_steps, Y_spacing, (1, camera1, camera1_binning), (2, camera2, camera2_binning))
+
                         # After using this laser, turn it OFF
                         laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
 
+                        write_t0 = time.perf_counter()
+
                         # Initialize frame counters for both cameras
                         camera1_frame_counter = 0
                         camera2_frame_counter = 0
@@ -902,6 +1172,10 @@ class y_stack():
                             full_array2[i,j,:,:,:] = camera2.read_multiple_images(rng=(0,Y_steps))
 
                         
+                        # Time of the read + write of this stack
+                        self._stack_written(write_t0, full_array1, full_array2)
+                        self._stack_completed(i, j, full_array1, full_array2)
+
                         # Clear the Cameras for another Stack
                         camera1.stop_acquisition()
                         camera1.clear_acquisition()
@@ -932,6 +1206,7 @@ class y_stack():
                             dtype = "uint16" if camera1_dynamic_range == 16 else "uint8",
                             compressor=Blosc()
                         )
+                        self._dataset_created(root1, 1, pos_idx, acq_dir)
 
                     else:
                         # re-opens the same stores and grabs the dataset
@@ -939,6 +1214,16 @@ class y_stack():
                         root1 = group(store=DirectoryStore(str(store_path1)), overwrite=False)
                         full_array1 = root1["0"]
 
+                    # Autofocus at the center of the stack (before each position and time point)
+                    if autofocus is not None:
+                        beam_offset, Z = self.autofocus_stack(autofocus, pos_idx, i, Ys, Z,
+                                                              camera1, (camera1_dynamic_range, camera1_binning, camera1_format_x, camera1_format_y),
+                                                              filterwheel1, filters1[0], laserbox, lasers[0], laser_powers_W[0],
+                                                              rtc5_board, pidevice, scan_top, scan_bottom, mark_speed, beam_offset,
+                                                              stop_event, roots=[root1])
+                        if stop_event.is_set():
+                            return [i, 0, 0]
+
                     # Loop to iterate over the Lasers
                     for j in range(nr_lasers):
 
@@ -960,7 +1245,7 @@ class y_stack():
 
                             # Move the stage
                             pidevice.MOV('2', Ys[k])
-                            pitools.waitontarget(pidevice, axes=['2'])
+                            get_settle_detector(pidevice).wait('2', Ys[k], stop_event)
 
                             # Information emission and stop check
                             if stop_event.is_set():
@@ -976,8 +1261,7 @@ class y_stack():
                                 if laser_powers_W[j] == 0:
                                     laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
                                 else:
-                                    laserbox.write(f"SOURce{lasers[j]}:AM:STATe ON")
-                                    laserbox.write(f"SOURce{lasers[j]}:POWer:LEVel:IMMediate:AMPLitude %.5f" % laser_powers_W[j])
+                                    laserbox.set_source(lasers[j], True, laser_powers_W[j])    # STATe ON and AMPLitude in one transaction
                                 if self._interruptible_sleep(0.3, stop_event):    # wait 300 ms for the laser to turn ON
                                     return [i, j, k]
                                 
@@ -986,8 +1270,11 @@ class y_stack():
                                 if self._interruptible_sleep(0.001, stop_event):
                                     return [i, j, k]
                             
+                            # Time of the mark, and the newest slice to the live preview (only if it is due)
+                            self._before_mark(i, j, k, Y_steps, Y_spacing, (1, camera1, camera1_binning))
+
                             # Mark and acquire
-                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed)
+                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed, beam_offset)
 
                             # Add a frame to the counter
                             k += 1
@@ -1001,9 +1288,14 @@ class y_stack():
                             if self._interruptible_sleep(0.001, stop_event):
                                 return [i, j, k]
 
+                        # The last slice to the live preview (the previous ones were offered before the marks)
+                        self._stack_acquired(i, j, Y_steps, Y_spacing, (1, camera1, camera1_binning))
+
                         # After using this laser, turn it OFF
                         laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
 
+                        write_t0 = time.perf_counter()
+
                         # Initialize frame counters for both camera
                         camera1_frame_counter = 0
 
@@ -1034,6 +1326,10 @@ class y_stack():
                             full_array1[i,j,:,:,:] = camera1.read_multiple_images(rng=(0,Y_steps))
 
                         
+                        # Time of the read + write of this stack
+                        self._stack_written(write_t0, full_array1)
+                        self._stack_completed(i, j, full_array1)
+
                         # Clear the Cameras for another Stack
                         camera1.stop_acquisition()
                         camera1.clear_acquisition()
@@ -1063,6 +1359,7 @@ class y_stack():
                             dtype = "uint16" if camera2_dynamic_range == 16 else "uint8",
                             compressor=Blosc()
                         )
+                        self._dataset_created(root2, 2, pos_idx, acq_dir)
 
                     else:
                         # re-opens the same stores and grabs the dataset
@@ -1070,6 +1367,16 @@ class y_stack():
                         root2 = group(store=DirectoryStore(str(store_path2)), overwrite=False)
                         full_array2 = root2["0"]
 
+                    # Autofocus at the center of the stack (before each position and time point)
+                    if autofocus is not None:
+                        beam_offset, Z = self.autofocus_stack(autofocus, pos_idx, i, Ys, Z,
+                                                              camera2, (camera2_dynamic_range, camera2_binning, camera2_format_x, camera2_format_y),
+                                                              filterwheel2, filters2[0], laserbox, lasers[0], laser_powers_W[0],
+                                                              rtc5_board, pidevice, scan_top, scan_bottom, mark_speed, beam_offset,
+                                                              stop_event, roots=[root2])
+                        if stop_event.is_set():
+                            return [i, 0, 0]
+
                     # Loop to iterate over the Lasers
                     for j in range(nr_lasers):
 
@@ -1091,7 +1398,7 @@ class y_stack():
 
                             # Move the stage
                             pidevice.MOV('2', Ys[k])
-                            pitools.waitontarget(pidevice, axes=['2'])
+                            get_settle_detector(pidevice).wait('2', Ys[k], stop_event)
 
                             # Information emission and stop check
                             if stop_event.is_set():
@@ -1107,8 +1414,7 @@ class y_stack():
                                 if laser_powers_W[j] == 0:
                                     laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
                                 else:
-                                    laserbox.write(f"SOURce{lasers[j]}:AM:STATe ON")
-                                    laserbox.write(f"SOURce{lasers[j]}:POWer:LEVel:IMMediate:AMPLitude %.5f" % laser_powers_W[j])
+                                    laserbox.set_source(lasers[j], True, laser_powers_W[j])    # STATe ON and AMPLitude in one transaction
                                 if self._interruptible_sleep(0.3, stop_event):    # wait 300 ms for the laser to turn ON
                                     return [i, j, k]
                                 
@@ -1117,8 +1423,11 @@ class y_stack():
                                 if self._interruptible_sleep(0.001, stop_event):
                                     return [i, j, k]
                             
+                            # Time of the mark, and the newest slice to the live preview (only if it is due)
+                            self._before_mark(i, j, k, Y_steps, Y_spacing, (2, camera2, camera2_binning))
+
                             # Mark and acquire
-                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed)
+                            self.mark_toptobottom(rtc5_board, scan_top, scan_bottom, mark_speed, beam_offset)
 
                             # Add a frame to the counter
                             k += 1
@@ -1132,9 +1441,14 @@ class y_stack():
                             if self._interruptible_sleep(0.001, stop_event):
                                 return [i, j, k]
 
+                        # The last slice to the live preview (the previous ones were offered before the marks)
+                        self._stack_acquired(i, j, Y_steps, Y_spacing, (2, camera2, camera2_binning))
+
                         # After using this laser, turn it OFF
                         laserbox.write(f"SOURce{lasers[j]}:AM:STATe OFF")
 
+                        write_t0 = time.perf_counter()
+
                         # Initialize frame counters for both cameras
                         camera2_frame_counter = 0
 
@@ -1165,6 +1479,10 @@ class y_stack():
                             full_array2[i,j,:,:,:] = camera2.read_multiple_images(rng=(0,Y_steps))
 
                         
+                        # Time of the read + write of this stack
+                        self._stack_written(write_t0, full_array2)
+                        self._stack_completed(i, j, full_array2)
+
                         # Clear the Cameras for another Stack
                         camera2.stop_acquisition()
                         camera2.clear_acquisition()
@@ -1175,6 +1493,7 @@ class y_stack():
             # Stop the system for the Time Spacing
             if i == time_points - 1:
                 time_spacing = 0
+            self._wait_started(time_spacing)
             if self._interruptible_sleep(time_spacing, stop_event):
                 return [i, j, k]
 
@@ -1190,7 +1509,7 @@ class y_stack():
 
     def write_metadata(
         self,
-        zarr_path: str,
+        root: zarr.Group | str,
         filter_list: list[int],
         dynamic_range: int,
         binning: int,
@@ -1201,6 +1520,11 @@ class y_stack():
         pixel_size_x: float | None = None,
         pixel_size_y: float | None = None,
     ) -> None:
+        """
+        Writes the multiscales and OMERO metadata of an OME-Zarr store (its open root group, or its path).
+        Only the shape of the level-0 array is used, so it is written right after the array is created;
+        the channel windows start at fixed fractions of the range (y_stack._stack_completed sets them from the data).
+        """
         # ─── 1) Time spacing ────────────────────────────────────────────────
         if not t_spacing or t_spacing <= 0:
             t_spacing = 1.0
@@ -1220,10 +1544,10 @@ class y_stack():
         psz = z_step or 1.0
 
         # ─── 3) Open the root & inspect level-0 ─────────────────────────────
-        root = zarr.open_group(zarr_path, mode="r+")
+        if not isinstance(root, zarr.Group):
+            root = zarr.open_group(root, mode="r+")
         arr0 = root["0"]                     # shape = (T, C, Z, Y, X)
         T, C, Z, Y, X = arr0.shape
-        dtype = arr0.dtype
 
         # # ─── 7) Build axes metadata ─────────────────────────────────────────
         axes = [
@@ -1275,19 +1599,20 @@ class y_stack():
             }.items()
         }
         channels_meta = []
-        for idx in filter_list:
+        for c, idx in enumerate(filter_list):
             nm = FLUORO[idx] if idx < len(FLUORO) else "Other"
             p  = PROPS[nm]
+            window = {"min":0,"max":max_int, **p["window"]}
             channels_meta.append({
                 "label":  nm,
                 "color":  p["color"],
-                "window": {"min":0,"max":max_int, **p["window"]},
+                "window": window,
                 "active": True
             })
 
         root.attrs["omero"] = {
             "id":       0,
-            "name":     Path(zarr_path).name,
+            "name":     Path(root.store.path).name,
             "version":  "0.4",
             "channels": channels_meta,
             "rdefs":    {"model":"color","defaultT":0,"defaultZ":0},
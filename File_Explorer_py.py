@@ -1,55 +1,75 @@
 import sys
 import os
+import re
 import json
 
 from PySide6.QtCore import (
     QDir, Qt, QModelIndex,
-    QThreadPool, QRunnable, Signal, Slot, QPoint, QEvent
+    QThreadPool, QRunnable, Signal, Slot, QPoint, QEvent, QTimer, QFileSystemWatcher, QProcess
 )
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QLineEdit, QPushButton, QFileDialog, QTreeView, QFileSystemModel,
-    QInputDialog, QMessageBox, QHeaderView, QDialog
+    QInputDialog, QMessageBox, QHeaderView, QDialog, QLabel
 )
 from PySide6.QtGui import QIcon, QCursor
 from PySide6.QtCore import QSize, QFile
 
 from pathlib import Path
 
+from Extra_Files.Folder_Size_Index import get_folder_size_index
+from Extra_Files.Stitching import cameras_of
+
 class ClickableTreeView(QTreeView):
     """Uses eventFilter on blank-space clicks to clear selection; no focusOut override."""
     pass
 
 class _FolderSizeWorker(QRunnable):
     """
-    QRunnable that computes the total size of a directory, then
+    QRunnable that computes the total size of a directory with the folder size index, then
     emits model.sizeComputed(path, size).
     """
-    def __init__(self, path: str, notify_signal: Signal):
+    def __init__(self, path: str, size_index, notify_signal: Signal):
         super().__init__()
         self.path = path
+        self.size_index = size_index
         self.notify = notify_signal
 
     def run(self):
-        total = 0
-        for root, dirs, files in os.walk(self.path):
-            for fn in files:
-                try:
-                    total += os.path.getsize(os.path.join(root, fn))
-                except OSError:
-                    pass
+        total, estimated = self.size_index.size(self.path)
+        self.size_index.maybe_save()
         self.notify.emit(self.path, total)
 
+# Progress ("Stage: done/total") and output ("Stitched: path") lines of python -m Extra_Files.Stitching
+_STITCH_PROGRESS = re.compile(r"^(\w+): (\d+)/(\d+)$")
+_STITCH_OUTPUT = re.compile(r"^Stitched: (.+)$")
+
 class FileSystemModelWithFolderSizes(QFileSystemModel):
     sizeComputed = Signal(str, object)
 
+    # Directory changes are collected for this long before the sizes are refreshed
+    REFRESH_DELAY_MS = 1000
+    REFRESH_DELAY_ACQUIRING_MS = 10000
+    # Maximum number of directories watched under the shown folder
+    WATCH_LIMIT = 256
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self._size_cache = {}
+        self.size_index = get_folder_size_index()
         self._pending = set()
-        self._pool = QThreadPool.globalInstance()
+        # Own pool, so the size walks never hold the global one
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
         self.sizeComputed.connect(self._on_size_computed)
 
+        # Watcher of the shown folder: a change marks the sizes of that directory and its parents out of date
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._changed = set()
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.timeout.connect(self._refresh_changed)
+
     def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
         return super().columnCount(parent) + 1
 
@@ -59,12 +79,13 @@ class FileSystemModelWithFolderSizes(QFileSystemModel):
             info = self.fileInfo(index)
             if info.isDir():
                 path = info.absoluteFilePath()
-                if path in self._size_cache:
-                    return self._humanReadable(self._size_cache[path])
-                if path not in self._pending:
-                    self._pending.add(path)
-                    worker = _FolderSizeWorker(path, self.sizeComputed)
-                    self._pool.start(worker)
+                cached = self.size_index.cached_total(path)
+                if cached is None or not cached[2]:
+                    self._start_worker(path)
+                if cached is not None:
+                    # The last size stays shown while an out of date one is recomputed
+                    size, estimated, _ = cached
+                    return ("~" if estimated else "") + self._humanReadable(size)
                 return "Calculating..."
         # "Date Created" column (column 4)
         if role == Qt.DisplayRole and index.column() == 4:
@@ -75,15 +96,81 @@ class FileSystemModelWithFolderSizes(QFileSystemModel):
             return ""
         return super().data(index, role)
 
-    @Slot(str, int)
-    def _on_size_computed(self, path: str, size: int):
-        self._size_cache[path] = size
-        self._pending.discard(path)
+    def _start_worker(self, path: str):
+        if path in self._pending:
+            return
+        self._pending.add(path)
+        self._pool.start(_FolderSizeWorker(path, self.size_index, self.sizeComputed))
+
+    def _emit_size_changed(self, path: str):
         idx = self.index(path)
         if idx.isValid():
             size_idx = idx.sibling(idx.row(), 1)
             self.dataChanged.emit(size_idx, size_idx, [Qt.DisplayRole])
 
+    @Slot(str, object)
+    def _on_size_computed(self, path: str, size: int):
+        self._pending.discard(path)
+        self._emit_size_changed(path)
+        self._watch(path)
+
+    #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    # Invalidation
+
+    def setRootPath(self, path: str):
+        # Only the shown folder is watched
+        watched = self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+        if os.path.isdir(path):
+            self._watcher.addPath(path)
+        return super().setRootPath(path)
+
+    def _watch(self, path: str):
+        """Watches the directories of a shown folder (as known by the index), up to WATCH_LIMIT in total."""
+        watched = set(self._watcher.directories())
+        room = self.WATCH_LIMIT - len(watched)
+        if room <= 0:
+            return
+        new = [QDir.fromNativeSeparators(d) for d in self.size_index.subdirectories(path, limit=room)]
+        new = [d for d in new if d not in watched]
+        if new:
+            self._watcher.addPaths(new)
+
+    @Slot(str)
+    def _on_directory_changed(self, path: str):
+        self._changed.add(path)
+        if not self._refresh_timer.isActive():
+            acquiring = self.size_index.acquiring
+            self._refresh_timer.start(self.REFRESH_DELAY_ACQUIRING_MS if acquiring else self.REFRESH_DELAY_MS)
+
+    def _refresh_changed(self):
+        changed, self._changed = self._changed, set()
+        for path in changed:
+            self.invalidate(path)
+
+    def invalidate(self, path: str):
+        """Marks the size of path and its parents out of date, so the shown ones are recomputed."""
+        path = QDir.fromNativeSeparators(path)
+        self.size_index.invalidate(path)
+        while path:
+            self._emit_size_changed(path)
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+
+    def set_acquiring(self, acquiring: bool):
+        """During an acquisition the size walks run at low IO priority and refresh less often."""
+        self.size_index.acquiring = acquiring
+        if not acquiring:
+            # Everything written during the acquisition
+            self.size_index.invalidate_all()
+            root = self.index(self.rootPath())
+            rows = self.rowCount(root)
+            if rows:
+                self.dataChanged.emit(self.index(0, 1, root), self.index(rows - 1, 1, root), [Qt.DisplayRole])
+
     def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole):
         if orientation == Qt.Horizontal and role == Qt.DisplayRole:
             headers = ["Name", "Size", "Type", "Date Modified", "Date Created"]
@@ -312,9 +399,24 @@ class File_Explorer(QWidget):
         self.browse_btn     = QPushButton("Browse…", self)
         self.new_folder_btn = QPushButton("New Folder", self)
         self.delete_btn     = QPushButton("Delete", self)
+        self.stitch_btn     = QPushButton("Stitch", self)
+        self.stitch_btn.setToolTip("Stitches the positions of the selected experiment folder\ninto a fused OME-Zarr (Stitched_CameraN.ome.zarr)")
+
+        # Stitching runs one experiment at a time, in its own process (its process pool never re-imports the GUI)
+        self.stitch_process = QProcess(self)
+        self.stitch_process.setWorkingDirectory(os.path.dirname(os.path.abspath(__file__)))
+        self.stitch_process.setProcessChannelMode(QProcess.MergedChannels)
+        self.stitch_process.readyReadStandardOutput.connect(self._on_stitch_output)
+        self.stitch_process.finished.connect(self._on_stitch_finished)
+        self.stitch_process.errorOccurred.connect(self._on_stitch_error)
+        self._stitch_buffer = ""
+        self._stitch_outputs = []
+        self._stitch_log = []
+        self._stitching = False
+        self._acquiring = False
 
         # prevent these buttons from stealing focus
-        for btn in (self.back_btn, self.browse_btn, self.new_folder_btn, self.delete_btn):
+        for btn in (self.back_btn, self.browse_btn, self.new_folder_btn, self.delete_btn, self.stitch_btn):
             btn.setFocusPolicy(Qt.NoFocus)
 
         # model & view
@@ -341,8 +443,17 @@ class File_Explorer(QWidget):
         top.addWidget(self.path_edit)
         top.addWidget(self.browse_btn)
 
+        # Notices (e.g. a Snap was saved)
+        self.notice_label = QLabel("", self)
+        self.notice_label.setStyleSheet("QLabel { color: #5EB868; font-size: 12px; }")
+        self.notice_timer = QTimer(self)
+        self.notice_timer.setSingleShot(True)
+        self.notice_timer.timeout.connect(lambda: self.notice_label.setText(""))
+
         second = QHBoxLayout()
+        second.addWidget(self.notice_label)
         second.addStretch()
+        second.addWidget(self.stitch_btn)
         second.addWidget(self.new_folder_btn)
         second.addWidget(self.delete_btn)
 
@@ -356,6 +467,7 @@ class File_Explorer(QWidget):
         self.browse_btn.clicked.connect(self.on_browse)
         self.new_folder_btn.clicked.connect(self.on_new_folder)
         self.delete_btn.clicked.connect(self.on_delete)
+        self.stitch_btn.clicked.connect(self.on_stitch)
         self.path_edit.returnPressed.connect(self.on_path_edited)
         self.tree.doubleClicked.connect(self.on_tree_activated)
 
@@ -363,6 +475,35 @@ class File_Explorer(QWidget):
         default = start_path or QDir.homePath()
         self._navigate_to(default)
 
+    @Slot(str)
+    def notify_saved(self, path: str):
+        """Shows a notice for a newly written file/folder and selects it if it is in the current folder."""
+        name = os.path.basename(os.path.normpath(path))
+        self.notice_label.setText(f"Saved {name}")
+        self.notice_timer.start(6000)
+
+        # The parent folder size changed
+        self.model.invalidate(path)
+
+        idx = self.model.index(QDir.fromNativeSeparators(path))
+        if idx.isValid():
+            self.tree.setCurrentIndex(idx)
+            self.tree.scrollTo(idx)
+
+    def set_acquiring(self, acquiring: bool):
+        self.model.set_acquiring(acquiring)
+        # The stitching would compete with the acquisition for the disk and the CPUs
+        self._acquiring = acquiring
+        self.stitch_btn.setEnabled(not acquiring and not self._stitching)
+        if acquiring and self._stitching:
+            self.cancel_stitch()
+
+    def cancel_stitch(self):
+        """Asks the stitching process to stop (it finishes the tasks in flight and exits)."""
+        if self.stitch_process.state() != QProcess.NotRunning:
+            self.stitch_process.write(b"stop\n")
+            self.notice_label.setText("Stopping the stitching…")
+
     def _navigate_to(self, path: str):
         """Set view to `path` and enable/disable the Up button based on parent existence."""
         self.path_edit.setText(path)
@@ -467,6 +608,63 @@ class File_Explorer(QWidget):
         if not success:
             QMessageBox.warning(self, "Error", f"Could not delete:\n{path}")
 
+    def on_stitch(self):
+        """Stitches the selected experiment folder (or the current one)"""
+        selected = self.tree.selectionModel().selectedRows(0)
+        path = self.model.filePath(selected[0]) if selected else self.path_edit.text()
+        if not os.path.isdir(path) or not cameras_of(path):
+            QMessageBox.warning(self, "Error", f"No positions to stitch in:\n{path}")
+            return
+
+        self._stitching = True
+        self._stitch_buffer = ""
+        self._stitch_outputs = []
+        self._stitch_log = []
+        self.stitch_btn.setEnabled(False)
+        self.notice_timer.stop()
+        self.notice_label.setText(f"Stitching {os.path.basename(os.path.normpath(path))}…")
+        self.stitch_process.start(sys.executable, ["-m", "Extra_Files.Stitching", path, "--stop-on-stdin"])
+
+    @Slot()
+    def _on_stitch_output(self):
+        self._stitch_buffer += bytes(self.stitch_process.readAllStandardOutput()).decode(errors="replace")
+        # The progress is rewritten on the same line (\r), the outputs are whole lines
+        *lines, self._stitch_buffer = re.split(r"[\r\n]", self._stitch_buffer)
+        for line in filter(None, (l.strip() for l in lines)):
+            progress = _STITCH_PROGRESS.match(line)
+            output = _STITCH_OUTPUT.match(line)
+            if progress:
+                stage, done, total = progress.group(1), int(progress.group(2)), int(progress.group(3))
+                self.notice_label.setText(f"Stitching - {stage}: {100 * done // max(1, total)} %")
+            elif output:
+                self._stitch_outputs.append(output.group(1))
+            else:
+                print(line)
+                self._stitch_log = (self._stitch_log + [line])[-10:]
+
+    @Slot(int, QProcess.ExitStatus)
+    def _on_stitch_finished(self, exit_code: int, exit_status):
+        self._on_stitch_output()
+        self._stitching = False
+        self.stitch_btn.setEnabled(not self._acquiring)
+        for output in self._stitch_outputs:
+            self.notify_saved(output)
+        if exit_code == 2:
+            self.notice_label.setText("Stitching stopped (acquisition started)")
+            self.notice_timer.start(6000)
+        elif exit_code != 0 or exit_status != QProcess.NormalExit:
+            self.notice_label.setText("")
+            QMessageBox.warning(self, "Error", "Could not stitch the positions:\n" + "\n".join(self._stitch_log[-5:]))
+
+    @Slot(QProcess.ProcessError)
+    def _on_stitch_error(self, error):
+        if error != QProcess.FailedToStart:
+            return      # a crash also ends in _on_stitch_finished
+        self._stitching = False
+        self.stitch_btn.setEnabled(not self._acquiring)
+        self.notice_label.setText("")
+        QMessageBox.warning(self, "Error", f"Could not start the stitching:\n{self.stitch_process.errorString()}")
+
     def eventFilter(self, obj, event):
         if obj is self.tree.viewport() and event.type() == QEvent.MouseButtonPress:
             idx = self.tree.indexAt(event.pos())
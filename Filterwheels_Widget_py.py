@@ -1,7 +1,4 @@
 # Imports from libraries
-import microscope
-from microscope.controllers.zaber import _ZaberFilterWheel, _ZaberConnection
-
 from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
     QMetaObject, QObject, QPoint, QRect,
     QSize, QTime, QUrl, Qt)
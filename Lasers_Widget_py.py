@@ -26,7 +26,6 @@ import numpy as np
 from Extra_Files.ToolTip_Manager import CustomToolTipManager
 from PySide6.QtGui import QDrag, QPixmap, QIcon, QPainter, QPainterPath, QColor, QCursor
 from PySide6.QtCore import QObject, QThread, Signal, Slot
-import pyvisa
 
 # Imports from files
 from Extra_Files.ToolTip_Manager import CustomToolTipManager
@@ -1034,15 +1033,28 @@ class LaserWorker(QObject):
         super().__init__()
         self.laserbox = laserbox
         self.updatePower.connect(self.set_power)
+        # Latest requested power of each laser, not sent yet
+        self._pending = {}
+        self._flush_scheduled = False
 
     @Slot(int, float)
     def set_power(self, laser_number, power_value):
-        if power_value == 0:
-            self.laserbox.write(f"SOURce{6-laser_number}:AM:STATe OFF")
-        else:
-            self.laserbox.write(f"SOURce{6-laser_number}:AM:STATe ON")
-            power_value /= 1000  # Convert to watts
-            self.laserbox.write(f"SOURce{6-laser_number}:POWer:LEVel:IMMediate:AMPLitude %.5f" % power_value)
+        # A slider burst queues many updates: only the latest value of each laser is sent,
+        # once the queued updates have been processed
+        self._pending[laser_number] = power_value
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            QTimer.singleShot(0, self.flush)
+
+    @Slot()
+    def flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, {}
+        for laser_number, power_value in pending.items():
+            if power_value == 0:
+                self.laserbox.set_source(6-laser_number, False)
+            else:
+                self.laserbox.set_source(6-laser_number, True, power_value / 1000)  # Convert to watts
 
 
 class Lasers_Widget(QWidget):
@@ -1061,16 +1073,10 @@ class Lasers_Widget(QWidget):
         self.laserbox = device
 
         # make sure to turn OFF all the lasers
-        self.laserbox.write("SOURce2:AM:STATe OFF")
-        self.laserbox.write("SOURce3:AM:STATe OFF")
-        self.laserbox.write("SOURce4:AM:STATe OFF")
-        self.laserbox.write("SOURce5:AM:STATe OFF")
+        self.laserbox.all_off()
 
         # make the lasers start up in CW Mode
-        self.laserbox.write(f"SOURce2:AM:INTernal CWP")
-        self.laserbox.write(f"SOURce3:AM:INTernal CWP")
-        self.laserbox.write(f"SOURce4:AM:INTernal CWP")
-        self.laserbox.write(f"SOURce5:AM:INTernal CWP")
+        self.laserbox.cw_mode()
 
         # Setup laser worker in a separate thread
         self.laser_thread = QThread()
@@ -1170,10 +1176,7 @@ class Lasers_Widget(QWidget):
     # Callable functions
 
     def turn_all_off(self):
-        self.laserbox.write("SOURce2:AM:STATe OFF")
-        self.laserbox.write("SOURce3:AM:STATe OFF")
-        self.laserbox.write("SOURce4:AM:STATe OFF")
-        self.laserbox.write("SOURce5:AM:STATe OFF")
+        self.laserbox.all_off()
 
         # iterate every DragItem in the DragWidget
         for i in range(self.drag.blayout.count()):
@@ -2,7 +2,7 @@
 from PySide6.QtCore import Qt, QMetaObject, QTimer, QRect, QThread
 from PySide6.QtGui import QIntValidator, QColor, QDoubleValidator
 from PySide6.QtWidgets import (QApplication, QLabel, QLineEdit, QMainWindow,
-    QPushButton, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QGraphicsDropShadowEffect, QSlider, QCheckBox)
+    QPushButton, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QGraphicsDropShadowEffect, QSlider, QCheckBox, QComboBox)
 from PySide6.QtCore import Slot
 from superqt import QRangeSlider
 import sys
@@ -29,6 +29,9 @@ from PySide6.QtCore import QThread, Signal, QObject, QTimer
 from Extra_Files.ToolTip_Manager import CustomToolTipManager
 from Extra_Files.Scanner_Stylesheet import StyleSheets
 from Extra_Files.Custom_Line_Edit import CustomLineEdit
+from Extra_Files.RTC5_List_Program import get_sweep_program, LIVE_REPEATS
+from Extra_Files.Scanner_Monitor import get_scanner_monitor
+from Extra_Files.Scan_Patterns import SCAN_PATTERNS, make_pattern
 
 
 
@@ -51,28 +54,29 @@ class BeamWorker(QThread):
     def run(self):
         self._stop = False
         first_loop = True
+        program = get_sweep_program(self.rtc5_board)
 
+        # The sweep loops on the board: Python only rebuilds it when the parameters change
+        # (or starts it again once its repeats are done)
         while not self._stop:
             Xtop = int(self.ui.lineedit_2.text())
             Xbottom = int(self.ui.lineedit_3.text())
             speed = float(self.ui.lineedit_1.text())
+            pattern = self.ui.scan_pattern()
 
             if first_loop:
                 self.ui.jump_top(Xtop)
                 first_loop = False
-            else:
-                self.ui.mark_toptobottom(Xtop, Xbottom, speed)
-
-        #loop that checks if the Scanner is marking, and only then emits the signal
-        status = ctypes.c_uint()
-        position = ctypes.c_int()
-        while True:
-            self.rtc5_board.get_status(ctypes.byref(status), ctypes.byref(position))
-            busy         = bool(status.value & 0x00000001)  # BUSY bit
-            internalBusy = bool(status.value & 0x00008000)  # INTERNAL-BUSY bit
-            if not (busy or internalBusy):
-                break
-            time.sleep(0.001)
+            elif program.load(Xtop, Xbottom, speed, repeats=LIVE_REPEATS, pattern=pattern) or not program.is_busy():
+                program.execute()
+
+            time.sleep(0.02)
+
+        program.stop()
+
+        # Only emit the signal once the Scanner stopped marking
+        if not get_scanner_monitor(self.rtc5_board).wait_idle(timeout=1.0):
+            print("[Scanner] still busy 1 s after stopping the light sheet")
 
         self.finished.emit()
 
@@ -235,18 +239,32 @@ class Scanner_Widget(QWidget):
 
         if self.checkbox.isChecked():
             return {
-                'scan_top':    y_top,
-                'scan_bottom': y_bottom,
-                'mark_speed':  speed,
+                'scan_top':     y_top,
+                'scan_bottom':  y_bottom,
+                'mark_speed':   speed,
+                'scan_pattern': self.scan_pattern(),
             }
         else:
             # return the same keys, just with None (or some safe default)
             return {
-                'scan_top':    None,
-                'scan_bottom': None,
-                'mark_speed':  None,
+                'scan_top':     None,
+                'scan_bottom':  None,
+                'mark_speed':   None,
+                'scan_pattern': None,
             }
 
+    def scan_pattern(self):
+        """Returns the Scan_Pattern selected in the pattern row"""
+        name = self.pattern_combobox.currentText()
+        n = int(self.pattern_n_lineedit.text()) if self.pattern_n_lineedit.text() else 1
+        spacing = int(self.pattern_spacing_lineedit.text()) if self.pattern_spacing_lineedit.text() else 0
+        return make_pattern(name, n, spacing)
+
+    def pattern_behaviour(self, name):
+        """Only enables the fields used by the selected pattern"""
+        self.pattern_n_lineedit.setEnabled(SCAN_PATTERNS[name] is not None)
+        self.pattern_spacing_lineedit.setEnabled(SCAN_PATTERNS[name] == "tiles")
+
     
     #-------------------------------------------------------------------------------------
     # Slots
@@ -283,6 +301,7 @@ class Scanner_Widget(QWidget):
 
 
     def jump_top(self, Xtop):
+        get_sweep_program(self.rtc5_board).invalidate()     # the list memory is overwritten
         self.rtc5_board.set_start_list(1)
         self.rtc5_board.set_jump_speed(ctypes.c_double(800000))
         self.rtc5_board.jump_abs(ctypes.c_int(Xtop), ctypes.c_int(0))
@@ -294,24 +313,9 @@ class Scanner_Widget(QWidget):
         """
         Function to form a lightsheet
         It jumps to Xtop, marks from Xtop to Xbottom.
-        It's supposed to use in a loop
+        It's supposed to use in a loop: the list is only rebuilt when Xtop, Xbottom or speed change
         """
-        Xi = Xtop
-        Yi = 0
-        Xf = Xbottom
-        Yf = 0
-
-        self.rtc5_board.set_start_list(1)
-
-        self.rtc5_board.set_jump_speed(ctypes.c_double(800000))
-        self.rtc5_board.set_mark_speed(ctypes.c_double(speed))
-
-        self.rtc5_board.jump_abs(ctypes.c_int(Xi), ctypes.c_int(Yi))
-        self.rtc5_board.mark_abs(ctypes.c_int(Xf), ctypes.c_int(Yf))
-
-        self.rtc5_board.set_end_of_list()
-
-        self.rtc5_board.execute_list(1)
+        get_sweep_program(self.rtc5_board).sweep(Xtop, Xbottom, speed)
 
 
     def lightsheet_thread(self, checked):
@@ -345,7 +349,7 @@ class Scanner_Widget(QWidget):
 
     def process_update(self):
         # Call the board function
-        self.rtc5_board.mark_toptobottom(
+        self.mark_toptobottom(
             int(self.lineedit_2.text()),
             int(self.lineedit_3.text()),
             float(self.lineedit_1.text())
@@ -787,6 +791,57 @@ class Scanner_Widget(QWidget):
         """)
 
 
+        # Scan pattern: sweeps made by the board for every exposure
+        pattern_widget = QWidget()
+        pattern_layout = QHBoxLayout(pattern_widget)
+        pattern_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.pattern_combobox = QComboBox()
+        self.pattern_combobox.addItems(list(SCAN_PATTERNS))
+        self.pattern_combobox.currentTextChanged.connect(self.pattern_behaviour)
+        self.tooltip_manager.attach_tooltip(self.pattern_combobox, "<html>Sweeps made for every exposure:<br>"
+                                            "<b>Repeated</b> and <b>Bidirectional</b> sweep N times,<br>"
+                                            "<b>Tiled</b> makes N sheets <i>Spacing</i> apart.</html>")
+        self.pattern_combobox.setStyleSheet("""
+            QComboBox {
+                background-color: #333333;
+                color: white;
+                border: 1px solid #555555;
+                padding: 2px 4px;
+                border-radius: 3px;
+            }
+            QComboBox:disabled {
+                background-color: #222222;
+                color: #777777;
+            }
+            QComboBox QAbstractItemView {
+                background-color: #333333;
+                color: white;
+                selection-background-color: #0078d7;
+            }
+        """)
+
+        self.pattern_n_lineedit = CustomLineEdit("2")
+        self.pattern_n_lineedit.setFixedWidth(35)
+        self.pattern_n_lineedit.setValidator(QIntValidator(1, 100, self))
+        self.pattern_n_lineedit.setStyleSheet(self.lineedit_1.styleSheet())
+
+        self.pattern_spacing_lineedit = CustomLineEdit("500")
+        self.pattern_spacing_lineedit.setFixedWidth(50)
+        self.pattern_spacing_lineedit.setValidator(QIntValidator(0, self.range_top - self.range_bottom, self))
+        self.pattern_spacing_lineedit.setStyleSheet(self.lineedit_1.styleSheet())
+
+        pattern_layout.addWidget(QLabel("Pattern:"))
+        pattern_layout.addWidget(self.pattern_combobox)
+        pattern_layout.addWidget(QLabel("N:"))
+        pattern_layout.addWidget(self.pattern_n_lineedit)
+        pattern_layout.addWidget(QLabel("Spacing:"))
+        pattern_layout.addWidget(self.pattern_spacing_lineedit)
+        pattern_layout.addStretch()
+        self.pattern_behaviour(self.pattern_combobox.currentText())
+
+
         main_layout.addWidget(self.checkbox, alignment=Qt.AlignLeft)
         main_layout.addWidget(center_widget)        
+        main_layout.addWidget(pattern_widget)
         self.setLayout(main_layout)
\ No newline at end of file
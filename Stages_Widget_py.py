@@ -10,9 +10,6 @@ from PySide6.QtWidgets import (QApplication, QGroupBox, QLabel, QLineEdit,
     QWidget, QButtonGroup, QVBoxLayout)
 import sys
 
-from pipython import GCSDevice
-from pipython import GCSDevice, pitools
-
 import numpy as np
 import os
 import json
@@ -23,6 +20,8 @@ from datetime import datetime
 from Extra_Files.ToolTip_Manager import CustomToolTipManager
 from Extra_Files.Stylesheet_List import StyleSheets
 from Extra_Files.Custom_Line_Edit import CustomLineEdit
+from Extra_Files.Stage_Telemetry import get_stage_telemetry
+from Extra_Files.Jog_Controller import Jog_Controller
 
 from PySide6.QtWidgets import QGroupBox, QApplication, QWidget, QVBoxLayout, QStyleOptionFrame, QStyle
 from PySide6.QtGui import QPainter, QTextDocument
@@ -78,11 +77,10 @@ class Stages_Widget(QWidget):
         
     def shutdown(self):
         print("stages shutdown")
-        if self.timer.isActive():
-            self.timer.stop()
         if self.save_timer.isActive():
             self.save_timer.stop()
         self.save_positions_to_json()
+        self.telemetry.stop()
 
 
     def __init__(self, device, parent=None):
@@ -147,9 +145,16 @@ class Stages_Widget(QWidget):
         # set up the GUI
         self.setupUi()
 
-        # initialize the timer
+        # initialize the position telemetry
         self.timer_update()
 
+        # jog buttons: presses accumulated into one MOV at a bounded rate
+        self.jog = Jog_Controller(self.pidevice, self.telemetry,
+                                  limits={'1': (self.x_min, self.x_max),
+                                          '2': (self.y_min, self.y_max),
+                                          '3': (self.z_min, self.z_max)},
+                                  parent=self)
+
         # timer for JSON save
         self.save_timer = QTimer(self)
         self.save_timer.timeout.connect(self.save_positions_to_json)
@@ -177,55 +182,35 @@ class Stages_Widget(QWidget):
         increment - step size for the stage movement (in milimeters)
         """
 
+        delta = self.jog_delta(axis, direction, increment)
+        if delta is None:
+            return
+
+        # Move the stage (the jog controller clamps to the stage's limits)
+        self.jog.jog({axis: delta})
+
+    def jog_delta(self, axis, direction, increment=None):
+        """Signed displacement of a jog press (None for an invalid direction)"""
         if increment is None:
             increment = self.increment_xz
 
-        current_position = self.pidevice.qPOS(axis)[axis]
-
         # Invert the X axis
         if axis == '1':
             direction = 1 - direction
 
-        # Calculate the new position
         if direction == 0:
-            new_position = current_position - increment
+            return -increment
         elif direction == 1:
-            new_position = current_position + increment
-        else: 
-            return
-
-        # Calculate the new position based on the stage's limits
-        if axis == '1':
-            new_position = min(new_position, self.x_max)
-            new_position = max(new_position, self.x_min)
-        elif axis == '2':
-            new_position = min(new_position, self.y_max)
-            new_position = max(new_position, self.y_min)
-        elif axis == '3':
-            new_position = min(new_position, self.z_max)
-            new_position = max(new_position, self.z_min)
-
-        # Move the stage
-        self.pidevice.MOV(axis, new_position)
+            return increment
+        return None
 
     def move_y_increment(self, direction):
 
-        increment = self.y_increment
-
-        current_position = self.pidevice.qPOS('2')['2']
-
-        # Calculate the new position
-        if direction == 0:
-            new_position = current_position - increment
-        elif direction == 1:
-            new_position = current_position + increment
-        else: 
+        delta = self.jog_delta('2', direction, self.y_increment)
+        if delta is None:
             return
 
-        new_position = min(new_position, self.y_max)
-        new_position = max(new_position, self.y_min)
-
-        self.pidevice.MOV('2', new_position)
+        self.jog.jog({'2': delta})
 
 
 
@@ -234,18 +219,14 @@ class Stages_Widget(QWidget):
         Function to move a stage incremently in a diagonal way in the visualization
         """
         increment = np.round( np.sqrt(2)*self.increment_xz , 6)
-        if n == 1:
-            self.move_joystick('1', 1, increment)
-            self.move_joystick('3', 1, increment)
-        elif n == 2:
-            self.move_joystick('1', 0, increment)
-            self.move_joystick('3', 1, increment)
-        elif n == 3:
-            self.move_joystick('1', 0, increment)
-            self.move_joystick('3', 0, increment)
-        elif n == 4:
-            self.move_joystick('1', 1, increment)
-            self.move_joystick('3', 0, increment)
+        directions = {1: (1, 1), 2: (0, 1), 3: (0, 0), 4: (1, 0)}
+        if n not in directions:
+            return
+
+        # Both axes in a single MOV
+        direction_x, direction_z = directions[n]
+        self.jog.jog({'1': self.jog_delta('1', direction_x, increment),
+                      '3': self.jog_delta('3', direction_z, increment)})
 
 
     def fine_movement(self):
@@ -342,7 +323,9 @@ class Stages_Widget(QWidget):
             go_position = max(go_position, self.z_min)
             self.lineEdit_6.clear()
 
+        self.jog.reset()
         self.pidevice.MOV(axis, go_position)
+        self.telemetry.notify_move()
 
         
 
@@ -364,19 +347,16 @@ class Stages_Widget(QWidget):
         # In this function I'm just working with the XY plane rotation - Theta
         axis = '4'
 
-        # Determine the current Z position
-        current_position = self.pidevice.qPOS(axis)[axis]
-
-        # Calculate the new position to move to
+        # Calculate the displacement
         if direction == 0:         # negative direction
-            new_position = current_position - increment
+            delta = -increment
         elif direction == 1:       # positive direction
-            new_position = current_position + increment
+            delta = increment
         else:
             return
 
         # Move the stage
-        self.pidevice.MOV(axis, new_position)
+        self.jog.jog({axis: delta})
 
     def move_theta_pos(self, angle):
         """
@@ -394,7 +374,9 @@ class Stages_Widget(QWidget):
             return
 
         # Determine the rotation stage's current position
-        real_angle = self.pidevice.qPOS(axis)[axis]
+        real_angle = self.telemetry.position(axis)
+        if real_angle is None:
+            real_angle = self.pidevice.qPOS(axis)[axis]
 
         # Adapt the user's input angle to the current angular position
         #nr_revolutions = real_angle // 360
@@ -402,7 +384,9 @@ class Stages_Widget(QWidget):
         pretended_angle = nr_revolutions*360 + angle
 
         # Move the stage
+        self.jog.reset()
         self.pidevice.MOV(axis, pretended_angle)
+        self.telemetry.notify_move()
         self.lineEdit_7.clear()
 
     def theta_fine_movement(self):
@@ -438,18 +422,18 @@ class Stages_Widget(QWidget):
     # Functions for Position Update
 
     def timer_update(self):
-        # QTimer to periodically update positions
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update)
-        self.timer.start(10)  # Update every 500ms
+        # The telemetry service reads all the axes at once (fast while moving, slow when idle)
+        # and publishes the positions to every widget
+        self.telemetry = get_stage_telemetry(self.pidevice)
+        self.telemetry.position_updated.connect(self.update_positions)
 
-    def update(self):
+    def update_positions(self, positions):
         
         # Get the positions
-        x = self.pidevice.qPOS('1')['1']
-        y = self.pidevice.qPOS('2')['2']
-        z = self.pidevice.qPOS('3')['3']
-        theta = self.pidevice.qPOS('4')['4']
+        x = positions['1']
+        y = positions['2']
+        z = positions['3']
+        theta = positions['4']
 
         # Update the Labels
         self.label_13.setText(f"<i>X</i>: {(self.get_inverted_x_position(x) * 1000):.2f} \u03bcm")
@@ -504,11 +488,14 @@ class Stages_Widget(QWidget):
     # Function to save the positions
 
     def save_positions_to_json(self):
-        # query raw positions
-        raw_x = self.pidevice.qPOS('1')['1']
-        raw_y = self.pidevice.qPOS('2')['2']
-        raw_z = self.pidevice.qPOS('3')['3']
-        raw_theta = self.pidevice.qPOS('4')['4']
+        # cached raw positions (no query to the controller)
+        positions = self.telemetry.position()
+        if positions is None:
+            return
+        raw_x = positions['1']
+        raw_y = positions['2']
+        raw_z = positions['3']
+        raw_theta = positions['4']
 
         # convert to your display units (µm, degrees)
         x = self.get_inverted_x_position(raw_x) * 1000
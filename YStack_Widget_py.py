@@ -1,11 +1,11 @@
 from PySide6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QTabWidget, QLabel, QPushButton, QTabBar, QGridLayout,
-    QLineEdit, QFrame, QComboBox, QSizePolicy, QButtonGroup, QCheckBox
+    QLineEdit, QFrame, QComboBox, QSizePolicy, QButtonGroup, QCheckBox, QDialog, QProgressDialog
 )
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
 from PySide6.QtGui import QIcon, QPixmap, QIntValidator, QDoubleValidator, QFont
-from PySide6.QtCore import Qt, QSize, QTimer, QLocale
+from PySide6.QtCore import Qt, QSize, QTimer, QLocale, QRunnable, QThreadPool, QEventLoop
 import sys
 import numpy as np
 import os, re
@@ -43,6 +43,18 @@ from Extra_Files.ToolTip_Manager import CustomToolTipManager
 from Extra_Files.Custom_Line_Edit import CustomLineEdit
 from Extra_Files.Z_Plane import ZUpStageWidget
 from Extra_Files.Y_Stack_Algorithms import y_stack
+from Extra_Files.Autofocus import Autofocus, AUTOFOCUS_AXES
+from Extra_Files.Scanner_Monitor import get_scanner_monitor
+from Extra_Files.Stage_Telemetry import get_stage_telemetry
+from Extra_Files.Settle_Detector import get_settle_detector
+from Extra_Files.Scanner_Monitor import expected_sweep_ms
+from Extra_Files.Acquisition_Timing import Acquisition_Timing
+from Extra_Files.Resource_Planner import Resource_Plan, measure_disk_bandwidth, cached_disk_bandwidth
+from Extra_Files.Stack_Parameters import Stack_Parameters, Stack_Parameters_Model, Bulk_Edit_Dialog, FIELD_WIDGETS
+from Extra_Files.Position_Table import Position_Table_Model, Position_Table_Widget
+from Extra_Files.Tiling import tile_fov, tile_coordinates
+from Extra_Files.Stack_Preview import Stack_Preview
+from Extra_Files.Acquisition_Metadata import Acquisition_Metadata
 from Acquisition_Progress_py import AcquisitionProgress_Dialog
 
 
@@ -170,6 +182,13 @@ class YStackWorker(QObject):
         os.makedirs(new_path, exist_ok=True)
         return new_path, next_idx
 
+    def tiles(self):
+        """Tile coordinates of every position for each selected camera (for the stitching)"""
+        cameras = [(1, self.selected_camera1, self.camera1_width_x, self.camera1_height_y, self.camera1_binning),
+                   (2, self.selected_camera2, self.camera2_width_x, self.camera2_height_y, self.camera2_binning)]
+        return {camera: tile_coordinates(self.zstackwidget_parameters, *tile_fov(width_x, height_y, binning))
+                for camera, selected, width_x, height_y, binning in cameras if selected}
+
 
     def __init__(self, multipositions_check, zstackwidget_parameters, save_directory,
     filterwheel1, filterwheel2, laserbox, rtc5_board, pidevice, 
@@ -199,16 +218,24 @@ class YStackWorker(QObject):
         self.camera1 = camera1
         self.camera2 = camera2
         self.ystack_widget=ystack_widget
+        self.camera_widgets = (camera_widget1, camera_widget2)
 
         # Get the laser's parameters
         self.lasers, self.laser_powers_mW, self.filters1, self.filters2 = lasers_widget.get_selected_lasers()
         self.laser_powers_W = np.array(self.laser_powers_mW) / 1000
 
+        # Get the Autofocus (None if not selected)
+        self.autofocus = ystack_widget.get_autofocus() if ystack_widget is not None else None
+
         # Get the Scanner's parameters
         scan = scanner_widget.checkbox_scanner_select()
         self.scan_top    = scan['scan_top']
         self.scan_bottom = scan['scan_bottom']
         self.mark_speed  = scan['mark_speed']
+        self.scan_pattern = scan.get('scan_pattern')
+
+        # Timing model of the acquisition (set by the YStack_Widget before the start)
+        self.timing = None
 
         # print(self.scan_top, self.scan_bottom, self.mark_speed)
 
@@ -245,14 +272,51 @@ class YStackWorker(QObject):
     @Slot()
     def run(self):
         
+        # Live preview of the stacks (decimated, rate-capped, on its own thread)
+        preview = Stack_Preview(self.frame_acquired.emit)
+        preview.start()
+
         try:
             ystack_alg = y_stack()
+            ystack_alg.scan_pattern = self.scan_pattern
+            ystack_alg.timing = self.timing
+            ystack_alg.preview = preview
+
+            # Sweep durations of this acquisition
+            scanner_monitor = get_scanner_monitor(self.rtc5_board)
+            scanner_monitor.clear()
+
+            # Settle times of the Y slices of this acquisition (with the current settle settings)
+            settle_detector = get_settle_detector(self.pidevice)
+            settle_detector.load_settings()
+            settle_detector.clear()
+
+            # Laserbox command latencies of this acquisition (and a fresh state cache)
+            self.laserbox.invalidate()
+            self.laserbox.clear_latencies()
 
             # Create the Experiment folder
             exp_name = self.ystack_widget.exp_name_lineedit.text()
             experiment_dir, exp_idx = self.make_next_experiment_dir(self.save_directory, exp_name)
             os.makedirs(experiment_dir, exist_ok=True)
 
+            # Metadata of the stores, written from the plan by the algorithm as soon as each array is created
+            camera1 = (self.camera1_width_x, self.camera1_height_y, self.camera1_binning, self.camera1_dynamic_range) if self.selected_camera1 else (0, 0, 0, 0)
+            camera2 = (self.camera2_width_x, self.camera2_height_y, self.camera2_binning, self.camera2_dynamic_range) if self.selected_camera2 else (0, 0, 0, 0)
+            cameras = {}
+            if self.selected_camera1:
+                cameras[1] = (self.filters1, self.camera1_dynamic_range, self.camera1_binning)
+            if self.selected_camera2:
+                cameras[2] = (self.filters2, self.camera2_dynamic_range, self.camera2_binning)
+            settings = dict(lasers=self.lasers, laser_powers_W=self.laser_powers_W,
+                            filters1=self.filters1, filters2=self.filters2,
+                            camera1_format_x=camera1[0], camera1_format_y=camera1[1], camera1_binning=camera1[2], camera1_dynamic_range=camera1[3],
+                            camera2_format_x=camera2[0], camera2_format_y=camera2[1], camera2_binning=camera2[2], camera2_dynamic_range=camera2[3],
+                            scan_top=self.scan_top, scan_bottom=self.scan_bottom, mark_speed=self.mark_speed)
+            ystack_alg.metadata = Acquisition_Metadata(self.zstackwidget_parameters, cameras, settings,
+                                                       same_timepoints=bool(self.multipositions_check),
+                                                       tiles=self.tiles())
+
             total_acqs = len(self.zstackwidget_parameters)
 
             Yis_um    = [tab['yi']        for tab in self.zstackwidget_parameters]
@@ -351,54 +415,8 @@ class YStackWorker(QObject):
                                                             channel_callback   = lambda cur, tot: self._maybe_emit(self.channel_changed, cur, tot),
                                                             timepoint_callback = lambda cur, tot: self._maybe_emit(self.timepoint_changed, cur, tot),
                                                             position_callback = lambda cur, tot: self._maybe_emit(self.position_changed, cur, tot),
-                                                            stop_event=self._stop_event)
-
-
-                        # Save the meta-data in the OME-Zarr file
-                        try:
-                            for pos_idx in range(len(Yis_mm)):
-                                acq_name = f"Position {pos_idx+1}"
-                                acq_dir = os.path.join(experiment_dir, acq_name)
-
-                                z1 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera1.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z1,
-                                    self.filters1,
-                                    self.camera1_dynamic_range,
-                                    self.camera1_binning,
-                                    t_spacing=Tstep,
-                                    t_spacing_unit=Tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                z2 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera2.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z2,
-                                    self.filters2,
-                                    self.camera2_dynamic_range,
-                                    self.camera2_binning,
-                                    t_spacing=Tstep,
-                                    t_spacing_unit=Tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                ystack_alg.write_txt_settings(
-                                    Yi=Yis_um[pos_idx], Yf=Yfs_um[pos_idx], Y_spacing=Ysteps_um[pos_idx],
-                                    X=Xs_um[pos_idx], Z=Zs_um[pos_idx], Theta=Thetas[pos_idx],
-                                    time_points=Tpoints, time_spacing=Tstep, time_step_unit=Tstep_unit,
-                                    lasers=self.lasers, laser_powers_W=self.laser_powers_W,
-                                    filters1=self.filters1, filters2=self.filters2,
-                                    camera1_format_x=self.camera1_width_x, camera1_format_y=self.camera1_height_y, camera1_binning=self.camera1_binning, camera1_dynamic_range=self.camera1_dynamic_range,
-                                    camera2_format_x=self.camera2_width_x, camera2_format_y=self.camera2_height_y, camera2_binning=self.camera2_binning, camera2_dynamic_range=self.camera2_dynamic_range,
-                                    pixel_size_x=0.65, pixel_size_y=0.65,
-                                    scan_top=self.scan_top, scan_bottom=self.scan_bottom, mark_speed=self.mark_speed,
-                                    experiment_dir=acq_dir, exp_name=acq_name)
-
-                        except Exception as e: print(e)#pass
+                                                            stop_event=self._stop_event,
+                                                            autofocus=self.autofocus)
 
                     # Only Camera 1
                     elif self.selected_camera1 and not self.selected_camera2:
@@ -419,40 +437,8 @@ class YStackWorker(QObject):
                                                             channel_callback   = lambda cur, tot: self._maybe_emit(self.channel_changed, cur, tot),
                                                             timepoint_callback = lambda cur, tot: self._maybe_emit(self.timepoint_changed, cur, tot),
                                                             position_callback = lambda cur, tot: self._maybe_emit(self.position_changed, cur, tot),
-                                                            stop_event=self._stop_event)
-
-                        # Save the meta-data in the OME-Zarr file
-                        try:
-                            for pos_idx in range(len(Yis_mm)):
-                                acq_name = f"Position {pos_idx+1}"
-                                acq_dir = os.path.join(experiment_dir, acq_name)
-
-                                z1 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera1.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z1,
-                                    self.filters1,
-                                    self.camera1_dynamic_range,
-                                    self.camera1_binning,
-                                    t_spacing=Tstep,
-                                    t_spacing_unit=Tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                ystack_alg.write_txt_settings(
-                                    Yi=Yis_um[pos_idx], Yf=Yfs_um[pos_idx], Y_spacing=Ysteps_um[pos_idx],
-                                    X=Xs_um[pos_idx], Z=Zs_um[pos_idx], Theta=Thetas[pos_idx],
-                                    time_points=Tpoints, time_spacing=Tstep, time_step_unit=Tstep_unit,
-                                    lasers=self.lasers, laser_powers_W=self.laser_powers_W,
-                                    filters1=self.filters1, filters2=self.filters2,
-                                    camera1_format_x=self.camera1_width_x, camera1_format_y=self.camera1_height_y, camera1_binning=self.camera1_binning, camera1_dynamic_range=self.camera1_dynamic_range,
-                                    camera2_format_x=_, camera2_format_y=_, camera2_binning=_, camera2_dynamic_range=_,
-                                    pixel_size_x=0.65, pixel_size_y=0.65,
-                                    scan_top=self.scan_top, scan_bottom=self.scan_bottom, mark_speed=self.mark_speed,
-                                    experiment_dir=acq_dir, exp_name=acq_name)
-
-                        except Exception as e: print(e)#pass
+                                                            stop_event=self._stop_event,
+                                                            autofocus=self.autofocus)
 
                     # Only Camera 2
                     elif self.selected_camera2 and not self.selected_camera1:
@@ -473,41 +459,8 @@ class YStackWorker(QObject):
                                                             channel_callback   = lambda cur, tot: self._maybe_emit(self.channel_changed, cur, tot),
                                                             timepoint_callback = lambda cur, tot: self._maybe_emit(self.timepoint_changed, cur, tot),
                                                             position_callback = lambda cur, tot: self._maybe_emit(self.position_changed, cur, tot),
-                                                            stop_event=self._stop_event)
-
-                        # Save the meta-data in the OME-Zarr file
-                        # if result != 0:
-                        try:
-                            for pos_idx in range(len(Yis_mm)):
-                                acq_name = f"Position {pos_idx+1}"
-                                acq_dir = os.path.join(experiment_dir, acq_name)
-
-                                z2 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera2.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z2,
-                                    self.filters2,
-                                    self.camera2_dynamic_range,
-                                    self.camera2_binning,
-                                    t_spacing=Tstep,
-                                    t_spacing_unit=Tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                ystack_alg.write_txt_settings(
-                                    Yi=Yis_um[pos_idx], Yf=Yfs_um[pos_idx], Y_spacing=Ysteps_um[pos_idx],
-                                    X=Xs_um[pos_idx], Z=Zs_um[pos_idx], Theta=Thetas[pos_idx],
-                                    time_points=Tpoints, time_spacing=Tstep, time_step_unit=Tstep_unit,
-                                    lasers=self.lasers, laser_powers_W=self.laser_powers_W,
-                                    filters1=self.filters1, filters2=self.filters2,
-                                    camera1_format_x=_, camera1_format_y=_, camera1_binning=_, camera1_dynamic_range=_,
-                                    camera2_format_x=self.camera2_width_x, camera2_format_y=self.camera2_height_y, camera2_binning=self.camera2_binning, camera2_dynamic_range=self.camera2_dynamic_range,
-                                    pixel_size_x=0.65, pixel_size_y=0.65,
-                                    scan_top=self.scan_top, scan_bottom=self.scan_bottom, mark_speed=self.mark_speed,
-                                    experiment_dir=acq_dir, exp_name=acq_name)
-
-                        except Exception as e: print(e)#pass
+                                                            stop_event=self._stop_event,
+                                                            autofocus=self.autofocus)
 
             else:
 
@@ -538,57 +491,8 @@ class YStackWorker(QObject):
                                                             channel_callback   = lambda cur, tot: self._maybe_emit(self.channel_changed, cur, tot),
                                                             timepoint_callback = lambda cur, tot: self._maybe_emit(self.timepoint_changed, cur, tot),
                                                             position_callback = lambda cur, tot: self._maybe_emit(self.position_changed, cur, tot),
-                                                            stop_event=self._stop_event)
-
-
-                        # Save the meta-data in the OME-Zarr file
-                        try:
-                            for pos_idx in range(len(Yis_mm)):
-                                acq_name = f"Position {pos_idx+1}"
-                                acq_dir = os.path.join(experiment_dir, acq_name)
-
-                                tstep = Tstep[pos_idx]
-                                tstep_unit = Tstep_unit[pos_idx]
-
-                                z1 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera1.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z1,
-                                    self.filters1,
-                                    self.camera1_dynamic_range,
-                                    self.camera1_binning,
-                                    t_spacing=tstep,
-                                    t_spacing_unit=tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                z2 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera2.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z2,
-                                    self.filters2,
-                                    self.camera2_dynamic_range,
-                                    self.camera2_binning,
-                                    t_spacing=Tstep,
-                                    t_spacing_unit=Tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                ystack_alg.write_txt_settings(
-                                    Yi=Yis_um[pos_idx], Yf=Yfs_um[pos_idx], Y_spacing=Ysteps_um[pos_idx],
-                                    X=Xs_um[pos_idx], Z=Zs_um[pos_idx], Theta=Thetas[pos_idx],
-                                    time_points=Tpoints, time_spacing=Tstep, time_step_unit=Tstep_unit,
-                                    lasers=self.lasers, laser_powers_W=self.laser_powers_W,
-                                    filters1=self.filters1, filters2=self.filters2,
-                                    camera1_format_x=self.camera1_width_x, camera1_format_y=self.camera1_height_y, camera1_binning=self.camera1_binning, camera1_dynamic_range=self.camera1_dynamic_range,
-                                    camera2_format_x=self.camera2_width_x, camera2_format_y=self.camera2_height_y, camera2_binning=self.camera2_binning, camera2_dynamic_range=self.camera2_dynamic_range,
-                                    pixel_size_x=0.65, pixel_size_y=0.65,
-                                    scan_top=self.scan_top, scan_bottom=self.scan_bottom, mark_speed=self.mark_speed,
-                                    experiment_dir=acq_dir, exp_name=acq_name)
-
-                        except Exception as e: pass
+                                                            stop_event=self._stop_event,
+                                                            autofocus=self.autofocus)
 
                     # Only Camera 1
                     elif self.selected_camera1 and not self.selected_camera2:
@@ -609,43 +513,8 @@ class YStackWorker(QObject):
                                                             channel_callback   = lambda cur, tot: self._maybe_emit(self.channel_changed, cur, tot),
                                                             timepoint_callback = lambda cur, tot: self._maybe_emit(self.timepoint_changed, cur, tot),
                                                             position_callback = lambda cur, tot: self._maybe_emit(self.position_changed, cur, tot),
-                                                            stop_event=self._stop_event)
-
-                        # Save the meta-data in the OME-Zarr file
-                        try:
-                            for pos_idx in range(len(Yis_mm)):
-                                acq_name = f"Position {pos_idx+1}"
-                                acq_dir = os.path.join(experiment_dir, acq_name)
-
-                                tstep = Tstep[pos_idx]
-                                tstep_unit = Tstep_unit[pos_idx]
-
-                                z1 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera1.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z1,
-                                    self.filters1,
-                                    self.camera1_dynamic_range,
-                                    self.camera1_binning,
-                                    t_spacing=tstep,
-                                    t_spacing_unit=tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                ystack_alg.write_txt_settings(
-                                    Yi=Yis_um[pos_idx], Yf=Yfs_um[pos_idx], Y_spacing=Ysteps_um[pos_idx],
-                                    X=Xs_um[pos_idx], Z=Zs_um[pos_idx], Theta=Thetas[pos_idx],
-                                    time_points=Tpoints, time_spacing=Tstep, time_step_unit=Tstep_unit,
-                                    lasers=self.lasers, laser_powers_W=self.laser_powers_W,
-                                    filters1=self.filters1, filters2=self.filters2,
-                                    camera1_format_x=self.camera1_width_x, camera1_format_y=self.camera1_height_y, camera1_binning=self.camera1_binning, camera1_dynamic_range=self.camera1_dynamic_range,
-                                    camera2_format_x=_, camera2_format_y=_, camera2_binning=_, camera2_dynamic_range=_,
-                                    pixel_size_x=0.65, pixel_size_y=0.65,
-                                    scan_top=self.scan_top, scan_bottom=self.scan_bottom, mark_speed=self.mark_speed,
-                                    experiment_dir=acq_dir, exp_name=acq_name)
-
-                        except Exception as e: pass
+                                                            stop_event=self._stop_event,
+                                                            autofocus=self.autofocus)
 
                     # Only Camera 2
                     elif self.selected_camera2 and not self.selected_camera1:
@@ -666,53 +535,30 @@ class YStackWorker(QObject):
                                                             channel_callback   = lambda cur, tot: self._maybe_emit(self.channel_changed, cur, tot),
                                                             timepoint_callback = lambda cur, tot: self._maybe_emit(self.timepoint_changed, cur, tot),
                                                             position_callback = lambda cur, tot: self._maybe_emit(self.position_changed, cur, tot),
-                                                            stop_event=self._stop_event)
-
-                        # Save the meta-data in the OME-Zarr file
-                        try:
-                            for pos_idx in range(len(Yis_mm)):
-                                acq_name = f"Position {pos_idx+1}"
-                                acq_dir = os.path.join(experiment_dir, acq_name)
-
-                                tstep = Tstep[pos_idx]
-                                tstep_unit = Tstep_unit[pos_idx]
-
-                                z2 = os.path.join(acq_dir, f"Position{pos_idx+1}_Camera2.ome.zarr")
-                                ystack_alg.write_metadata(
-                                    z2,
-                                    self.filters2,
-                                    self.camera2_dynamic_range,
-                                    self.camera2_binning,
-                                    t_spacing=tstep,
-                                    t_spacing_unit=tstep_unit,
-                                    z_step=Ysteps_um[pos_idx],
-                                    pixel_size_x=0.65,
-                                    pixel_size_y=0.65,
-                                )
-
-                                ystack_alg.write_txt_settings(
-                                    Yi=Yis_um[pos_idx], Yf=Yfs_um[pos_idx], Y_spacing=Ysteps_um[pos_idx],
-                                    X=Xs_um[pos_idx], Z=Zs_um[pos_idx], Theta=Thetas[pos_idx],
-                                    time_points=Tpoints, time_spacing=Tstep, time_step_unit=Tstep_unit,
-                                    lasers=self.lasers, laser_powers_W=self.laser_powers_W,
-                                    filters1=self.filters1, filters2=self.filters2,
-                                    camera1_format_x=_, camera1_format_y=_, camera1_binning=_, camera1_dynamic_range=_,
-                                    camera2_format_x=self.camera2_width_x, camera2_format_y=self.camera2_height_y, camera2_binning=self.camera2_binning, camera2_dynamic_range=self.camera2_dynamic_range,
-                                    pixel_size_x=0.65, pixel_size_y=0.65,
-                                    scan_top=self.scan_top, scan_bottom=self.scan_bottom, mark_speed=self.mark_speed,
-                                    experiment_dir=acq_dir, exp_name=acq_name)
-
-                        except Exception as e: pass
+                                                            stop_event=self._stop_event,
+                                                            autofocus=self.autofocus)
 
                         
             self.experiment_counter += 1
 
+            # Sweep durations vs camera exposure (to match the mark speed to the exposure)
+            exposures = [w.exposure_value for w in self.camera_widgets
+                         if w is not None and w.exposure_value]
+            print(scanner_monitor.report(exposures[0] if exposures else None,
+                                         (self.scan_top, self.scan_bottom, self.mark_speed)))
+            print(settle_detector.report())
+            print(self.laserbox.report())
+            if self.timing is not None:
+                print(self.timing.report())
+
             self.finished.emit()
 
         except Exception as e:
             self.error.emit(str(e))
 
         finally:
+            preview.stop()
+            print(f"[Preview] {preview.grabbed} slices previewed, {preview.skipped} skipped (preview busy)")
             if self._stop_event.is_set() and self._delete_data:
                 try:
                     shutil.rmtree(experiment_dir)
@@ -721,32 +567,50 @@ class YStackWorker(QObject):
             
 
 
+class DiskBandwidthWorker(QRunnable):
+    """
+    Measures the write bandwidth of the disk of the save directory, for the pre-flight check, then
+    emits the finished signal (also when stopped with stop_event).
+    """
+    def __init__(self, directory, stop_event, finished_signal: Signal):
+        super().__init__()
+        self.directory = directory
+        self.stop_event = stop_event
+        self.finished = finished_signal
+
+    def run(self):
+        try:
+            measure_disk_bandwidth(self.directory, stop_event=self.stop_event)
+        finally:
+            self.finished.emit()
+
+
 class UpdateWorker(QObject):
     update_signal = Signal(float)  # This will emit the current Y position
 
-    def __init__(self, pidevice, parent=None):
+    def __init__(self, telemetry, parent=None):
         super().__init__(parent)
-        self.pidevice = pidevice
+        # The positions come from the shared stage telemetry (no query of its own)
+        self.telemetry = telemetry
         self._running = True
+        self._last_y = None
+        self.telemetry.position_updated.connect(self.perform_update)
 
     def stop(self):
         self._running = False
+        try:
+            self.telemetry.position_updated.disconnect(self.perform_update)
+        except (RuntimeError, TypeError):
+            pass
 
-    def start_updates(self):
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.perform_update)
-        self.timer.start(50)  # 50 ms interval
-
-    def perform_update(self):
+    def perform_update(self, positions):
         if not self._running:
-            self.timer.stop()
             return
 
-        try:
-            current_y = self.pidevice.qPOS('2')['2']
+        current_y = positions['2']
+        if current_y != self._last_y:
+            self._last_y = current_y
             self.update_signal.emit(current_y)
-        except Exception as e:
-            print(f"UpdateWorker Error: {e}")
 
 
 
@@ -756,6 +620,7 @@ class YStack_Widget(QWidget):
     # Singals and Slots
 
     acquisition_started = Signal()
+    disk_measured = Signal()
     acquisition_finished = Signal()
     # Acquired frame to emit for visualization
     frame_acquired = Signal(np.ndarray, int, int, int, int)
@@ -765,6 +630,7 @@ class YStack_Widget(QWidget):
         # every time *any* slice fires, increment the bar by one
         self._progress_counter += 1
         self.progress_dialog.bar.setValue(self._progress_counter)
+        self.timing.slice_done(slice_idx)
 
     @Slot()
     def on_acq_finished(self):
@@ -814,6 +680,7 @@ class YStack_Widget(QWidget):
             for entry in self.content_tabs:
                 if entry.get('tab') is tab_widget:
                     self.content_tabs.remove(entry)
+                    self.stack_parameters.remove(entry)
                     break
 
             # Decide which tab to select next
@@ -859,6 +726,30 @@ class YStack_Widget(QWidget):
         """Update the current save directory."""
         self.current_save_directory = new_path
 
+    def measure_disk(self):
+        """
+        Measures the disk of the save directory (once per disk and session) for the pre-flight check: in the
+        disk pool, while a dialog waits and can skip it. Never while acquiring.
+        """
+        directory = self.current_save_directory
+        if (self.is_acquiring or not directory or not os.path.isdir(directory)
+                or cached_disk_bandwidth(directory) is not None):
+            return
+
+        self._disk_stop.clear()
+        dialog = QProgressDialog("Measuring the write speed of the save disk...", "Skip", 0, 0, self)
+        dialog.setWindowTitle("Pre-flight check")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(0)
+        dialog.canceled.connect(self._disk_stop.set)
+
+        loop = QEventLoop()
+        self.disk_measured.connect(loop.quit)
+        self._disk_pool.start(DiskBandwidthWorker(directory, self._disk_stop, self.disk_measured))
+        loop.exec()
+        self.disk_measured.disconnect(loop.quit)
+        dialog.close()
+
     def time_points_lineedit_behaviour(self):
         """Function that gives out the behaviour for each tab"""
 
@@ -892,10 +783,11 @@ class YStack_Widget(QWidget):
 
                 # If at least one is empty, fill them up
                 if tab['Yi'].text() == "" or tab['Yf'].text() == "" or tab['X'].text() == "" or tab['Theta'].text() == "":
-                    self.x_real = np.round(self.pidevice.qPOS('1')['1'], 3)
-                    yi = f"{np.round( self.pidevice.qPOS('2')['2'] * 1000, 3):.2f}"
-                    z = f"{np.round(self.pidevice.qPOS('3')['3'] * 1000, 3 ):.2f}"
-                    theta = f"{self.pidevice.qPOS('4')['4'] % 360:.2f}"   # Get the equivalent angle in the [0, 360]º range
+                    positions = self.telemetry.position() or self.pidevice.qPOS(['1', '2', '3', '4'])
+                    self.x_real = np.round(positions['1'], 3)
+                    yi = f"{np.round( positions['2'] * 1000, 3):.2f}"
+                    z = f"{np.round(positions['3'] * 1000, 3 ):.2f}"
+                    theta = f"{positions['4'] % 360:.2f}"   # Get the equivalent angle in the [0, 360]º range
 
                     tab['Yi'].setText(yi)
                     tab['Yi'].setAlignment(Qt.AlignLeft)
@@ -920,6 +812,7 @@ class YStack_Widget(QWidget):
                     self.pidevice.MOV('2', float( tab['Yi'].text() ) / 1000 )
                     self.pidevice.MOV('3', float( tab['Z'].text() ) / 1000 )
                     self.pidevice.MOV('4', float( tab['Theta'].text() ) )
+                    self.telemetry.notify_move()
 
     def end_button_behaviour(self):
         """Fills the initial position parameters or moves the Stage"""
@@ -932,7 +825,10 @@ class YStack_Widget(QWidget):
                 # If at least one is empty, fill them up
                 if tab['Yi'].text() == "" or tab['Yf'].text() == "" or tab['X'].text() == "" or tab['Theta'].text() == "":
 
-                    yf = f"{np.round(self.pidevice.qPOS('2')['2']*1000, 3):.2f}"
+                    y = self.telemetry.position('2')
+                    if y is None:
+                        y = self.pidevice.qPOS('2')['2']
+                    yf = f"{np.round(y*1000, 3):.2f}"
                     tab['Yf'].setText(yf)
 
                 # If they are all filled, take the stage to that position
@@ -941,6 +837,7 @@ class YStack_Widget(QWidget):
                     self.pidevice.MOV('2', float( tab['Yf'].text() ) / 1000 )
                     self.pidevice.MOV('3', float( tab['Z'].text() ) / 1000 )
                     self.pidevice.MOV('4', float( tab['Theta'].text() ) )
+                    self.telemetry.notify_move()
 
     def center_button_behaviour(self):
         """Moves the Stage to the Center position"""
@@ -953,6 +850,7 @@ class YStack_Widget(QWidget):
                 self.pidevice.MOV('2', center_y / 1000 )
                 self.pidevice.MOV('3', float( tab['Z'].text() ) / 1000 )
                 self.pidevice.MOV('4', float( tab['Theta'].text() ) )
+                self.telemetry.notify_move()
 
 
     def clear_button_behaviour(self):
@@ -1063,81 +961,41 @@ class YStack_Widget(QWidget):
 
         finally:
             self._time_updating = False
+            # The computed field was set with its signals blocked
+            for tab in self.content_tabs:
+                if tab['Tpoints'] is tp_le:
+                    self.stack_parameters.read(tab)
 
 
     #########################################################################################################################################
     # Updates function
 
     def updates(self):
+        """
+        Enables the Start button (and builds its tooltip) when all the tabs and the devices are ready.
+        The tabs come from the parameter model (updated on their edit signals), only the devices are read here.
+        """
 
         if self.is_acquiring:
             return
-        
-
-
-        # Update tab parameters
-        for tab in self.content_tabs:
-            yi_text = tab['Yi'].text().strip()
-            yf_text = tab['Yf'].text().strip()
-            # Update Y-size
-            if yi_text and yf_text:
-                try:
-                    diff = abs(float(yf_text) - float(yi_text))
-                    tab['Ysize'].setText(f"{diff:.3f}")
-                except ValueError:
-                    tab['Ysize'].setText("")
-            else:
-                tab['Ysize'].setText("")
-
-            # Update Nsteps
-            ystep_text = tab['Ystep'].text().strip()
-            if yi_text and yf_text and ystep_text:
-                try:
-                    yi, yf, step = map(float, (yi_text, yf_text, ystep_text))
-                    count = 1 if step == 0 else ( int( np.floor( np.round( abs(yf - yi) / step) ) ) + 1 ) or 1
-                    tab['Nsteps'].setText(str(count))
-                except ValueError:
-                    tab['Nsteps'].setText("")
-            else:
-                tab['Nsteps'].setText("")
 
-            # Update the Center Button
-            if tab['Yi'].text() != "" and tab['Yf'].text() != "" and tab['X'].text() != "" and tab['Z'].text() != "" and tab['Theta'].text() != "":
-                tab['Center'].setEnabled(True)
-            else:
-                tab['Center'].setEnabled(False)
-
-        # Check if all tabs are complete
-        all_tabs_complete = True
-        self.tooltip_manager.attach_tooltip(self.start_button, "Starts the Acquisition.\nBecomes enabled when:\n- All of the coordinates are set.\n- The scanner's settings are selected.\n- The intented lasers are selected.\n- The Camera's filters are selected.\n- The intended Camera's are selected.")
-        for tab in self.content_tabs:
-            tp = tab['Tpoints'].text().strip()
-            required = (
-                tab['Yi'].text().strip() and
-                tab['Yf'].text().strip() and
-                tab['X'].text().strip() and
-                tab['Z'].text().strip() and
-                tab['Theta'].text().strip() and
-                tab['Ystep'].text().strip() and
-                tp
-            )
-            # If T-points >1, T-step must also be filled
-            if not required or (tp not in ("0", "1") and not tab['Tstep'].text().strip()):
-                all_tabs_complete = False
-                break
+        # Check if all tabs (or all the positions of the table) are complete
+        if self.use_table_checkbox.isChecked():
+            all_tabs_complete = self.position_table.all_complete()
+        else:
+            all_tabs_complete = self.stack_parameters.all_complete()
 
-            # Check if all of the devices parameters are set
-                
+        # Check if all of the devices parameters are set
+        if all_tabs_complete:
                 # Scanner
-
             self.selected_scan = self.scanner_widget.checkbox_scanner_select()
             self.selected_scan_top    = self.selected_scan['scan_top']
             self.selected_scan_bottom = self.selected_scan['scan_bottom']
             self.selected_mark_speed  = self.selected_scan['mark_speed']
             if self.selected_scan_top is None:
                 all_tabs_complete = False
-                break
 
+        if all_tabs_complete:
                 # Cameras
             self.camera_1_selected = False
             self.camera_2_selected = False
@@ -1155,6 +1013,7 @@ class YStack_Widget(QWidget):
             if not (self.camera_1_selected or self.camera_2_selected):
                 all_tabs_complete = False
 
+        if all_tabs_complete:
                 # Lasers
             self.selected_lasers, self.selected_laser_powers_mW, self.selected_filters1, self.selected_filters2 = self.lasers_widget.get_selected_lasers()
             self.selected_laser_powers_W = np.array(self.selected_laser_powers_mW) / 1000
@@ -1164,148 +1023,253 @@ class YStack_Widget(QWidget):
             # 1) Must pick at least one laser
             if n_lasers == 0:
                 all_tabs_complete = False
-                break
 
             # 2) Now enforce one filter per laser
-            if self.camera_1_selected and not self.camera_2_selected:
+            elif self.camera_1_selected and not self.camera_2_selected:
                 # wheel 1 must have n_lasers filters
                 if len(self.selected_filters1) != n_lasers:
                     all_tabs_complete = False
-                    break
 
             elif self.camera_2_selected and not self.camera_1_selected:
                 # wheel 2 must have n_lasers filters
                 if len(self.selected_filters2) != n_lasers:
                     all_tabs_complete = False
-                    break
 
             elif self.camera_1_selected and self.camera_2_selected:
                 # both wheels must have n_lasers filters
                 if (len(self.selected_filters1)  != n_lasers or
                     len(self.selected_filters2)  != n_lasers):
                     all_tabs_complete = False
-                    break
 
         # Finally, update the start button state based on all tabs' completeness
-        self.start_button.setEnabled(all_tabs_complete)
+        if self.start_button.isEnabled() != all_tabs_complete:
+            self.start_button.setEnabled(all_tabs_complete)
 
-        if all_tabs_complete:
-            # 1) detach any old tooltip
-            self.tooltip_manager.detach_tooltip(self.start_button)
-
-            # 2) scanner parameters
-            scan   = self.scanner_widget.checkbox_scanner_select()
-            top    = scan['scan_top']
-            bottom = scan['scan_bottom']
-            speed  = scan['mark_speed']
-
-            # 3) laser + filter lists
-            lasers = self.selected_lasers
-            powers = self.selected_laser_powers_mW
-            f1s    = self.selected_filters1
-            f2s    = self.selected_filters2
-
-            # 4) lookup tables
-            LASER_WL = {2: "640 nm", 3: "561 nm", 4: "488 nm", 5: "405 nm"}
-            FILTER_N = {
-                0: "DAPI", 1: "GFP", 2: "YFP",
-                3: "Alexa568", 4: "Alexa647", 5: "Empty"
-            }
-
-            # 5) build the “- …” laser lines (preserve original order)
-            lines = []
-            for idx, power, f1, f2 in zip_longest(lasers, powers, f1s, f2s, fillvalue=None):
-                wl = LASER_WL.get(idx, f"{idx} nm")
-
-                slots  = [f for f in (f1, f2) if f is not None]
-                chosen = [FILTER_N[f] for f in slots if FILTER_N[f] != "Empty"]
-
-                if chosen:
-                    if len(chosen) == 1:
-                        suffix = f", and {chosen[0]} filter"
-                    else:
-                        suffix = ", and " + ", ".join(chosen) + " filters"
-                else:
-                    if   len(slots) == 1: suffix = ", and no filter"
-                    elif len(slots) >= 2: suffix = ", and no filters"
-                    else:                 suffix = ""
+        if not all_tabs_complete:
+            self._set_start_tooltip("Starts the Acquisition.\nBecomes enabled when:\n- All of the coordinates are set.\n- The scanner's settings are selected.\n- The intented lasers are selected.\n- The Camera's filters are selected.\n- The intended Camera's are selected.")
+            return
 
-                lines.append(f"- {wl} with {power} mW{suffix}")
+        # 2) scanner parameters
+        top    = self.selected_scan_top
+        bottom = self.selected_scan_bottom
+        speed  = self.selected_mark_speed
+
+        # 3) laser + filter lists
+        lasers = self.selected_lasers
+        powers = self.selected_laser_powers_mW
+        f1s    = self.selected_filters1
+        f2s    = self.selected_filters2
+
+        # 4) lookup tables
+        LASER_WL = {2: "640 nm", 3: "561 nm", 4: "488 nm", 5: "405 nm"}
+        FILTER_N = {
+            0: "DAPI", 1: "GFP", 2: "YFP",
+            3: "Alexa568", 4: "Alexa647", 5: "Empty"
+        }
 
-            # 6) assemble header + lasers block
-            header = (
-                "The selected parameters are:\n\n"
-                f"Scanner:\n- Top: {top}\n- Bottom: {bottom}\n- Speed: {speed}\n\n"
-                "Lasers:\n"
-            )
-            tooltip_text = header + "\n".join(lines)
+        # 5) build the “- …” laser lines (preserve original order)
+        lines = []
+        for idx, power, f1, f2 in zip_longest(lasers, powers, f1s, f2s, fillvalue=None):
+            wl = LASER_WL.get(idx, f"{idx} nm")
 
-            # 7) Camera 1 parameters
+            slots  = [f for f in (f1, f2) if f is not None]
+            chosen = [FILTER_N[f] for f in slots if FILTER_N[f] != "Empty"]
 
-            if self.camera_widget_1 is not None:
-                w1, h1, bin1, dr1 = self.camera_widget_1.checkbox_camera_select()
-                if None not in (w1, h1, bin1, dr1):
-                    cam1_lines = [
-                        f"- Format: {w1} x {h1};",
-                        f"- Binning: {bin1} x {bin1};",
-                        f"- Dynamic Range: {dr1} bits"
-                    ]
-                    tooltip_text += "\n\nCamera 1:\n" + "\n".join(cam1_lines)
+            if chosen:
+                if len(chosen) == 1:
+                    suffix = f", and {chosen[0]} filter"
+                else:
+                    suffix = ", and " + ", ".join(chosen) + " filters"
+            else:
+                if   len(slots) == 1: suffix = ", and no filter"
+                elif len(slots) >= 2: suffix = ", and no filters"
+                else:                 suffix = ""
 
-            # 8) Camera 2 parameters
+            lines.append(f"- {wl} with {power} mW{suffix}")
 
-            if self.camera_widget_2 is not None:
-                w2, h2, bin2, dr2 = self.camera_widget_2.checkbox_camera_select()
-                if None not in (w2, h2, bin2, dr2):
-                    cam2_lines = [
-                        f"- Format: {w2} x {h2};",
-                        f"- Binning: {bin2} x {bin2};",
-                        f"- Dynamic Range: {dr2} bits"
-                    ]
-                    tooltip_text += "\n\nCamera 2:\n" + "\n".join(cam2_lines)
-
-            # 9) attach the fully rendered tooltip
-            self.tooltip_manager.attach_tooltip(
-                self.start_button,
-                tooltip_text
-            )
+        # 6) assemble header + lasers block
+        header = (
+            "The selected parameters are:\n\n"
+            f"Scanner:\n- Top: {top}\n- Bottom: {bottom}\n- Speed: {speed}\n\n"
+            "Lasers:\n"
+        )
+        tooltip_text = header + "\n".join(lines)
+
+        # 7) Camera 1 parameters
+        if self.camera_1_selected:
+            cam1_lines = [
+                f"- Format: {self.width_x_1} x {self.height_y_1};",
+                f"- Binning: {self.binning_1} x {self.binning_1};",
+                f"- Dynamic Range: {self.dynamic_range_1} bits"
+            ]
+            tooltip_text += "\n\nCamera 1:\n" + "\n".join(cam1_lines)
+
+        # 8) Camera 2 parameters
+        if self.camera_2_selected:
+            cam2_lines = [
+                f"- Format: {self.width_x_2} x {self.height_y_2};",
+                f"- Binning: {self.binning_2} x {self.binning_2};",
+                f"- Dynamic Range: {self.dynamic_range_2} bits"
+            ]
+            tooltip_text += "\n\nCamera 2:\n" + "\n".join(cam2_lines)
+
+        # 9) attach the fully rendered tooltip
+        self._set_start_tooltip(tooltip_text)
+
+    def _set_start_tooltip(self, text):
+        """Attaches the Start button tooltip, only when its text changed."""
+        if text == self._start_tooltip:
+            return
+        self._start_tooltip = text
+        self.tooltip_manager.detach_tooltip(self.start_button)
+        self.tooltip_manager.attach_tooltip(self.start_button, text)
+
+    def bulk_edit(self):
+        """Edits the parameters of all the positions in a table"""
+        dialog = Bulk_Edit_Dialog(self.stack_parameters, self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        changes = dialog.changes()
+        self.stack_parameters.set_values(changes)
+
+        # Keep the time settings shared between positions, and their total time consistent
+        for (idx, field), text in changes.items():
+            if field in ('Tpoints', 'Tstep', 'Tstep_unit'):
+                self._propagate_field(FIELD_WIDGETS[field], text)
+        for tab in self.content_tabs:
+            self._update_total_time(tab)
+
+    def show_position_table(self):
+        """Opens the position table window"""
+        if self.position_table_widget is None:
+            self.position_table_widget = Position_Table_Widget(self.position_table, self._table_template, self._tile_fov, self)
+        self.position_table_widget.show()
+        self.position_table_widget.raise_()
+
+    def _table_template(self):
+        """Parameters the new positions of the table don't set (Y range, step, time): those of the first tab"""
+        if self.stack_parameters.parameters and self.stack_parameters.parameters[0] is not None:
+            return self.stack_parameters.parameters[0]
+        return Stack_Parameters()
+
+    def _tile_fov(self):
+        """Field of view (um, along X and Z) of the tiles: ROI and binning of the first selected camera"""
+        for camera_widget in (self.camera_widget_1, self.camera_widget_2):
+            if camera_widget is not None and camera_widget.camera_checkbox.isChecked():
+                width_x, height_y, binning, _ = camera_widget.checkbox_camera_select()
+                return tile_fov(width_x, height_y, binning)
+        return tile_fov()
+
+    def _update_total_time(self, tab):
+        """Sets the total time of a tab from its time points and time step."""
+        tp = self._parse_int(tab['Tpoints'])
+        ts = self._parse_float(tab['Tstep'], tab['Tstep unit'].currentText())
+        if tp is None or tp <= 1 or ts is None:
+            return
+        val, unit = self._best_unit((tp - 1) * ts)
+        tab['Ttotal unit'].blockSignals(True); tab['Ttotal'].blockSignals(True)
+        tab['Ttotal unit'].setCurrentText(unit); tab['Ttotal'].setText(str(val))
+        tab['Ttotal'].blockSignals(False); tab['Ttotal unit'].blockSignals(False)
 
     #########################################################################################################################################
 
     def get_zstackwidget_parameters(self):
-        """Function that gives all of the parameters in all of the available tabs"""
+        """Function that gives all of the parameters in all of the available tabs (a snapshot of the parameter model),
+        or of all the positions of the position table"""
+        if self.use_table_checkbox.isChecked():
+            return self.position_table.snapshot()
+        return self.stack_parameters.snapshot()
+    
+    def get_autofocus(self):
+        """Returns the Autofocus chosen in the widget (using the focus metric of the selected camera), or None"""
+        if not self.autofocus_checkbox.isChecked():
+            return None
+
+        method = "Tenengrad"
+        for camera_widget in (self.camera_widget_1, self.camera_widget_2):
+            if camera_widget is not None and camera_widget.camera_checkbox.isChecked():
+                method = camera_widget.focus_combobox.currentText()
+                break
 
-        zstackwidget_parameters = []
+        return Autofocus(axis=self.autofocus_combobox.currentText(), method=method)
 
-        for widgets in self.content_tabs:
-            parameters = {
-                'mode_yl': widgets['Mode Yl'].isChecked(),
-                'mode_ly': widgets['Mode lY'].isChecked(),
-                'yi': float(widgets['Yi'].text()),
-                'yf': float(widgets['Yf'].text()),
-                'x': float(widgets['X'].text()),
-                'z': float(widgets['Z'].text()),
-                'theta': float(widgets['Theta'].text()),
-                'Ystep': float(widgets['Ystep'].text()),
-                'Nsteps': int(widgets['Nsteps'].text()),
-                'Tpoints': int(widgets['Tpoints'].text()),
-                'Tstep': float(widgets['Tstep'].text() or "0"),
-                'Tstep_unit': widgets['Tstep unit'].currentText()
-            }
+    def estimate_timing(self, zstackwidget_parameters):
+        """Pre-run timing estimate (Acquisition_Timing) of the acquisition from the plan and the devices' settings"""
+        lasers, _, _, _ = self.lasers_widget.get_selected_lasers()
+        stacks = [dict(p, channels=len(lasers)) for p in zstackwidget_parameters]
+
+        # Bytes of a slice and exposure of the selected cameras
+        frame_bytes = 0
+        exposures = []
+        for camera_widget in (self.camera_widget_1, self.camera_widget_2):
+            if camera_widget is None or not camera_widget.camera_checkbox.isChecked():
+                continue
+            width_x, height_y, binning, dynamic_range = camera_widget.checkbox_camera_select()
+            frame_bytes += int(width_x / binning) * int(height_y / binning) * (2 if dynamic_range == 16 else 1)
+            if camera_widget.exposure_value:
+                exposures.append(camera_widget.exposure_value)
+
+        # Sweep of every slice
+        sweep_ms = None
+        scan = self.scanner_widget.checkbox_scanner_select()
+        if scan['scan_top'] is not None:
+            if scan['scan_pattern'] is not None:
+                sweep_ms = scan['scan_pattern'].expected_ms(scan['scan_top'], scan['scan_bottom'], scan['mark_speed'])
+            else:
+                sweep_ms = expected_sweep_ms(scan['scan_top'], scan['scan_bottom'], scan['mark_speed'])
 
-            zstackwidget_parameters.append(parameters)
+        # Settle time learned for this Y step (um -> mm)
+        settle_s = None
+        if stacks:
+            settle_s = get_settle_detector(self.pidevice).expected_time('2', stacks[0]['Ystep'] / 1000)
+
+        return Acquisition_Timing.estimate(stacks, frame_bytes,
+                                           exposure_ms=max(exposures) if exposures else None,
+                                           sweep_ms=sweep_ms, settle_s=settle_s,
+                                           same_timepoints=self.multipositions_checkbox.isChecked())
+
+    def preflight_check(self, zstackwidget_parameters, timing):
+        """
+        Checks that the experiment fits (disk space, memory, write bandwidth, time spacing).
+        Returns False if it can't start, or if the user cancels after the warnings.
+        """
+        lasers, _, _, _ = self.lasers_widget.get_selected_lasers()
+        stacks = [dict(p, channels=len(lasers)) for p in zstackwidget_parameters]
+        cameras = [camera_widget.checkbox_camera_select() for camera_widget in (self.camera_widget_1, self.camera_widget_2)
+                   if camera_widget is not None and camera_widget.camera_checkbox.isChecked()]
+
+        self.measure_disk()
+        plan = Resource_Plan(stacks, cameras, self.current_save_directory, timing,
+                             same_timepoints=self.multipositions_checkbox.isChecked())
+        print(plan.summary())
+
+        if plan.errors:
+            QMessageBox.critical(self, "Cannot start the acquisition",
+                                 plan.summary() + "\n\n" + "\n".join(plan.errors))
+            return False
+        if plan.warnings:
+            answer = QMessageBox.warning(self, "Start the acquisition?",
+                                         plan.summary() + "\n\n" + "\n".join(plan.warnings) + "\n\nStart anyway?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            return answer == QMessageBox.Yes
+        return True
 
-        return zstackwidget_parameters
-    
     def start_acquisition(self):
 
+        # Get all the positional parameters for acquisition
+        zstackwidget_parameters = self.get_zstackwidget_parameters()
+
+        # Timing model for the ETA, seeded with the pre-run estimate, and the pre-flight check
+        timing = self.estimate_timing(zstackwidget_parameters)
+        if not self.preflight_check(zstackwidget_parameters, timing):
+            return
+
         self.is_acquiring = True
+        # A disk benchmark must not compete with the acquisition writes
+        self._disk_stop.set()
 
         # Emit the signal that acquisition started
         self.acquisition_started.emit()
-        
-        # Get all the positional parameters for acquisition
-        zstackwidget_parameters = self.get_zstackwidget_parameters()
 
         # Get the order:
         if self.multipositions_checkbox.isChecked():
@@ -1352,7 +1316,10 @@ class YStack_Widget(QWidget):
 
         self._progress_counter = 0
 
-        self.progress_dialog = AcquisitionProgress_Dialog(self._grand_total, order, self)
+        self.timing = timing
+        self.worker.timing = self.timing
+
+        self.progress_dialog = AcquisitionProgress_Dialog(self._grand_total, order, self, timing=self.timing)
         self.progress_dialog.setModal(False)
         self.progress_dialog.setWindowModality(Qt.NonModal)
 
@@ -1437,6 +1404,11 @@ class YStack_Widget(QWidget):
         self.block_tab_changed = False
         self.is_acquiring = False
 
+        # Disk benchmark of the pre-flight check: own pool (never holds the global one), stopped by the acquisition
+        self._disk_pool = QThreadPool(self)
+        self._disk_pool.setMaxThreadCount(1)
+        self._disk_stop = threading.Event()
+
         # Global variable to save the X real position
         self.x_real = 0
 
@@ -1450,6 +1422,47 @@ class YStack_Widget(QWidget):
         self.multipositions_checkbox.setChecked(True)
         self.layout.addWidget(self.multipositions_checkbox)
         self.layout.addSpacing(10)
+
+        #-------------------------------------------------------------------------------------
+        # Position Table Checkbox and Button
+
+        self.position_table = Position_Table_Model(self)
+        self.position_table_widget = None
+
+        self.position_table_row = QWidget()
+        self.position_table_layout = QHBoxLayout(self.position_table_row)
+        self.position_table_layout.setContentsMargins(0, 0, 5, 5)
+
+        self.use_table_checkbox = QCheckBox(" Acquire the positions of the table")
+        self.use_table_checkbox.setChecked(False)
+        self.tooltip_manager.attach_tooltip(self.use_table_checkbox, "Acquires the positions of the position table\n(imported, or generated as a grid) instead of the tabs.")
+        self.position_table_button = QPushButton("Position Table")
+        self.position_table_button.clicked.connect(self.show_position_table)
+
+        self.position_table_layout.addWidget(self.use_table_checkbox)
+        self.position_table_layout.addWidget(self.position_table_button)
+        self.position_table_layout.addStretch(1)
+        self.layout.addWidget(self.position_table_row)
+
+        #-------------------------------------------------------------------------------------
+        # Autofocus Checkbox and Axis
+
+        self.autofocus_widget = QWidget()
+        self.autofocus_layout = QHBoxLayout(self.autofocus_widget)
+        self.autofocus_layout.setContentsMargins(0, 0, 5, 5)
+
+        self.autofocus_checkbox = QCheckBox(" Autofocus before each stack")
+        self.autofocus_checkbox.setChecked(False)
+        self.autofocus_combobox = QComboBox()
+        self.autofocus_combobox.addItems(list(AUTOFOCUS_AXES))
+        self.autofocus_combobox.setEnabled(False)
+        self.autofocus_checkbox.toggled.connect(self.autofocus_combobox.setEnabled)
+        self.tooltip_manager.attach_tooltip(self.autofocus_checkbox, "Searches the sharpest light-sheet plane (scanner offset)\nor stage Z at the center of each stack, before each\nposition and time point. The values are saved in the metadata.")
+
+        self.autofocus_layout.addWidget(self.autofocus_checkbox)
+        self.autofocus_layout.addWidget(self.autofocus_combobox)
+        self.autofocus_layout.addStretch(1)
+        self.layout.addWidget(self.autofocus_widget)
             # Propagator for the multi-positions in the same time-point
         self.multipositions_checkbox.toggled.connect(self._on_multipositions_toggled)
 
@@ -1505,6 +1518,7 @@ class YStack_Widget(QWidget):
                 border: 2px solid #777;
             }}
         """)
+        self.use_table_checkbox.setStyleSheet(self.multipositions_checkbox.styleSheet())
 
         # Experiment Name
         self.exp_name_widget = QWidget()
@@ -1668,13 +1682,14 @@ class YStack_Widget(QWidget):
             # Add the tab widget to the main layout
         self.layout.addWidget(self.tab_widget)
 
-        # Create the Update thread
-        self.update_thread = QThread()
-        self.update_worker = UpdateWorker(self.pidevice)
-        self.update_worker.moveToThread(self.update_thread)
-        self.update_thread.started.connect(self.update_worker.start_updates)
+        # Parameters of the tabs, updated on their edit signals
+        self.stack_parameters = Stack_Parameters_Model(self)
+        self._start_tooltip = None
+
+        # Y position updates from the shared stage telemetry
+        self.telemetry = get_stage_telemetry(self.pidevice)
+        self.update_worker = UpdateWorker(self.telemetry, self)
         #self.update_worker.update_signal.connect(self.opengl_widget.set_z_position)
-        self.update_thread.start()
 
             # Add tabs in the Tab Widget
         self.add_content_tab()
@@ -1750,8 +1765,16 @@ class YStack_Widget(QWidget):
                 }
         """)
 
+            # Bulk Edit Button
+        self.bulk_edit_button = QPushButton("Edit Positions")
+        self.tooltip_manager.attach_tooltip(self.bulk_edit_button, "Edits the parameters of all the positions in a table.")
+        self.bulk_edit_button.clicked.connect(self.bulk_edit)
+        self.bulk_edit_button.setFixedSize(140, 30)
+        self.bulk_edit_button.setStyleSheet(self.start_button.styleSheet())
+
             # Add widgets to the Bottom Layout
         #self.bottom_layout.addWidget(self.estimated_time_label)
+        self.bottom_layout.addWidget(self.bulk_edit_button)
         self.bottom_layout.addStretch()
         self.bottom_layout.addWidget(self.start_button)
 
@@ -1760,12 +1783,16 @@ class YStack_Widget(QWidget):
 
         self.initializing = False
 
-        # Timer to update the GUI
+        # The Start button follows the tab edits right away, and the devices' settings with a slow timer
+        self.stack_parameters.changed.connect(self.updates)
+        self.use_table_checkbox.toggled.connect(self.updates)
+        for signal in (self.position_table.modelReset, self.position_table.rowsInserted,
+                       self.position_table.rowsRemoved, self.position_table.dataChanged):
+            signal.connect(self.updates)
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.updates)
-        
-        # Start the timer with an interval of 50 milliseconds (0.05 second)
-        self.timer.start(50)
+        self.timer.start(500)
+        self.updates()
 
 
     def _on_multipositions_toggled(self, checked: bool):
@@ -1802,6 +1829,9 @@ class YStack_Widget(QWidget):
                     widget.setCurrentText(new_value)
                     widget.blockSignals(False)
 
+        # The values were set with the signals blocked
+        self.stack_parameters.read_all()
+
 
     def add_content_tab(self):
         """Function that is linked to the "Add new Tab" Tab"""
@@ -3022,6 +3052,7 @@ class YStack_Widget(QWidget):
         }
 
         self.content_tabs.append(tab_widgets)
+        self.stack_parameters.add(tab_widgets)
 
         self.update_tab_labels()
 
@@ -3032,8 +3063,6 @@ class YStack_Widget(QWidget):
     def closeEvent(self, event):
         self.timer.stop()
         self.update_worker.stop()
-        self.update_thread.quit()
-        self.update_thread.wait()
         super().closeEvent(event)
 
 
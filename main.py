@@ -1,21 +1,54 @@
 %load_ext autoreload
 %autoreload 2
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import os, re
+import os
 os.environ["QT_API"] = "pyside6"
 os.environ["NAPARI_QT_API"] = "pyside6"
+import sys
+import time
+
+from PySide6.QtWidgets import QApplication, QDialog
+from PySide6.QtGui import QIcon
+
+from Launcher_py import ALM_Launcher
+from Extra_Files.Fast_Start import Module_Preloader, import_profile
+
+####################################################################################################
+# Fast start: the Launcher shows up right away, the heavy modules are imported while it is open
+
+if __name__ == '__main__':
+    # Benchmark mode: import-time profile of the startup modules
+    if "--import-profile" in sys.argv:
+        print(import_profile())
+        sys.exit(0)
+
+    startup_t0 = time.perf_counter()
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.setWindowIcon(QIcon("ALM.ico"))
+    app.setApplicationDisplayName("")
+
+    preloader = Module_Preloader()
+    preloader.start()
+
+    # 1. Initialize the software, and choose the path
+    dlg = ALM_Launcher()
+    if dlg.exec() != QDialog.Accepted:
+        sys.exit(0)    
+
+    preloader.wait()
+    print(preloader.report())
+
+####################################################################################################
+
 import vispy.app
 vispy.app.use_app('pyside6')
 
 import napari
 from napari.layers import Image
-import sys
 import numpy as np
 import ctypes
-import cv2
 
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QEvent
 from PySide6.QtWidgets import QApplication, QMainWindow, QWidget, QGridLayout, QVBoxLayout, QSplitter, QDialog
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import QApplication, QMainWindow, QMdiArea, QMdiSubWindow, QLabel, QVBoxLayout, QWidget
@@ -35,27 +68,20 @@ from Scanner_Widget_py import Scanner_Widget
 from Stages_Widget_py import Stages_Widget
 from YStack_Widget_py import YStack_Widget
 from File_Explorer_py import File_Explorer
-from Launcher_py import ALM_Launcher
 
 import json
-from skimage.transform import pyramid_gaussian
 
-from pylablib.devices import DCAM
 from Extra_Files.Acquisition_Thread_Code import Acquisition_Thread
 from Extra_Files.Devices_Connections import device_initializations, device_closings
+from Extra_Files.Startup_Manager import Startup_Manager
 from Extra_Files.Floating_Widget import FloatingWidget
+from Extra_Files.Live_Display import decimate_for_display
+from Extra_Files.Auto_Contrast import Auto_Contrast, saturated_fraction, percentile_limits
+from Extra_Files.Snap_Service import Snap_Service
+from Extra_Files.Focus_Metrics import focus_metric, Focus_History
 
 
-from skimage.transform import resize
-import time
-
 import shutil
-import numpy as np
-import zarr
-from ome_zarr.io import parse_url
-from ome_zarr.writer import write_multiscales_metadata
-from ome_zarr.format import FormatV04
-from skimage.transform import downscale_local_mean
 
 ####################################################################################################
 
@@ -71,21 +97,96 @@ def set_napari_background(viewer, color="#303030"):
 
 class FrameGrabberThread(QThread):
     """ Continuously grabs frames from a camera on its own thread. """
-    frame_ready = Signal(np.ndarray, int)  
-    # (frame, camera_id) so you can distinguish Camera 1 vs 2
-
-    def __init__(self, camera, cam_id, interval_ms=50):
+    frame_ready = Signal(np.ndarray, int, int, int, int)
+    # (display frame, camera_id, offset_y, offset_x, step) so you can distinguish Camera 1 vs 2
+    # and place the cropped/decimated frame at its full frame position
+    contrast_ready = Signal(int, float, float)
+    # (camera_id, low, high) only emitted when the auto-contrast limits change
+    burst_ready = Signal(object, object, int)
+    # (list of full frames, list of their times in s, camera_id) at the end of a burst Snap
+    focus_ready = Signal(int, float)
+    # (camera_id, focus metric) of every grabbed frame
+
+    def __init__(self, camera, cam_id, interval_ms=50, mirror=False):
         super().__init__()
         self.camera   = camera
         self.cam_id   = cam_id
         self.interval = interval_ms
+        self.mirror   = mirror
         self._running = False
 
+        # Full resolution frame (untouched, used by the Snaps)
+        self.latest_frame = None
+        # (canvas_height, canvas_width, zoom, center_y, center_x) from the Napari viewer
+        self._viewport = None
+        # Auto-contrast state of this camera
+        self.auto_contrast = Auto_Contrast()
+        # Fraction of saturated pixels in the newest frame (read by the overlay)
+        self.saturation = 0.0
+        # Live focus metric (computed on a downsampled frame) and its time series
+        self.focus_method = "Tenengrad"
+        self.focus_history = Focus_History()
+        # Burst Snap: number of consecutive frames requested (None: no burst)
+        self._burst = None
+
+    def set_viewport(self, canvas_h, canvas_w, zoom, center_y, center_x):
+        """Stores the visible area of the Napari canvas (called from the GUI thread)."""
+        self._viewport = (canvas_h, canvas_w, zoom, center_y, center_x)
+
+    def start_burst(self, n_frames):
+        """Collects the next n_frames consecutive full frames and emits them with burst_ready."""
+        self._burst = n_frames
+
+    def cancel_burst(self):
+        self._burst = None
+
+    def _grab_burst(self, n_frames):
+        """
+        Reads n_frames consecutive frames by frame index from the camera buffer, as fast as the camera
+        acquires them (no display work in between), with their camera timestamps.
+        """
+        frames, times = [], []
+        try:
+            acquired, _, _, buffer_size = self.camera.get_frames_status()
+            next_frame, end = acquired, acquired + n_frames
+            while next_frame < end and self._burst is not None and self._running:
+                self.camera.wait_for_frame(since="start", nframes=next_frame + 1, timeout=5)
+                acquired = self.camera.get_frames_status()[0]
+                if acquired - next_frame > buffer_size:
+                    raise RuntimeError(f"the camera buffer ({buffer_size} frames) was overwritten")
+                last = min(acquired, end)
+                batch, infos = self.camera.read_multiple_images(rng=(next_frame, last), return_info=True)
+                frames.extend(batch)
+                for info in infos:
+                    timestamp_us = getattr(info, "timestamp_us", None)
+                    times.append(timestamp_us * 1e-6 if timestamp_us is not None else time.perf_counter())
+                next_frame = last
+        except Exception as e:
+            print(f"[Snap] Camera {self.cam_id}: burst stopped after {len(frames)} of {n_frames} frames ({e})")
+
+        # A cancelled burst is dropped; an incomplete one is still reported (the Snap service tells the error)
+        if self._burst is not None:
+            self._burst = None
+            self.burst_ready.emit(frames, times, self.cam_id)
+
+    def set_focus_method(self, method):
+        """Changes the focus metric (the time series restarts, values of different metrics don't compare)."""
+        self.focus_method = method
+        self.focus_history.clear()
+
     def run(self):
         self._running = True
+        self.auto_contrast.reset()
+        self.focus_history.clear()
 
         while self._running:
 
+            # Burst Snap: consecutive frames at the camera rate, the Live view resumes after it
+            n_frames = self._burst
+            if n_frames is not None:
+                self._grab_burst(n_frames)
+                continue
+
             try:
                 self.camera.wait_for_frame(timeout=5)
                 frame = self.camera.read_newest_image(peek=True)
@@ -95,7 +196,21 @@ class FrameGrabberThread(QThread):
                 continue
             
             if frame is not None:
-                self.frame_ready.emit(frame, self.cam_id)
+                self.latest_frame = frame
+
+                # Percentile contrast from a strided subsample of the full frame
+                if self.auto_contrast.update(frame):
+                    self.contrast_ready.emit(self.cam_id, *self.auto_contrast.limits)
+                self.saturation = saturated_fraction(frame)
+
+                # Focus metric
+                focus = focus_metric(frame, self.focus_method)
+                self.focus_history.append(focus)
+                self.focus_ready.emit(self.cam_id, focus)
+
+                # Only send what is visible on the canvas, at the canvas resolution
+                display, offset_y, offset_x, step = decimate_for_display(frame, self._viewport, mirror=self.mirror)
+                self.frame_ready.emit(display, self.cam_id, offset_y, offset_x, step)
 
             time.sleep(0.03)
 
@@ -116,79 +231,96 @@ class ALM_Lightsheet(QMainWindow):
     #-------------------------------------------------------------------------------------------------
     # Window Functions
 
-    def on_frame_received(self, frame: np.ndarray, cam_id: int):
+    def on_frame_received(self, frame: np.ndarray, cam_id: int, offset_y: int = 0, offset_x: int = 0, step: int = 1):
+
+        name = f"Camera {cam_id}"
+
+        # The frame arrives already mirrored (Camera 1), cropped to the viewport and decimated from the grabber thread.
+        # It is never drawn on: the camera label and readouts live in the Napari text overlay (see _update_overlay)
+
+        # Keep the layer in full frame coordinates (pixel centers of the decimated frame)
+        scale = (step, step)
+        translate = (offset_y + (step - 1) / 2, offset_x + (step - 1) / 2)
+
+        if name in self.viewer.layers:
+            layer = self.viewer.layers[name]
+            layer.data = frame
+            if tuple(layer.scale) != scale or tuple(layer.translate) != translate:
+                layer.scale = scale
+                layer.translate = translate
+        else:
+            self.viewer.add_image(frame, name=name, colormap="gray", scale=scale, translate=translate)
+            self._apply_contrast(cam_id)
+            QTimer.singleShot(0, lambda: self.viewer.fit_to_view(margin=0.05))
+
+    def on_stack_preview(self, frame: np.ndarray, cam_id: int, time_point: int, laser: int, slice_idx: int):
+        """
+        Shows the live preview of the stack being acquired (maximum projection with the YZ view on its
+        right and the XZ view below, decimated), already rate-capped by the preview thread.
+        """
+        name = f"Camera {cam_id} Stack Preview"
+        low, high = percentile_limits(frame)
+
+        if name in self.viewer.layers:
+            layer = self.viewer.layers[name]
+            layer.data = frame
+            layer.contrast_limits = (low, high)
+        else:
+            self.viewer.add_image(frame, name=name, colormap="gray", contrast_limits=(low, high))
+            QTimer.singleShot(0, lambda: self.viewer.fit_to_view(margin=0.05))
+
+    @Slot(int, float, float)
+    def _on_contrast_ready(self, cam_id, low, high):
+        """Keeps the new auto-contrast limits of a camera and applies them to its Napari layer."""
+        self._contrast_limits[cam_id] = (low, high)
+        self._apply_contrast(cam_id)
+
+    def _apply_contrast(self, cam_id):
+        """Applies the last auto-contrast limits of a camera to its Napari layer (if the auto-contrast is on)."""
+        camera_widget = getattr(self, f"camera_widget_{cam_id}", None)
+        limits = self._contrast_limits.get(cam_id)
+        if limits is None or camera_widget is None or not camera_widget.auto_contrast_checkbox.isChecked():
+            return
 
         name = f"Camera {cam_id}"
+        if name in self.viewer.layers:
+            self.viewer.layers[name].contrast_limits = limits
+
+    def _update_overlay(self):
+        """Writes the camera label, frame rate, exposure and saturation of each Live camera on the Napari overlay."""
+        lines = []
+        for cam_id in (1, 2):
+            grabber = getattr(self, f"grabber_{cam_id}", None)
+            camera_widget = getattr(self, f"camera_widget_{cam_id}", None)
+            if grabber is None or camera_widget is None or not grabber.isRunning():
+                continue
+
+            fps = getattr(camera_widget, "fps_value", 0.0) or 0.0
+            exposure = getattr(camera_widget, "exposure_value", None)
+            exposure_text = f"{exposure:.2f} ms" if exposure is not None else "- ms"
+            focus = grabber.focus_history.last()
+            focus_text = f"{focus:.4g}" if focus is not None else "-"
+            lines.append(f"Camera {cam_id}   {fps:.1f} fps   {exposure_text}   Saturated: {100 * grabber.saturation:.2f} %   Focus: {focus_text}")
+            camera_widget.update_focus(focus)
+
+        overlay = self.viewer.text_overlay
+        overlay.text = "\n".join(lines)
+        overlay.visible = bool(lines)
+
+    def _on_viewport_changed(self, event=None):
+        """Sends the visible area of the Napari canvas to the frame grabbers."""
+        try:
+            canvas = self.viewer.window._qt_viewer.canvas.native
+            canvas_h, canvas_w = canvas.height(), canvas.width()
+        except Exception:
+            return
 
-        # Mirror the view for Camera 1
-        if cam_id == 1:
-
-            # Mirror the frame
-            frame = np.fliplr(frame)
-
-            # Ensure it’s C-contiguous so OpenCV can see it as a Mat
-            frame = np.ascontiguousarray(frame)
-
-            if "Camera 1" in self.viewer.layers:
-                layer = self.viewer.layers["Camera 1"]
-                # contrast_limits is a (min, max) tuple
-                contrast_val = int(layer.contrast_limits[1])
-            else:
-                contrast_val = int(frame.max())
-
-            base_org = (10, 85)
-            # Current frame dimensions
-            cur_width  = self.camera_widget_1.width_x
-            cur_height = self.camera_widget_1.height_y
-            # Scale factors relative to the 2048×2048 design
-            scale_x = cur_width  / 2048
-            scale_y = cur_height / 2048
-
-            # Write on the frame
-            text       = "Camera 1"
-            org        = (int(base_org[0] * scale_x), int(base_org[1] * scale_y))
-            font       = cv2.FONT_HERSHEY_DUPLEX
-            font_scale = 3.5 * scale_x  # Update font size by the size of the frame
-            color = contrast_val
-            thickness  = int(4 * scale_x) # Update font size by the size of the frame
-            line_type  = cv2.LINE_AA
-
-            cv2.putText(frame, text, org, font, font_scale, color, thickness, line_type)
-
-            if name in self.viewer.layers:
-                self.viewer.layers[name].data = frame
-            else:
-                self.viewer.add_image(frame, name=name, colormap="gray")
-                QTimer.singleShot(0, lambda: self.viewer.fit_to_view(margin=0.05))
-
-        elif cam_id == 2:
-
-            # Ensure it’s C-contiguous so OpenCV can see it as a Mat
-            frame = np.ascontiguousarray(frame)
-
-            if "Camera 2" in self.viewer.layers:
-                layer = self.viewer.layers["Camera 2"]
-                # contrast_limits is a (min, max) tuple
-                contrast_val = int(layer.contrast_limits[1])
-            else:
-                contrast_val = int(frame.max())
-
-            # Write on the frame
-            text       = "Camera 2"
-            org        = (10, 85)
-            font       = cv2.FONT_HERSHEY_DUPLEX
-            font_scale = 3.5 * self.camera_widget_2.width_x / 2048 # Update font size by the size of the frame
-            color = contrast_val
-            thickness  = int(4 * self.camera_widget_2.width_x / 2048) # Update font size by the size of the frame
-            line_type  = cv2.LINE_AA
-
-            cv2.putText(frame, text, org, font, font_scale, color, thickness, line_type)
-
-            if name in self.viewer.layers:
-                self.viewer.layers[name].data = frame
-            else:
-                self.viewer.add_image(frame, name=name, colormap="gray")
-                QTimer.singleShot(0, lambda: self.viewer.fit_to_view(margin=0.05))
+        zoom = self.viewer.camera.zoom
+        center_y, center_x = self.viewer.camera.center[-2:]
+
+        for grabber in (getattr(self, "grabber_1", None), getattr(self, "grabber_2", None)):
+            if grabber is not None:
+                grabber.set_viewport(canvas_h, canvas_w, zoom, center_y, center_x)
 
 
     @Slot(bool)
@@ -228,6 +360,7 @@ class ALM_Lightsheet(QMainWindow):
             self.camera_1.clear_acquisition()
             # stop grabbing
             self.grabber_1.stop()
+            self.snap_service.cancel_burst(1)
             # turn lasers off
             self.laser_widget.turn_all_off()
             # turn scanner off
@@ -271,6 +404,7 @@ class ALM_Lightsheet(QMainWindow):
             self.camera_2.clear_acquisition()
             # stop grabbing
             self.grabber_2.stop()
+            self.snap_service.cancel_burst(2)
             # turn lasers off
             self.laser_widget.turn_all_off()
             # turn scanner off
@@ -278,11 +412,6 @@ class ALM_Lightsheet(QMainWindow):
 
             
 
-    @Slot(np.ndarray, int)
-    def _on_frame_ready(self, frame, cam_id):
-        """Keep the newest incoming frame in memory."""
-        self.latest_frames[cam_id] = frame.copy()
-
     @Slot(str)
     def _on_path_changed(self, new_path: str):
         self.current_save_directory = new_path
@@ -305,159 +434,19 @@ class ALM_Lightsheet(QMainWindow):
     #-------------------------------------------------------------------------------------------------
     # Snap Capture
 
-    def _get_next_snap_number(self, save_directory, prefix):
-        """
-        Scan self.snap_directory for files named 'Snap<N>.png',
-        find the highest N, and return N+1 (or 1 if none).
-        """
-        esc = re.escape(prefix)
-        pat = re.compile(rf"^{esc}_Snap(\d+)\.ome\.zarr$")
-        nums = []
-        for fname in os.listdir(save_directory):
-            m = pat.match(fname)
-            if m:
-                nums.append(int(m.group(1)))
-        return max(nums) + 1 if nums else 1
-    
-
-    def on_camera1_snap(self, save_directory):
-        # ——— load your latest frame ———
-        frame: np.ndarray = self.latest_frames.get(1)
-
-        # get the number for the file name
-        prefix = "Camera1"
-        file_number = self._get_next_snap_number(save_directory, prefix)
-
-        # ——— open Zarr store ———
-        output_file = os.path.join(
-            save_directory,
-            f"Camera1_Snap{file_number}.ome.zarr"
-        )
-        store = parse_url(output_file, mode="w").store
-        root = zarr.group(store=store, overwrite=True)
-
-        # ——— build an XY-only 3-level pyramid ———
-        pyramid = [frame.astype(np.uint16)]
-        max_levels = 3
-        for level in range(1, max_levels):
-            prev = pyramid[-1]
-            # downsample by 2× in Y and X only:
-            ds = downscale_local_mean(prev, (2, 2)).astype(prev.dtype)
-            pyramid.append(ds)
-
-        # ——— write each pyramid level as its own array ———
-        for idx, img in enumerate(pyramid):
-            # choose chunks (here, keep full width for simplicity)
-            chunks = (min(256, img.shape[0]), min(256, img.shape[1]))
-            root.create_dataset(
-                str(idx),
-                data=img,
-                chunks=chunks,
-                dtype=img.dtype
-            )
-
-        # ——— assemble the multiscale metadata ———
-        # pixel size (µm) in Y and X:
-        base_pixel_size = 0.65
-        datasets = []
-        for idx in range(len(pyramid)):
-            scale_factor = 2 ** idx
-            datasets.append({
-                "path": str(idx),
-                "coordinateTransformations": [
-                    {
-                        "type": "scale",
-                        "scale": [
-                            base_pixel_size * scale_factor,  # Y spacing
-                            base_pixel_size * scale_factor,  # X spacing
-                        ],
-                    }
-                ],
-            })
-
-        axes = [
-            {"name": "y", "type": "space", "unit": "um"},
-            {"name": "x", "type": "space", "unit": "um"},
-        ]
+    def on_camera_snap(self, cam_id):
+        """Snaps (single frame or burst) the Live frames of a camera into the current save directory."""
+        grabber = getattr(self, f"grabber_{cam_id}", None)
+        camera_widget = getattr(self, f"camera_widget_{cam_id}", None)
+        if grabber is None or camera_widget is None:
+            return
 
-        # ——— write only the multiscales metadata ———
-        write_multiscales_metadata(
-            group=root,
-            datasets=datasets,
-            fmt=FormatV04(),
-            axes=axes,
-            name="image"
-        )
-
-
-    def on_camera2_snap(self, save_directory):
-        # ——— load your latest frame ———
-        frame: np.ndarray = self.latest_frames.get(2)
-
-        # get the number for the file name
-        prefix = "Camera2"
-        file_number = self._get_next_snap_number(save_directory, prefix)
-
-        # ——— open Zarr store ———
-        output_file = os.path.join(
-            save_directory,
-            f"Camera2_Snap{file_number}.ome.zarr"
-        )
-        store = parse_url(output_file, mode="w").store
-        root = zarr.group(store=store, overwrite=True)
-
-        # ——— build an XY-only 3-level pyramid ———
-        pyramid = [frame.astype(np.uint16)]
-        max_levels = 3
-        for level in range(1, max_levels):
-            prev = pyramid[-1]
-            # downsample by 2× in Y and X only:
-            ds = downscale_local_mean(prev, (2, 2)).astype(prev.dtype)
-            pyramid.append(ds)
-
-        # ——— write each pyramid level as its own array ———
-        for idx, img in enumerate(pyramid):
-            # choose chunks (here, keep full width for simplicity)
-            chunks = (min(256, img.shape[0]), min(256, img.shape[1]))
-            root.create_dataset(
-                str(idx),
-                data=img,
-                chunks=chunks,
-                dtype=img.dtype
-            )
-
-        # ——— assemble the multiscale metadata ———
-        # pixel size (µm) in Y and X:
-        base_pixel_size = 0.65
-        datasets = []
-        for idx in range(len(pyramid)):
-            scale_factor = 2 ** idx
-            datasets.append({
-                "path": str(idx),
-                "coordinateTransformations": [
-                    {
-                        "type": "scale",
-                        "scale": [
-                            base_pixel_size * scale_factor,  # Y spacing
-                            base_pixel_size * scale_factor,  # X spacing
-                        ],
-                    }
-                ],
-            })
-
-        axes = [
-            {"name": "y", "type": "space", "unit": "um"},
-            {"name": "x", "type": "space", "unit": "um"},
-        ]
+        n_frames, projection = camera_widget.snap_settings()
+        self.snap_service.snap(grabber, self.current_save_directory, f"Camera{cam_id}", n_frames, projection)
 
-        # ——— write only the multiscales metadata ———
-        write_multiscales_metadata(
-            group=root,
-            datasets=datasets,
-            fmt=FormatV04(),
-            axes=axes,
-            name="image"
-        )
+    @Slot(str)
+    def _on_snap_failed(self, message):
+        print(f"[Snap Error] {message}")
 
     #-------------------------------------------------------------------------------------------------
     # Camera restarts
@@ -537,9 +526,15 @@ class ALM_Lightsheet(QMainWindow):
         self.filterwheels_widget.setDisabled(True)
 
         self.ystack_widget.start_button.setDisabled(True)
+        self.ystack_widget.bulk_edit_button.setDisabled(True)
+        self.ystack_widget.use_table_checkbox.setDisabled(True)
+        self.ystack_widget.position_table_button.setDisabled(True)
         self.ystack_widget.multipositions_checkbox.setDisabled(True)
+        self.ystack_widget.autofocus_widget.setDisabled(True)
 
         self.stages_widget.setDisabled(True)
+        self.stages_widget.telemetry.set_acquiring(True)
+        self.file_manager_widget.set_acquiring(True)
 
         # In case I want to reset the contrast limits
         #QTimer.singleShot(3000, self._reset_all_image_contrast)
@@ -559,9 +554,15 @@ class ALM_Lightsheet(QMainWindow):
         self.filterwheels_widget.setEnabled(True)
 
         self.ystack_widget.start_button.setEnabled(True)
+        self.ystack_widget.bulk_edit_button.setEnabled(True)
+        self.ystack_widget.use_table_checkbox.setEnabled(True)
+        self.ystack_widget.position_table_button.setEnabled(True)
         self.ystack_widget.multipositions_checkbox.setEnabled(True)
+        self.ystack_widget.autofocus_widget.setEnabled(True)
 
         self.stages_widget.setEnabled(True)
+        self.stages_widget.telemetry.set_acquiring(False)
+        self.file_manager_widget.set_acquiring(False)
 
     def _reset_all_image_contrast(self):
         """
@@ -599,8 +600,6 @@ class ALM_Lightsheet(QMainWindow):
         with open("Extra_Files//Filter_List.json", 'r') as file:
             self.filter_json_data = json.load(file)
 
-        self.latest_frames = {}
-
         #---------------------------------------------------------------------------
         # Initialize the devices
         # self.filterwheel1 = device_initializations.filterwheel_1(self)
@@ -616,20 +615,12 @@ class ALM_Lightsheet(QMainWindow):
             ("laserbox",         lambda: device_initializations.laserbox(self)),
             ("rtc5_board",       lambda: device_initializations.scanner(self)),
             ("pidevice",         lambda: device_initializations.stages(self)),
+            ("cameras",          lambda: device_initializations.cameras(self)),
         ]
 
-        # Submit them all at once
-        self._init_results = {}
-        with ThreadPoolExecutor(max_workers=len(init_tasks)) as exe:
-            futures = { exe.submit(fn): name for name, fn in init_tasks }
-            for fut in as_completed(futures):
-                name = futures[fut]
-                try:
-                    device_obj = fut.result()
-                except Exception as e:
-                    # log or re-raise if something goes catastrophically wrong
-                    raise RuntimeError(f"Failed to init {name}: {e}")
-                self._init_results[name] = device_obj
+        # Submit them all at once (the cameras open in parallel with the other devices)
+        self.startup_manager = Startup_Manager(init_tasks)
+        self._init_results = self.startup_manager.run()
 
         # unpack them into attributes
         self.filterwheel1 = self._init_results["filterwheel1"]
@@ -639,13 +630,18 @@ class ALM_Lightsheet(QMainWindow):
         self.pidevice     = self._init_results["pidevice"]
 
 
-        # Initialize the cameras
-        self.number_of_cameras = DCAM.DCAM.get_cameras_number()
+        # Snaps of both cameras are written on a worker thread
+        self.snap_service = Snap_Service(self)
+        self.snap_service.snap_failed.connect(self._on_snap_failed)
+
+        # Initialize the cameras (already opened by the startup manager)
+        cameras = self._init_results["cameras"]
+        self.number_of_cameras = len(cameras)
 
         self.single_camera = None
         # if number_of_cameras == 0:
         if self.number_of_cameras == 1:
-            self.camera = device_initializations.camera(self, idx=0)
+            self.camera = cameras[0]
             self.serial_number = self.camera.get_device_info()[2]
 
             if self.serial_number == "S/N: 302077":
@@ -666,8 +662,8 @@ class ALM_Lightsheet(QMainWindow):
 
 
         elif self.number_of_cameras == 2:
-            self.camera_1 = device_initializations.camera(self, idx=1)
-            self.camera_2 = device_initializations.camera(self, idx=0)
+            self.camera_1 = cameras[1]
+            self.camera_2 = cameras[0]
 
             self.acquisition_thread_1 = Acquisition_Thread(self.camera_1)
             self.acquisition_thread_2 = Acquisition_Thread(self.camera_2)
@@ -691,6 +687,9 @@ class ALM_Lightsheet(QMainWindow):
         cameras_layout.setContentsMargins(0, 0, 0, 0)
         cameras_layout.setSpacing(0)
 
+        # Last auto-contrast limits of every camera, applied again when the layer or the auto-contrast comes back
+        self._contrast_limits = {}
+
         
         # if number_of_cameras == 0:
         if self.number_of_cameras == 1:
@@ -699,16 +698,17 @@ class ALM_Lightsheet(QMainWindow):
                     # Create the first camera widget
                 self.camera_widget_2 = None
                 self.camera_widget_1 = Camera_Widget(idx=0, label="Camera 1:", acq_thread = self.acquisition_thread_1)
-                self.camera_widget_1.setMaximumHeight(300)
+                self.camera_widget_1.setMaximumHeight(375)
                 cameras_layout.addWidget(self.camera_widget_1, alignment=Qt.AlignTop)
 
                     # Create the thread
-                self.grabber_1 = FrameGrabberThread(camera=self.camera_1, cam_id=1, interval_ms=50)
+                self.grabber_1 = FrameGrabberThread(camera=self.camera_1, cam_id=1, interval_ms=50, mirror=True)
                 self.grabber_1.frame_ready.connect(self.on_frame_received)
-                self.grabber_1.frame_ready.connect(self._on_frame_ready)
+                self.grabber_1.contrast_ready.connect(self._on_contrast_ready)
+                self.camera_widget_1.focus_method_changed.connect(self.grabber_1.set_focus_method)
 
                 self.camera_widget_1.live_toggled.connect(self.on_camera1_live_toggled)
-                self.camera_widget_1.snap_clicked.connect(lambda: self.on_camera1_snap(self.current_save_directory))
+                self.camera_widget_1.snap_clicked.connect(lambda: self.on_camera_snap(1))
                 self.camera_widget_1.restart_clicked.connect(self.camera1_restart)
                 
                 
@@ -716,48 +716,56 @@ class ALM_Lightsheet(QMainWindow):
                     # Create the first camera widget
                 self.camera_widget_1 = None
                 self.camera_widget_2 = Camera_Widget(idx=0, label="Camera 2:", acq_thread = self.acquisition_thread_2)
-                self.camera_widget_2.setMaximumHeight(300)
+                self.camera_widget_2.setMaximumHeight(375)
                 cameras_layout.addWidget(self.camera_widget_2, alignment=Qt.AlignTop)
 
                     # Create the thread
                 self.grabber_2 = FrameGrabberThread(camera=self.camera_2, cam_id=2, interval_ms=50)
                 self.grabber_2.frame_ready.connect(self.on_frame_received)
-                self.grabber_2.frame_ready.connect(self._on_frame_ready)
+                self.grabber_2.contrast_ready.connect(self._on_contrast_ready)
+                self.camera_widget_2.focus_method_changed.connect(self.grabber_2.set_focus_method)
 
                 self.camera_widget_2.live_toggled.connect(self.on_camera2_live_toggled)
-                self.camera_widget_2.snap_clicked.connect(lambda: self.on_camera2_snap(self.current_save_directory))
+                self.camera_widget_2.snap_clicked.connect(lambda: self.on_camera_snap(2))
                 self.camera_widget_2.restart_clicked.connect(self.camera2_restart)
 
 
         elif self.number_of_cameras == 2:
                 # Create the first camera widget
             self.camera_widget_1 = Camera_Widget(idx=1, label="Camera 1:", parent=self, acq_thread=self.acquisition_thread_1)
-            self.camera_widget_1.setMaximumHeight(300)
+            self.camera_widget_1.setMaximumHeight(375)
             cameras_layout.addWidget(self.camera_widget_1, alignment=Qt.AlignTop)
 
                 # Create the second camera widget
             self.camera_widget_2 = Camera_Widget(idx=0, label="Camera 2:", parent=self, acq_thread=self.acquisition_thread_2)
-            self.camera_widget_2.setMaximumHeight(300)
+            self.camera_widget_2.setMaximumHeight(375)
             cameras_layout.addWidget(self.camera_widget_2, alignment=Qt.AlignTop)
 
                 # Create the threads
-            self.grabber_1 = FrameGrabberThread(camera=self.camera_1, cam_id=1, interval_ms=75)
+            self.grabber_1 = FrameGrabberThread(camera=self.camera_1, cam_id=1, interval_ms=75, mirror=True)
             self.grabber_2 = FrameGrabberThread(camera=self.camera_2, cam_id=2, interval_ms=75)
 
                 # Connect the received frames
             self.grabber_1.frame_ready.connect(self.on_frame_received)
-            self.grabber_1.frame_ready.connect(self._on_frame_ready)
+            self.grabber_1.contrast_ready.connect(self._on_contrast_ready)
+            self.camera_widget_1.focus_method_changed.connect(self.grabber_1.set_focus_method)
             self.grabber_2.frame_ready.connect(self.on_frame_received)
-            self.grabber_2.frame_ready.connect(self._on_frame_ready)
+            self.grabber_2.contrast_ready.connect(self._on_contrast_ready)
+            self.camera_widget_2.focus_method_changed.connect(self.grabber_2.set_focus_method)
 
                 # Connect the received button signals
             self.camera_widget_1.live_toggled.connect(self.on_camera1_live_toggled)
-            self.camera_widget_1.snap_clicked.connect(lambda: self.on_camera1_snap(self.current_save_directory))
+            self.camera_widget_1.snap_clicked.connect(lambda: self.on_camera_snap(1))
             self.camera_widget_1.restart_clicked.connect(self.camera1_restart)
             self.camera_widget_2.live_toggled.connect(self.on_camera2_live_toggled)
-            self.camera_widget_2.snap_clicked.connect(lambda: self.on_camera2_snap(self.current_save_directory))
+            self.camera_widget_2.snap_clicked.connect(lambda: self.on_camera_snap(2))
             self.camera_widget_2.restart_clicked.connect(self.camera2_restart)
 
+        for cam_id in (1, 2):
+            camera_widget = getattr(self, f"camera_widget_{cam_id}", None)
+            if camera_widget is not None:
+                camera_widget.auto_contrast_checkbox.toggled.connect(lambda checked, cam_id=cam_id: self._apply_contrast(cam_id))
+
         # print("Grabber thread is running:", self.grabber_1.isRunning())
 
         cameras_layout.addStretch()  # Ensure widgets stay at the top
@@ -818,6 +826,7 @@ class ALM_Lightsheet(QMainWindow):
         # Initiate the save directory
         self.current_save_directory = self.file_manager_widget.current_path
         self.file_manager_widget.currentPathChanged.connect(self._on_path_changed)
+        self.snap_service.snap_saved.connect(self.file_manager_widget.notify_saved)
 
 
         self.ystack_widget = YStack_Widget(self.file_manager_widget.current_path, self.filterwheel1, self.filterwheel2, 
@@ -829,7 +838,7 @@ class ALM_Lightsheet(QMainWindow):
         # Connect with the Signals
         self.ystack_widget.acquisition_started.connect(self.before_acquisition)
         self.ystack_widget.acquisition_finished.connect(self.enable_devices)
-        #self.ystack_widget.frame_acquired.connect(self.on_frame_acquired)
+        self.ystack_widget.frame_acquired.connect(self.on_stack_preview)
 
         # Return the remaining devices to their defaults after the Y-Stack
             # Scanner
@@ -856,6 +865,21 @@ class ALM_Lightsheet(QMainWindow):
 
         set_napari_background(self.viewer, "#303030")  # Change background
 
+        # Only grab what is visible on the canvas (crop + decimation in the grabber threads):
+        # sent again on zoom/pan and when the canvas is resized (window, splitter or docks)
+        self.viewer.camera.events.zoom.connect(self._on_viewport_changed)
+        self.viewer.camera.events.center.connect(self._on_viewport_changed)
+        self._viewer_canvas = self.viewer.window._qt_viewer.canvas.native
+        self._viewer_canvas.installEventFilter(self)
+
+        # Camera label, frame rate, exposure and saturation (overlay, the frames are never drawn on)
+        self.viewer.text_overlay.position = "top_left"
+        self.viewer.text_overlay.color = "white"
+        self.viewer.text_overlay.font_size = 12
+        self.overlay_timer = QTimer(self)
+        self.overlay_timer.timeout.connect(self._update_overlay)
+        self.overlay_timer.start(500)
+
         qt_napari_window = self.viewer.window._qt_window
         qt_napari_window.setWindowFlags(Qt.Widget)
         qt_napari_window.menuBar().setNativeMenuBar(False)
@@ -888,9 +912,17 @@ class ALM_Lightsheet(QMainWindow):
         splitter_layout.setStretchFactor(1, 2)  # Cameras Container (equal priority with QMdiArea)
         splitter_layout.setStretchFactor(2, 10)  # Napari (Expands the most)
 
+
+    def eventFilter(self, watched, event):
+        if watched is getattr(self, "_viewer_canvas", None) and event.type() == QEvent.Resize:
+            self._on_viewport_changed()
+        return super().eventFilter(watched, event)
     
     def closeEvent(self, event):
 
+        # Finish writing the queued Snaps
+        self.snap_service.shutdown()
+
         for sub in self.mdi_area.subWindowList():
             if hasattr(sub, "inner_widget") and hasattr(sub.inner_widget, "shutdown"):
                 sub.inner_widget.shutdown()
@@ -929,16 +961,8 @@ class ALM_Lightsheet(QMainWindow):
 in_path = r"C:\Users\ALM_Light_Sheet\Desktop\testes_acqs"
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    app.setWindowIcon(QIcon("ALM.ico"))
-    app.setApplicationDisplayName("")
-
-    # 1. Initialize the software, and choose the path
-    dlg = ALM_Launcher()
-    if dlg.exec() != QDialog.Accepted:
-        sys.exit(0)    
-
-    # 2. After this open the software
+    # 2. After this open the software (the Launcher was shown at the top of the file)
     main_window = ALM_Lightsheet(initial_path=dlg.selected_path)#)
     main_window.showMaximized()
+    print(f"[Startup] main window shown {time.perf_counter() - startup_t0:.2f} s after launch")
     sys.exit(app.exec())
\ No newline at end of file
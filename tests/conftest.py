@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are imported as in the application (from Extra_Files.X import Y), from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
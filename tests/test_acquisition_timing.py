@@ -0,0 +1,68 @@
+import pytest
+
+from Extra_Files.Acquisition_Timing import Acquisition_Timing, DEFAULT_SETTLE, DEFAULT_WRITE_MBPS
+
+
+STACKS = [{'Nsteps': 10, 'Tpoints': 3, 'Tstep': 2, 'Tstep_unit': 'minutes', 'channels': 2},
+          {'Nsteps': 20, 'Tpoints': 2, 'Tstep': 30, 'Tstep_unit': 'seconds', 'channels': 2}]
+
+
+def test_estimate_counts_slices_stacks_and_waits():
+    timing = Acquisition_Timing.estimate(STACKS, frame_bytes=1_000_000, exposure_ms=20, sweep_ms=10)
+
+    assert timing.total_slices == 10 * 3 * 2 + 20 * 2 * 2
+    assert timing.total_stacks == 3 * 2 + 2 * 2
+    assert timing.stack_bytes == pytest.approx(timing.total_slices * 1_000_000 / timing.total_stacks)
+    assert timing.slice_s == pytest.approx(0.020 + DEFAULT_SETTLE)
+    assert timing.write_MBps() == pytest.approx(DEFAULT_WRITE_MBPS)
+
+    # Shared time points: the spacing of the first position, after every time point but the last
+    assert timing.n_waits == 2
+    assert timing.wait_seconds == 2 * 120
+
+
+def test_estimate_per_position_time_points():
+    timing = Acquisition_Timing.estimate(STACKS, frame_bytes=1_000_000, same_timepoints=False)
+    assert timing.n_waits == 2 + 1
+    assert timing.wait_seconds == 2 * 120 + 1 * 30
+
+
+def test_remaining_is_the_sum_of_the_phases():
+    timing = Acquisition_Timing.estimate(STACKS, frame_bytes=1_000_000, exposure_ms=20, settle_s=0.005)
+    write_s = timing.stack_bytes / timing.write_Bps
+    expected = (timing.total_slices * timing.slice_s
+                + timing.total_stacks * (timing.channel_s + write_s)
+                + timing.wait_seconds)
+    assert timing.remaining() == pytest.approx(expected)
+    assert timing.estimate_s == pytest.approx(expected)
+
+
+def test_seed_write_rate_updates_the_estimate():
+    timing = Acquisition_Timing.estimate(STACKS, frame_bytes=50_000_000)
+    before = timing.estimate_s
+    timing.seed_write_MBps(DEFAULT_WRITE_MBPS / 2)
+    assert timing.write_MBps() == pytest.approx(DEFAULT_WRITE_MBPS / 2)
+    assert timing.estimate_s > before
+
+
+def test_measurements_update_the_model():
+    timing = Acquisition_Timing.estimate(STACKS, frame_bytes=1_000_000, exposure_ms=20)
+    start = timing.remaining()
+
+    timing.slice_done(1)
+    timing.slice_done(2)
+    assert timing.slices_done == 2
+    assert timing.remaining() < start
+
+    # The first written stack replaces the write rate, the next ones are averaged in
+    timing.stack_written(nbytes=10_000_000, seconds=1.0)
+    assert timing.write_MBps() == pytest.approx(10.0)
+    assert timing.disk_limited() == (10.0 < timing.acquisition_MBps())
+    timing.stack_written(nbytes=20_000_000, seconds=1.0)
+    assert 10.0 < timing.write_MBps() < 20.0
+
+    timing.wait_started(60)
+    snapshot = timing.snapshot()
+    assert 0 < snapshot["waiting"] <= 60
+    assert snapshot["waits_left"] == timing.n_waits - 1
+    assert snapshot["write_MBps"] == pytest.approx(timing.write_MBps())
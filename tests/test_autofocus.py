@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from Extra_Files.Autofocus import Autofocus
+
+
+def run(autofocus, profile, center=0.0):
+    """Search over a metric profile; returns the result and the measured values in order."""
+    measured = []
+
+    def measure():
+        m = profile(position["x"])
+        measured.append(position["x"])
+        return m
+
+    position = {"x": center}
+    result = autofocus.search(lambda x: position.update(x=x), measure, center)
+    return result, measured
+
+
+def test_finds_the_peak():
+    autofocus = Autofocus("Beam Offset", search_range=2000, tolerance=20)
+    result, _ = run(autofocus, lambda x: 1000 - abs(x - 300))
+
+    assert result is not None
+    assert result[0] == pytest.approx(300, abs=20)
+
+
+def test_single_noisy_sample_does_not_end_the_coarse_scan():
+    # Coarse samples at -2000, -1333, -667, 0, 667, 1333, 2000: a noisy frame at 0 right after
+    # a rising sample, the real peak is at 1333
+    noisy = {0.0: 10.0}
+
+    def profile(x):
+        return noisy.get(round(x, 6), 5000 - abs(x - 1333))
+
+    autofocus = Autofocus("Beam Offset", search_range=2000, tolerance=20)
+    result, measured = run(autofocus, profile)
+
+    assert any(x > 1000 for x in measured)
+    assert result[0] == pytest.approx(1333, abs=40)
+
+
+def test_two_decreasing_samples_end_the_coarse_scan():
+    autofocus = Autofocus("Beam Offset", search_range=2000, tolerance=20)
+    _, measured = run(autofocus, lambda x: 1000 - abs(x + 1333))
+
+    # Peak at the second sample, stopped after the next two (before the last three coarse samples)
+    assert not any(x > 700 for x in measured)
+
+
+def test_failed_measurement_aborts_the_search():
+    autofocus = Autofocus("Beam Offset", search_range=2000, tolerance=20)
+    calls = []
+
+    def measure():
+        calls.append(1)
+        return None if len(calls) == 3 else 1.0
+
+    assert autofocus.search(lambda x: None, measure, 0.0) is None
+    assert len(calls) == 3
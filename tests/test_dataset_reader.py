@@ -0,0 +1,169 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("numcodecs")
+zarr = pytest.importorskip("zarr")
+
+import Extra_Files.Dataset_Reader as dataset_reader
+from Extra_Files.Dataset_Reader import Chunk_Cache, Dataset_Reader
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# Chunk cache
+
+def _chunk(value, n=10):
+    return np.full(n, value, dtype=np.float64)         # 80 bytes
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = Chunk_Cache(max_bytes=3 * 80)
+    for key in range(3):
+        cache.put(key, _chunk(key))
+    assert cache.nbytes == 3 * 80
+
+    # Reading 0 makes 1 the least recently used
+    assert cache.get(0)[0] == 0
+    cache.put(3, _chunk(3))
+    assert 1 not in cache
+    assert all(key in cache for key in (0, 2, 3))
+    assert cache.nbytes == 3 * 80
+
+    assert cache.get(1) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_replaces_and_skips_oversized_chunks():
+    cache = Chunk_Cache(max_bytes=2 * 80)
+    cache.put("a", _chunk(1))
+    cache.put("a", _chunk(2))
+    assert cache.nbytes == 80
+    assert cache.get("a")[0] == 2
+
+    cache.put("big", _chunk(0, n=100))
+    assert "big" not in cache and "a" in cache
+
+    # The cached chunks are shared, so read-only
+    with pytest.raises(ValueError):
+        cache.get("a")[0] = 5
+
+    cache.clear()
+    assert cache.nbytes == 0 and "a" not in cache
+
+
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# A store still being acquired
+
+T, C, Z, Y, X = 2, 2, 3, 8, 6
+
+
+def _progress(completed_stacks):
+    return {"time_points": T, "channels": C, "completed_stacks": completed_stacks,
+            "complete": completed_stacks == T * C}
+
+
+def _stack(t, c):
+    return np.arange(Z * Y * X, dtype=np.uint16).reshape(Z, Y, X) + 1000 * (t * C + c + 1)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An acquisition store with its array allocated and no stack written, as y_stack creates it."""
+    monkeypatch.setattr(dataset_reader, "REFRESH_S", 0)
+    path = str(tmp_path / "Position1_Camera1.ome.zarr")
+    root = zarr.group(store=zarr.storage.DirectoryStore(path), overwrite=True)
+    array = root.create_dataset("0", shape=(T, C, Z, Y, X), chunks=(1, 1, 1, Y, X), dtype="uint16")
+    root.attrs["acquisition"] = _progress(0)
+    return path, root, array
+
+
+def _complete_stack(root, array, t, c):
+    array[t, c] = _stack(t, c)
+    root.attrs["acquisition"] = _progress(t * C + c + 1)
+    # The attributes can be rewritten within the mtime resolution of the file system
+    attrs = os.path.join(root.store.path, ".zattrs")
+    mtime = os.stat(attrs).st_mtime_ns + (t * C + c + 1) * 10**9
+    os.utime(attrs, ns=(mtime, mtime))
+
+
+def test_reads_a_growing_store(store):
+    path, root, array = store
+    reader = Dataset_Reader(path, cache=Chunk_Cache(1 << 20), prefetch=0)
+    level = reader.levels[0]
+    assert level.shape == (T, C, Z, Y, X)
+    assert not reader.complete
+
+    # Not acquired yet: the fill value
+    assert not level[0, 0].any()
+
+    _complete_stack(root, array, 0, 0)
+    np.testing.assert_array_equal(level[0, 0], _stack(0, 0))
+    np.testing.assert_array_equal(level[0, 0, 1, 2:5, ::2], _stack(0, 0)[1, 2:5, ::2])
+    assert not level[1, 1].any()
+    assert reader.progress["completed_stacks"] == 1
+
+    for t in range(T):
+        for c in range(C):
+            if (t, c) != (0, 0):
+                _complete_stack(root, array, t, c)
+    np.testing.assert_array_equal(level[:], np.stack([np.stack([_stack(t, c) for c in range(C)]) for t in range(T)]))
+    assert reader.complete
+    reader.close()
+
+
+def test_only_the_completed_stacks_are_cached(store):
+    path, root, array = store
+    cache = Chunk_Cache(1 << 20)
+    reader = Dataset_Reader(path, cache=cache, prefetch=0)
+    level = reader.levels[0]
+    key = (level.path, (0, 0, 0, 0, 0))
+
+    # Written but not reported complete yet (the stack is still being acquired): read again every time
+    array[0, 0] = _stack(0, 0)
+    np.testing.assert_array_equal(level[0, 0, 0], _stack(0, 0)[0])
+    assert key not in cache
+
+    _complete_stack(root, array, 0, 0)
+    np.testing.assert_array_equal(level[0, 0, 0], _stack(0, 0)[0])
+    assert key in cache
+    assert (level.path, (0, 1, 0, 0, 0)) not in cache
+    reader.close()
+
+
+def test_cache_eviction_while_reading(store):
+    path, root, array = store
+    for t in range(T):
+        for c in range(C):
+            _complete_stack(root, array, t, c)
+
+    plane_bytes = Y * X * 2
+    cache = Chunk_Cache(max_bytes=2 * plane_bytes)
+    reader = Dataset_Reader(path, cache=cache, prefetch=0)
+    level = reader.levels[0]
+
+    for z in range(Z):
+        np.testing.assert_array_equal(level[1, 0, z], _stack(1, 0)[z])
+    assert cache.nbytes <= cache.max_bytes
+    assert (level.path, (1, 0, 0, 0, 0)) not in cache
+    assert (level.path, (1, 0, Z - 1, 0, 0)) in cache
+    reader.close()
+
+
+def test_prefetch_reads_ahead_in_the_scrubbing_direction(store):
+    path, root, array = store
+    for t in range(T):
+        for c in range(C):
+            _complete_stack(root, array, t, c)
+
+    cache = Chunk_Cache(1 << 20)
+    reader = Dataset_Reader(path, cache=cache, prefetch=1, workers=1)
+    level = reader.levels[0]
+
+    level[0, 0, 0]
+    reader._executor.shutdown(wait=True)
+    # The next Z plane and the same plane of the next time point
+    assert (level.path, (0, 0, 1, 0, 0)) in cache
+    assert (level.path, (1, 0, 0, 0, 0)) in cache
+    assert (level.path, (0, 0, 2, 0, 0)) not in cache
+    reader.close()
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("PySide6")
+pytest.importorskip("zarr")
+
+from Extra_Files.Stack_Parameters import Stack_Parameters
+from Extra_Files.Position_Table import load_positions, save_positions
+
+
+POSITIONS = [
+    Stack_Parameters(yi=100.0, yf=350.5, x=1200.0, z=40.25, theta=0.0, Ystep=2.5, Tpoints=3, Tstep=10.0,
+                     Tstep_unit="minutes"),
+    Stack_Parameters(mode_yl=True, mode_ly=False, yi=-20.0, yf=80.0, x=1662.8125, z=40.253, theta=90.0, Ystep=1.0),
+    # Empty fields stay empty
+    Stack_Parameters(x=0.5, z=-12.0),
+]
+
+
+@pytest.mark.parametrize("name", ["positions.csv", "positions.json"])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    save_positions(path, POSITIONS)
+    assert load_positions(path) == POSITIONS
+
+
+def test_missing_columns_come_from_the_template(tmp_path):
+    path = tmp_path / "positions.csv"
+    path.write_text("x,z\n10,20\n30,40\n")
+    template = Stack_Parameters(yi=1.0, yf=2.0, Ystep=0.5, Tpoints=4, Tstep_unit="hours")
+
+    positions = load_positions(str(path), template)
+    assert [(p.x, p.z) for p in positions] == [(10.0, 20.0), (30.0, 40.0)]
+    assert all((p.yi, p.yf, p.Ystep, p.Tpoints, p.Tstep_unit) == (1.0, 2.0, 0.5, 4, "hours") for p in positions)
+
+
+def test_json_list_and_invalid_values(tmp_path):
+    path = tmp_path / "positions.json"
+    path.write_text('[{"x": 5, "z": "7.5", "Tstep_unit": "fortnights", "mode_yl": "yes"}]')
+
+    position, = load_positions(str(path))
+    assert (position.x, position.z) == (5.0, 7.5)
+    assert position.Tstep_unit == "seconds"
+    assert position.mode_yl is True
+
+
+def test_unchanged_edit_keeps_the_full_precision():
+    from PySide6.QtCore import Qt
+    from Extra_Files.Position_Table import Position_Table_Model, TABLE_COLUMNS
+
+    model = Position_Table_Model()
+    model.set_positions(POSITIONS[:2])
+    columns = [c for c, (name, _) in enumerate(TABLE_COLUMNS) if name in ('x', 'z', 'yi', 'Ystep')]
+
+    for row in range(model.rowCount()):
+        for column in columns:
+            index = model.index(row, column)
+            assert model.setData(index, model.data(index, Qt.EditRole), Qt.EditRole)
+    assert model.positions() == POSITIONS[:2]
+
+    index = model.index(1, columns[0])
+    assert model.data(index, Qt.DisplayRole) == "1662.81"
@@ -0,0 +1,133 @@
+import os
+import threading
+from collections import namedtuple
+
+import pytest
+
+import Extra_Files.Resource_Planner as resource_planner
+from Extra_Files.Acquisition_Timing import Acquisition_Timing
+from Extra_Files.Resource_Planner import Resource_Plan, cached_disk_bandwidth, measure_disk_bandwidth
+
+
+GB = 1 << 30
+CAMERA = (2048, 2048, 1, 16)            # 8 MB frames
+FRAME_BYTES = 2048 * 2048 * 2
+Usage = namedtuple("Usage", "total used free")
+
+
+@pytest.fixture
+def machine(monkeypatch, tmp_path):
+    """A machine with 1 TB free, 64 GB of memory and no disk measured."""
+    state = {"free": 1024 * GB, "memory": 64 * GB}
+    monkeypatch.setattr(resource_planner.shutil, "disk_usage", lambda path: Usage(0, 0, state["free"]))
+    monkeypatch.setattr(resource_planner, "available_memory", lambda: state["memory"])
+    monkeypatch.setattr(resource_planner, "_disk_bandwidth", {})
+    state["dir"] = str(tmp_path)
+    return state
+
+
+def _measured(state, MBps):
+    resource_planner._disk_bandwidth[resource_planner._disk(state["dir"])] = MBps
+
+
+def _plan(state, stacks, cameras=(CAMERA,), same_timepoints=True, exposure_ms=10):
+    timing = Acquisition_Timing.estimate(stacks, len(cameras) * FRAME_BYTES, exposure_ms=exposure_ms, settle_s=0)
+    return Resource_Plan(stacks, list(cameras), state["dir"], timing, same_timepoints=same_timepoints)
+
+
+def _stack(Nsteps=100, Tpoints=1, Tstep=0, Tstep_unit="seconds", channels=1):
+    return dict(Nsteps=Nsteps, Tpoints=Tpoints, Tstep=Tstep, Tstep_unit=Tstep_unit, channels=channels)
+
+
+def test_an_experiment_that_fits(machine):
+    plan = _plan(machine, [_stack(Tpoints=3, Tstep=10, Tstep_unit="minutes")])
+    assert plan.errors == [] and plan.warnings == []
+    assert plan.data_bytes == 300 * FRAME_BYTES
+    assert "disk not measured yet" in plan.summary()
+
+
+def test_disk_space(machine):
+    machine["free"] = 100 * FRAME_BYTES
+    assert any("Not enough disk space" in e for e in _plan(machine, [_stack(Nsteps=101)]).errors)
+
+    machine["free"] = 105 * FRAME_BYTES
+    plan = _plan(machine, [_stack(Nsteps=100)])
+    assert plan.errors == []
+    assert any("of the free disk space" in w for w in plan.warnings)
+
+
+def test_memory(machine):
+    # A full stack per camera plus the batch read from it
+    machine["memory"] = 100 * FRAME_BYTES
+    plan = _plan(machine, [_stack(Nsteps=60)])
+    assert plan.memory_bytes == 120 * FRAME_BYTES
+    assert any("don't fit" in e for e in plan.errors)
+
+    machine["memory"] = 130 * FRAME_BYTES
+    plan = _plan(machine, [_stack(Nsteps=60)])
+    assert plan.errors == []
+    assert any("of the available memory" in w for w in plan.warnings)
+
+
+def test_write_bandwidth(machine):
+    # 8 MB per 10 ms slice: about 840 MB/s
+    _measured(machine, 500)
+    plan = _plan(machine, [_stack()])
+    assert plan.disk_MBps == 500
+    assert plan.required_MBps == pytest.approx(FRAME_BYTES / 0.010 / 1e6)
+    assert any("writing will slow down every stack" in w for w in plan.warnings)
+
+    _measured(machine, 2000)
+    assert _plan(machine, [_stack()]).warnings == []
+
+
+def test_time_spacing_against_the_measured_disk(machine):
+    # 100 frames (840 MB) per 1 s spacing, the disk writes 600 MB/s
+    _measured(machine, 600)
+    stacks = [_stack(Tpoints=5, Tstep=1)]
+    plan = _plan(machine, stacks, exposure_ms=1)
+    assert any("MB/s needed, the disk writes 600 MB/s" in w for w in plan.warnings)
+
+    # Same data over 10 s: the disk keeps up
+    plan = _plan(machine, [_stack(Tpoints=5, Tstep=10)], exposure_ms=1)
+    assert not any("time spacing" in w for w in plan.warnings)
+
+
+def test_time_spacing_against_the_duration(machine):
+    # 100 slices of 50 ms take 5 s, longer than the 2 s spacing (disk not measured: no write time assumed)
+    plan = _plan(machine, [_stack(Tpoints=5, Tstep=2)], exposure_ms=50)
+    assert any("longer than the time spacing" in w for w in plan.warnings)
+
+    # A single time point never waits
+    plan = _plan(machine, [_stack(Tpoints=1, Tstep=2)], exposure_ms=50)
+    assert not any("time spacing" in w for w in plan.warnings)
+
+
+def test_time_spacing_per_position(machine):
+    stacks = [_stack(Tpoints=5, Tstep=60), _stack(Tpoints=5, Tstep=2)]
+    plan = _plan(machine, stacks, same_timepoints=False, exposure_ms=50)
+    assert [w.split(":")[0] for w in plan.warnings if "time spacing" in w] == ["Position 2"]
+
+    # Shared time points: both positions in the spacing of the first one
+    stacks = [_stack(Tpoints=5, Tstep=8), _stack(Tpoints=5, Tstep=60)]
+    separate = _plan(machine, stacks, same_timepoints=False, exposure_ms=50)
+    plan = _plan(machine, stacks, exposure_ms=50)
+    assert plan.timepoint_seconds == [pytest.approx(sum(separate.timepoint_seconds))]
+    assert any(w.startswith("A time point takes") for w in plan.warnings)
+    assert not any("time spacing" in w for w in separate.warnings)
+
+
+def test_measure_disk_bandwidth(machine):
+    directory = machine["dir"]
+    MBps = measure_disk_bandwidth(directory, size_mb=2)
+    assert MBps > 0
+    assert cached_disk_bandwidth(directory) == MBps
+    assert os.listdir(directory) == []
+
+
+def test_stopped_benchmark_is_not_kept(machine):
+    stop = threading.Event()
+    stop.set()
+    assert measure_disk_bandwidth(machine["dir"], size_mb=2, stop_event=stop) is None
+    assert cached_disk_bandwidth(machine["dir"]) is None
+    assert os.listdir(machine["dir"]) == []
@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from Extra_Files.Scanner_Monitor import Scanner_Monitor, matched_speed
+
+
+def test_matched_speed_makes_one_sweep_last_one_exposure():
+    assert matched_speed(1000, -9000, 20.0) == pytest.approx(500.0)
+    assert matched_speed(-9000, 1000, 20.0) == pytest.approx(500.0)
+
+
+def test_report_suggests_the_matched_mark_speed():
+    monitor = Scanner_Monitor(board=None)
+    monitor.durations.extend([10.0, 11.0, 12.0])
+
+    report = monitor.report(20.0, (1000, -9000, 1000))
+    assert "sweep/exposure = 0.55" in report
+    assert "matched to the exposure: 500.0 bits/ms" in report
+
+
+def test_report_without_sweep_or_exposure():
+    monitor = Scanner_Monitor(board=None)
+    monitor.durations.append(10.0)
+
+    assert "matched" not in monitor.report(20.0)
+    assert "matched" not in monitor.report(None, (1000, -9000, 1000))
+    assert "matched" not in monitor.report(20.0, (None, None, None))
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import Extra_Files.Stack_Preview as stack_preview
+from Extra_Files.Stack_Preview import Stack_Preview, GAP_PX
+
+
+class Fake_Camera:
+    """Camera buffer of a stack: slice k is filled with k + 1. Records the threads that read it."""
+
+    def __init__(self, n_slices, shape=(64, 48), delay=0.0):
+        self.frames = np.stack([np.full(shape, k + 1, dtype=np.uint16) for k in range(n_slices)])
+        self.delay = delay
+        self.readers = set()
+        self.read = []
+
+    def read_multiple_images(self, rng, peek=False):
+        self.readers.add(threading.get_ident())
+        self.read.append(rng[0])
+        time.sleep(self.delay)
+        return list(self.frames[rng[0]:rng[1]])
+
+
+@pytest.fixture
+def preview(monkeypatch):
+    monkeypatch.setattr(stack_preview, "EMIT_HZ", 1e9)
+    emitted = []
+    preview = Stack_Preview(lambda image, *args: emitted.append((image, args)))
+    preview.emitted = emitted
+    preview.start()
+    yield preview
+    preview.stop()
+
+
+def test_the_camera_is_never_read_on_the_acquisition_thread(preview):
+    camera = Fake_Camera(5, delay=0.05)
+    t0 = time.perf_counter()
+    preview.grab(camera, 1, 0, 0, 2, 5, 1.0, 1, force=True)
+    assert time.perf_counter() - t0 < 0.04
+
+    preview.sync()
+    assert camera.read == [2]
+    assert threading.get_ident() not in camera.readers
+    assert preview.grabbed == 1
+
+
+def test_slices_are_rate_capped_unless_forced(preview, monkeypatch):
+    monkeypatch.setattr(stack_preview, "GRAB_HZ", 1e-3)
+    camera = Fake_Camera(10)
+    for k in range(9):
+        preview.grab(camera, 1, 0, 0, k, 10, 1.0, 1)
+    preview.grab(camera, 1, 0, 0, 9, 10, 1.0, 1, force=True)
+    preview.sync()
+    assert camera.read == [0, 9]
+
+
+def test_last_slice_reaches_the_views(preview):
+    n = 6
+    camera = Fake_Camera(n)
+    for k in range(n):
+        preview.grab(camera, 2, 0, 1, k, n, 0.65, 1, force=True)
+        preview.sync()
+
+    image, (camera_id, time_point, channel, slice_idx) = preview.emitted[-1]
+    assert (camera_id, time_point, channel, slice_idx) == (2, 0, 1, n - 1)
+    h, w = camera.frames.shape[1:]
+    assert image.shape == (h + GAP_PX + n, w + GAP_PX + n)
+    # The maximum projection holds the last slice, the XZ view has one row per slice
+    assert image[:h, :w].max() == n
+    np.testing.assert_array_equal(image[h + GAP_PX:, 0], np.arange(1, n + 1))
+
+
+def test_a_new_stack_starts_a_new_preview(preview):
+    camera = Fake_Camera(4)
+    preview.grab(camera, 1, 0, 0, 3, 4, 0.65, 1, force=True)
+    preview.sync()
+    preview.grab(camera, 1, 1, 0, 0, 4, 0.65, 1, force=True)
+    preview.sync()
+
+    image, _ = preview.emitted[-1]
+    assert image[:64, :48].max() == 1
+
+
+def test_offers_are_dropped_while_the_preview_is_busy(preview):
+    camera = Fake_Camera(20, delay=0.05)
+    for k in range(20):
+        preview.grab(camera, 1, 0, 0, k, 20, 1.0, 1, force=True)
+    preview.sync()
+    assert preview.skipped > 0
+    assert preview.grabbed + preview.skipped == 20
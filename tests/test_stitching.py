@@ -0,0 +1,42 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("zarr")
+pytest.importorskip("ome_zarr")
+
+from Extra_Files.Stitching import phase_correlation
+
+
+def _image(shape, seed=0):
+    """Smooth random texture (sums of shifted noise), like a tissue crop."""
+    rng = np.random.default_rng(seed)
+    noise = rng.random(shape)
+    image = sum(np.roll(noise, (dy, dx), axis=(0, 1)) for dy in range(-2, 3) for dx in range(-2, 3))
+    return image.astype(np.float32)
+
+
+@pytest.mark.parametrize("shift", [(0, 0), (5, -7), (-12, 3), (20, 31)])
+def test_recovers_a_synthetic_shift(shift):
+    a = _image((128, 160))
+    b = np.roll(a, shift, axis=(0, 1))       # b(x) = a(x - shift)
+
+    found, peak = phase_correlation(a, b)
+    assert tuple(found) == shift
+    assert 0 < peak <= 1
+
+
+def test_shift_of_overlapping_crops():
+    # Two tiles cut from the same image, as the overlap of neighbouring positions
+    image = _image((256, 256), seed=1)
+    a = image[40:168, 30:158]
+    b = image[49:177, 22:150]
+
+    found, peak = phase_correlation(a, b)
+    assert tuple(found) == (-9, 8)
+    assert peak > 0.1
+
+
+def test_unrelated_images_have_a_low_peak():
+    _, same = phase_correlation(_image((96, 96), seed=2), _image((96, 96), seed=2))
+    _, other = phase_correlation(_image((96, 96), seed=2), _image((96, 96), seed=3))
+    assert other < same
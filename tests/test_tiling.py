@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("PySide6")
+pytest.importorskip("zarr")
+
+from Extra_Files.Stack_Parameters import Stack_Parameters
+from Extra_Files.Tiling import Tile_Grid, tile_coordinates, tile_fov
+
+
+def test_tile_fov_follows_the_binned_roi():
+    assert tile_fov(2048, 1024, 1, pixel_size=0.5) == (1024.0, 512.0)
+    # Binned pixels: the ROI is read out in whole binned pixels
+    assert tile_fov(2047, 1024, 2, pixel_size=0.5) == (1023.0, 512.0)
+
+
+def test_grid_covers_the_region_with_the_overlap():
+    grid = Tile_Grid(0, 1000, 0, 500, fov_x=400, fov_z=300, overlap=0.1)
+
+    assert grid.shape == (1, 2, 3)
+    assert len(grid) == 6
+    x_min, x_max, z_min, z_max = grid.extent()
+    assert x_min <= 0 and x_max >= 1000 and z_min <= 0 and z_max >= 500
+    assert grid.xs[1] - grid.xs[0] == pytest.approx(400 * 0.9)
+    assert grid.zs[1] - grid.zs[0] == pytest.approx(300 * 0.9)
+
+
+def test_serpentine_order():
+    grid = Tile_Grid(0, 1000, 0, 800, fov_x=400, fov_z=300, overlap=0.1)
+    _, rows, columns = grid.shape
+
+    order = [(tile["row"], tile["column"]) for tile in grid.tiles]
+    expected = []
+    for row in range(rows):
+        cols = range(columns) if row % 2 == 0 else reversed(range(columns))
+        expected += [(row, column) for column in cols]
+    assert order == expected
+
+    # Consecutive tiles are always neighbours
+    for (r0, c0), (r1, c1) in zip(order, order[1:]):
+        assert abs(r0 - r1) + abs(c0 - c1) == 1
+
+
+def test_angles_are_the_outer_loop():
+    grid = Tile_Grid(0, 500, 0, 500, fov_x=400, fov_z=400, thetas=[0, 90])
+    assert grid.shape[0] == 2
+    angles = [tile["angle"] for tile in grid.tiles]
+    assert angles == sorted(angles)
+    assert {tile["theta"] for tile in grid.tiles if tile["angle"] == 1} == {90}
+
+
+def test_tile_coordinates_of_the_grid_positions():
+    grid = Tile_Grid(0, 1000, 0, 500, fov_x=400, fov_z=300, overlap=0.1)
+    parameters = [p.to_dict() for p in grid.positions(Stack_Parameters(yi=0.0, yf=100.0, Ystep=1.0, theta=0.0))]
+    tiles = tile_coordinates(parameters, 400, 300)
+
+    assert [t["position"] for t in tiles] == list(range(1, len(grid) + 1))
+    assert [(t["row"], t["column"]) for t in tiles] == [(g["row"], g["column"]) for g in grid.tiles]
+    first = min(tiles, key=lambda t: (t["offset_um"]["z"], t["offset_um"]["x"]))
+    assert first["offset_um"] == {"x": 0, "z": 0}
+    assert max(t["offset_um"]["x"] for t in tiles) == pytest.approx(2 * 400 * 0.9)